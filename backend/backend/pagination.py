@@ -0,0 +1,136 @@
+# Keyset (cursor) pagination shared by the list endpoints. Pages are fetched with a WHERE clause on
+# the ordering columns instead of OFFSET, so each page costs the same however deep it is.
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+def get_page_size(request, default, maximum):
+    """
+    Reads the `page_size` query parameter, falling back to `default` and capping it at `maximum`.
+
+    Args:
+    request (Request): The DRF request.
+    default (int): The page size used when the parameter is missing.
+    maximum (int): The largest page size allowed.
+
+    Returns:
+    int: The page size.
+
+    Raises:
+    ValidationError: If `page_size` is not a positive integer.
+    """
+    value = request.query_params.get('page_size')
+    if value is None:
+        return default
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise ValidationError("page_size must be an integer.")
+    if page_size < 1:
+        raise ValidationError("page_size must be positive.")
+    return min(page_size, maximum)
+
+
+def _encode_value(value):
+    # Full-precision ISO format; JSON encoders that truncate microseconds would break the keyset
+    return value.isoformat() if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+
+def encode_cursor(values):
+    """
+    Encodes the ordering values of the last row of a page as an opaque cursor.
+
+    Args:
+    values (list): The values of the ordering fields.
+
+    Returns:
+    str: The URL-safe cursor.
+    """
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Args:
+    cursor (str): The cursor.
+    length (int): The expected number of ordering values.
+
+    Returns:
+    list: The ordering values.
+
+    Raises:
+    ValidationError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValidationError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != length:
+        raise ValidationError("Invalid cursor.")
+    return values
+
+
+def _cursor_values(model, fields, values):
+    # A cursor is client input: convert each value with its model field so a tampered cursor is a 400,
+    # not a database error
+    converted = []
+    for field, value in zip(fields, values):
+        if value is None or isinstance(value, (list, dict, bool)):
+            raise ValidationError("Invalid cursor.")
+        try:
+            converted.append(model._meta.get_field(field).to_python(value))
+        except FieldDoesNotExist:
+            converted.append(value)
+        except (DjangoValidationError, TypeError, ValueError, OverflowError):
+            raise ValidationError("Invalid cursor.")
+    return converted
+
+
+def _row_value(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def keyset_page(queryset, ordering, cursor, page_size):
+    """
+    Returns one page of `queryset` ordered by `ordering`, starting after `cursor`.
+
+    Args:
+    queryset (QuerySet): The rows to paginate; may be a `.values()` queryset.
+    ordering (list[tuple]): `(field, descending)` pairs. The last field must be unique (e.g. `id`).
+    cursor (str): The cursor returned with the previous page, or None for the first page.
+    page_size (int): The number of rows per page.
+
+    Returns:
+    tuple: `(rows, next_cursor)`, where `next_cursor` is None on the last page.
+
+    Raises:
+    ValidationError: If the cursor is malformed.
+    """
+    fields = [field for field, _ in ordering]
+    if cursor:
+        values = _cursor_values(queryset.model, fields, decode_cursor(cursor, len(fields)))
+        # Lexicographic "after": (a < x) OR (a = x AND b < y) OR ... for descending fields
+        conditions = []
+        for position, (field, descending) in enumerate(ordering):
+            equal = {fields[index]: values[index] for index in range(position)}
+            lookup = f"{field}__lt" if descending else f"{field}__gt"
+            conditions.append(Q(**equal, **{lookup: values[position]}))
+        queryset = queryset.filter(reduce(or_, conditions))
+
+    queryset = queryset.order_by(*[f"-{field}" if descending else field for field, descending in ordering])
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor([_row_value(rows[-1], field) for field in fields])
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'genai.metrics.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -157,13 +158,139 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 
+# Let the frontend read per-stage timings from API responses
+CORS_EXPOSE_HEADERS = ['Server-Timing']
+
 CORS_ALLOW_HEADERS = [
     'content-type',
     'authorization',
-    
+    'upload-offset',  # Position of a chunk in a resumable upload
 ]
 
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-GEMEINI_API_KEY = "assssssssssssaaaaaaaaaaaa"
\ No newline at end of file
+GEMEINI_API_KEY = "assssssssssssaaaaaaaaaaaa"
+
+# Embeddings
+# A single embedding model is shared by ingestion and querying in each process.
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 32))
+EMBEDDING_NUM_THREADS = int(os.environ.get('EMBEDDING_NUM_THREADS', 0))  # 0 keeps the runtime default
+# 'torch' (sentence-transformers) or 'onnx'. The ONNX backend runs the model exported with
+# `manage.py export_onnx_embedder`, int8-quantized by default, and does not import torch.
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ONNX_DIR = os.environ.get('EMBEDDING_ONNX_DIR', os.path.join(BASE_DIR, 'onnx_embedder'))
+EMBEDDING_ONNX_FILE = os.environ.get('EMBEDDING_ONNX_FILE', 'model_int8.onnx')  # model.onnx for float32
+# Persistent embedding cache keyed by (model, normalized text hash); set the path to '' to disable
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(BASE_DIR, 'embedding_cache.sqlite3'))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', 500000))
+EMBEDDING_CACHE_DTYPE = os.environ.get('EMBEDDING_CACHE_DTYPE', 'float16')  # float16 halves the file size
+# Concurrent query embeddings are collected for up to QUERY_EMBEDDING_BATCH_WAIT_MS, or until
+# QUERY_EMBEDDING_BATCH_SIZE queries are queued, and embedded in one forward pass; 0 disables batching
+QUERY_EMBEDDING_BATCH_SIZE = int(os.environ.get('QUERY_EMBEDDING_BATCH_SIZE', 16))
+QUERY_EMBEDDING_BATCH_WAIT_MS = float(os.environ.get('QUERY_EMBEDDING_BATCH_WAIT_MS', 5))
+
+# Load GenAI resources when the WSGI/ASGI application starts instead of on the first query.
+# Management commands never load them.
+GENAI_WARM_UP_ON_START = os.environ.get('GENAI_WARM_UP_ON_START', '0') == '1'
+
+# Vector store and background ingestion
+CHROMA_PERSIST_DIRECTORY = os.path.join(BASE_DIR, 'chroma_db_nccn')
+# Vector store backend. genai.vector_stores.QuantizedVectorStore keeps int8 or float16 vectors in
+# memory-mapped files shared by all workers, e.g.
+#   {'BACKEND': 'genai.vector_stores.QuantizedVectorStore',
+#    'OPTIONS': {'path': os.path.join(BASE_DIR, 'vector_index'), 'dtype': 'int8'}}
+# Copy an existing Chroma collection into it with `manage.py copy_vector_store`.
+VECTOR_STORE = {
+    'BACKEND': 'genai.vector_stores.ChromaVectorStore',
+    'OPTIONS': {'persist_directory': CHROMA_PERSIST_DIRECTORY},
+}
+INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 2))  # Threads running ingestion jobs per process
+INGESTION_PROCESSES = int(os.environ.get('INGESTION_PROCESSES', os.cpu_count() or 2))  # PDF parsers for bulk runs
+# A running job that reports no progress for this many seconds is failed so its file can be ingested again
+INGESTION_JOB_TIMEOUT = int(os.environ.get('INGESTION_JOB_TIMEOUT', 900))
+# Fail stale jobs and resubmit queued ones when the WSGI/ASGI application starts
+# (or run `manage.py recover_ingestion_jobs`)
+INGESTION_RECOVER_ON_START = os.environ.get('INGESTION_RECOVER_ON_START', '1') == '1'
+CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', 1000))
+CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', 100))
+# Extracted page text is kept as gzip-compressed JSON Lines keyed by the PDF hash and parser version,
+# so re-ingestion and `manage.py rechunk` skip PDF parsing; set to '' to always parse
+PARSED_ARTIFACTS_DIR = os.environ.get('PARSED_ARTIFACTS_DIR', os.path.join(MEDIA_ROOT, 'parsed'))
+
+# Answer generator backend. Use genai.generators.FakeGenerator for offline load and latency tests.
+GENAI_GENERATOR = {
+    'BACKEND': os.environ.get('GENAI_GENERATOR_BACKEND', 'genai.generators.GeminiGenerator'),
+    'OPTIONS': {},
+}
+
+# Threads running query embedding and vector search for the async query path
+RETRIEVAL_WORKERS = int(os.environ.get('RETRIEVAL_WORKERS', 4))
+
+# Answer cache in front of handle_query (exact normalized-query tier + embedding-similarity tier)
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', '1') == '1'
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', 1000))
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', 3600))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.95))
+
+# Per-stage latency metrics: Server-Timing headers and Prometheus histograms at /api/genai/metrics/
+GENAI_METRICS_ENABLED = os.environ.get('GENAI_METRICS_ENABLED', '1') == '1'
+# One structured JSON log line per request on the 'genai.requests' logger
+GENAI_REQUEST_LOGGING = os.environ.get('GENAI_REQUEST_LOGGING', '0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'genai.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Chat history pagination
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+CHAT_HISTORY_PREVIEW_CHARS = 200
+
+# User listing pagination
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+# Seconds a user's role stays in the cache. Role changes made through the API invalidate it at once;
+# with the default per-process cache, other worker processes see the change after this timeout, so
+# configure a shared cache (CACHES) when running several workers.
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', 300))
+
+# Uploaded files listing pagination
+UPLOADED_FILES_PAGE_SIZE = 50
+UPLOADED_FILES_MAX_PAGE_SIZE = 200
+
+# Chunked uploads. Clients send chunks of UPLOAD_CHUNK_SIZE bytes (larger ones, up to
+# UPLOAD_CHUNK_MAX_SIZE, are accepted); unfinished uploads can be resumed for UPLOAD_SESSION_EXPIRY_HOURS.
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+UPLOAD_CHUNK_MAX_SIZE = int(os.environ.get('UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 500 * 1024 * 1024))
+UPLOAD_SESSION_EXPIRY_HOURS = int(os.environ.get('UPLOAD_SESSION_EXPIRY_HOURS', 24))
+
+# Hybrid retrieval: BM25 over an in-process inverted index, fused with the vector search by
+# reciprocal rank fusion. Each search contributes HYBRID_CANDIDATES results before fusion.
+HYBRID_SEARCH_ENABLED = os.environ.get('HYBRID_SEARCH_ENABLED', '1') == '1'
+HYBRID_CANDIDATES = int(os.environ.get('HYBRID_CANDIDATES', 20))
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+# How often a background thread in each worker re-reads the vector store to pick up chunks ingested by
+# other processes (0 disables it)
+SPARSE_INDEX_SYNC_SECONDS = int(os.environ.get('SPARSE_INDEX_SYNC_SECONDS', 30))
+
+# Context assembly: CONTEXT_CANDIDATES chunks are retrieved, overlapping and near-duplicate text is
+# merged away, and MMR picks a diverse subset within CONTEXT_TOKEN_BUDGET (estimated tokens). The old
+# context of 6 raw CHUNK_SIZE chunks was about 1500 tokens; the budget is set below that.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 1000))
+CONTEXT_CANDIDATES = int(os.environ.get('CONTEXT_CANDIDATES', 12))
+CONTEXT_MMR_LAMBDA = 0.7
+CONTEXT_DUPLICATE_THRESHOLD = 0.8
+CONTEXT_CHARS_PER_TOKEN = 4
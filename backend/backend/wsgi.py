@@ -14,3 +14,24 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Preload the embedding model, vector store and Gemini client before serving traffic when enabled
+from django.conf import settings  # noqa: E402
+
+if settings.GENAI_WARM_UP_ON_START:
+    from genai.resources import warm_up  # noqa: E402
+
+    warm_up()
+
+# Recover ingestion jobs left queued or running by a previous process
+if settings.INGESTION_RECOVER_ON_START:
+    from django.db import DatabaseError  # noqa: E402
+
+    from genai.jobs import recover_stale_jobs, requeue_queued_jobs  # noqa: E402
+
+    try:
+        recover_stale_jobs()
+        requeue_queued_jobs()
+    except DatabaseError:
+        # E.g. the tables do not exist yet before the first migrate
+        pass
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from django.conf import settings
+
+
+def normalize_query(query):
+    """
+    Normalizes a query for exact-match lookups: case, surrounding punctuation and repeated
+    whitespace are ignored.
+
+    Args:
+    query (str): The user's query.
+
+    Returns:
+    str: The normalized query.
+    """
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class AnswerCache:
+    """
+    In-process two-tier cache for generated answers. The first tier matches the normalized query
+    exactly; the second matches a previous query whose embedding has cosine similarity of at
+    least `similarity_threshold`. Both tiers only match entries that were answered from the same
+    set of retrieved chunk IDs, so entries go stale as soon as the index changes what a query
+    retrieves. Entries expire after `ttl_seconds` and the least recently used entry is evicted
+    once `max_entries` is reached.
+
+    Args:
+    max_entries (int): The maximum number of cached answers.
+    ttl_seconds (float): How long an answer stays valid.
+    similarity_threshold (float): The minimum cosine similarity for a semantic hit.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (normalized query, chunk key) -> entry, in LRU order
+        self._by_chunks = {}  # chunk key -> set of entry keys, for the semantic tier
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_chunks.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_chunks[key[1]]
+
+    def get(self, query, chunk_ids, query_embedding=None):
+        """
+        Looks up a cached answer.
+
+        Args:
+        query (str): The user's query.
+        chunk_ids (iterable): The IDs of the chunks retrieved for the query.
+        query_embedding (list[float]): Optional query embedding for the semantic tier.
+
+        Returns:
+        tuple: `(answer, tier)` with tier 'exact' or 'semantic', or None on a miss.
+        """
+        chunk_key = frozenset(chunk_ids)
+        key = (normalize_query(query), chunk_key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires_at'] > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry['answer'], 'exact'
+            if entry:
+                self._remove(key)
+
+            if query_embedding is not None and chunk_key in self._by_chunks:
+                candidates = []
+                for candidate in list(self._by_chunks[chunk_key]):
+                    if self._entries[candidate]['expires_at'] > now:
+                        candidates.append(candidate)
+                    else:
+                        self._remove(candidate)
+                if candidates:
+                    matrix = np.stack([self._entries[candidate]['embedding'] for candidate in candidates])
+                    scores = matrix @ self._unit(query_embedding)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self._entries.move_to_end(candidates[best])
+                        self.semantic_hits += 1
+                        return self._entries[candidates[best]]['answer'], 'semantic'
+
+            self.misses += 1
+            return None
+
+    def put(self, query, chunk_ids, answer, query_embedding=None):
+        """
+        Stores an answer.
+
+        Args:
+        query (str): The user's query.
+        chunk_ids (iterable): The IDs of the chunks the answer was generated from.
+        answer (str): The generated answer.
+        query_embedding (list[float]): Optional query embedding for the semantic tier.
+        """
+        chunk_key = frozenset(chunk_ids)
+        key = (normalize_query(query), chunk_key)
+        entry = {
+            'answer': answer,
+            'embedding': self._unit(query_embedding) if query_embedding is not None else None,
+            'expires_at': time.monotonic() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            if entry['embedding'] is not None:
+                self._by_chunks.setdefault(chunk_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+
+    def stats(self):
+        """
+        Returns the cache size and hit-rate counters for this process.
+
+        Returns:
+        dict: Entry count, exact/semantic hits, misses and the overall hit rate.
+        """
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / total, 4) if total else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """
+    Returns the answer cache for this process, creating it on first call.
+
+    Returns:
+    AnswerCache: The shared answer cache.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache(
+                    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                )
+    return _cache
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GenaiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'genai'
+
+    def ready(self):
+        # Connects the receivers that link duplicate uploads to their original's chunks
+        from . import signals  # noqa: F401
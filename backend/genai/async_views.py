@@ -0,0 +1,222 @@
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import ParseError, ValidationError
+
+from .models import UserMessage
+from .exceptions import HTTPException
+from .metrics import stage
+from .streaming import aiter_sync, event_stream_response, sse_event
+from .views import (
+    answer_cache, generate_answer_async, generate_rag_prompt, resolve_query_scope, retrieve_context, stream_answer,
+)
+
+
+_retrieval_executor = None
+_retrieval_executor_lock = threading.Lock()
+
+# Keep references to fire-and-forget writes so they are not garbage collected mid-flight
+_background_tasks = set()
+
+
+def get_retrieval_executor():
+    """
+    Returns the bounded thread pool that runs CPU-bound retrieval (query embedding and vector
+    search) for the async query path, creating it on first use.
+
+    Returns:
+    ThreadPoolExecutor: The shared retrieval pool.
+    """
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=settings.RETRIEVAL_WORKERS,
+                    thread_name_prefix='retrieval',
+                )
+    return _retrieval_executor
+
+
+def _save_message_in_background(user, query, answer):
+    task = asyncio.create_task(
+        sync_to_async(UserMessage.objects.create)(user_id=user, user_question=query, bot_reply=answer)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _read_query_request(request):
+    """
+    Validates the JSON body of an async query request.
+
+    Args:
+    request (HttpRequest): The HTTP request object with a JSON body containing `query` and `user_id`,
+        and optionally `file_ids` or `uploaded_by` to scope the search.
+
+    Returns:
+    tuple: The user, the query and the scoped file IDs (None for an unscoped search).
+
+    Raises:
+    ParseError: If the body is not JSON.
+    ValidationError: If the query is empty or the user ID is missing or invalid.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        raise ParseError('Invalid JSON body.')
+
+    user_id = data.get('user_id')
+    query = data.get('query')
+
+    # Validate inputs
+    if not query or query.strip() == "":
+        raise ValidationError("Query cannot be empty.")
+    if not user_id:
+        raise ValidationError("User ID is required.")
+
+    try:
+        user = await User.objects.aget(id=user_id)
+    except (User.DoesNotExist, ValueError):
+        raise ValidationError("User not found.")
+
+    file_ids = await sync_to_async(resolve_query_scope)(data.get('file_ids'), data.get('uploaded_by'))
+    return user, query, file_ids
+
+
+async def _retrieve_context(query, file_ids):
+    loop = asyncio.get_running_loop()
+    # Run in a copy of this context so stage timings reach the request's Server-Timing header
+    return await loop.run_in_executor(
+        get_retrieval_executor(), contextvars.copy_context().run,
+        functools.partial(retrieve_context, query, file_ids=file_ids),
+    )
+
+
+@csrf_exempt
+@require_POST
+async def handle_query_async(request):
+    """
+    Async implementation of `handle_query` for deployments running `backend/asgi.py`. Retrieval runs
+    in a bounded executor, the Gemini call is awaited and the `UserMessage` is written after the
+    response has been returned, so one process can serve many concurrent questions.
+
+    Args:
+    request (HttpRequest): The HTTP request object with a JSON body containing `query` and `user_id`,
+        and optionally `file_ids` or `uploaded_by` to scope the search.
+
+    Returns:
+    JsonResponse: The original query, relevant context and generated answer, or an error.
+    """
+    try:
+        user, query, file_ids = await _read_query_request(request)
+    except ParseError as e:
+        return JsonResponse({'detail': e.detail}, status=400)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400, safe=False)
+
+    try:
+        context, hits, query_embedding, context_stats = await _retrieve_context(query, file_ids)
+        chunk_ids = [hit['id'] for hit in hits]
+        with stage('answer_cache'):
+            cached = answer_cache.get(query, chunk_ids, query_embedding) if settings.ANSWER_CACHE_ENABLED else None
+        if cached:
+            answer, cache_tier = cached
+        else:
+            with stage('prompt_build'):
+                prompt = generate_rag_prompt(query, context)
+            with stage('generate'):
+                answer = await generate_answer_async(prompt)
+            cache_tier = None
+            if settings.ANSWER_CACHE_ENABLED:
+                answer_cache.put(query, chunk_ids, answer, query_embedding)
+    except HTTPException as e:
+        return JsonResponse({'detail': e.detail}, status=e.status_code)
+
+    # Save the chat history off the response path
+    _save_message_in_background(user, query, answer)
+
+    return JsonResponse({
+        "query": query,
+        "context": context,
+        "answer": answer,
+        "cached": cache_tier,
+        "context_tokens": context_stats
+    })
+
+
+@csrf_exempt
+@require_POST
+async def handle_query_stream_async(request):
+    """
+    Async implementation of `handle_query_stream` for deployments running `backend/asgi.py`. Tokens
+    are read from the generator in a worker thread, so no request thread is held while waiting for
+    Gemini and each token is sent as soon as it arrives.
+
+    Args:
+    request (HttpRequest): The HTTP request object with a JSON body containing `query` and `user_id`,
+        and optionally `file_ids` or `uploaded_by` to scope the search.
+
+    Returns:
+    StreamingHttpResponse: A `text/event-stream` response, or a JsonResponse with an error.
+    """
+    try:
+        user, query, file_ids = await _read_query_request(request)
+    except ParseError as e:
+        return JsonResponse({'detail': e.detail}, status=400)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400, safe=False)
+
+    try:
+        context, hits, query_embedding, context_stats = await _retrieve_context(query, file_ids)
+    except HTTPException as e:
+        return JsonResponse({'detail': e.detail}, status=e.status_code)
+    chunk_ids = [hit['id'] for hit in hits]
+    with stage('answer_cache'):
+        cached = answer_cache.get(query, chunk_ids, query_embedding) if settings.ANSWER_CACHE_ENABLED else None
+
+    async def events():
+        yield sse_event('context', {
+            'query': query, 'context': context, 'chunk_ids': chunk_ids, 'context_tokens': context_stats,
+        })
+
+        if cached:
+            answer, cache_tier = cached
+            yield sse_event('token', {'text': answer})
+        else:
+            cache_tier = None
+            pieces = []
+            with stage('prompt_build'):
+                prompt = generate_rag_prompt(query, context)
+            try:
+                with stage('generate'):
+                    async for piece in aiter_sync(stream_answer(prompt)):
+                        pieces.append(piece)
+                        yield sse_event('token', {'text': piece})
+            except Exception as e:
+                yield sse_event('error', {'detail': f"Error generating answer: {str(e)}"})
+                return
+            answer = "".join(pieces)
+            if settings.ANSWER_CACHE_ENABLED:
+                answer_cache.put(query, chunk_ids, answer, query_embedding)
+
+        # Save the chat history once the full answer is known
+        with stage('history_write'):
+            message = await sync_to_async(UserMessage.objects.create)(
+                user_id=user,
+                user_question=query,
+                bot_reply=answer
+            )
+        yield sse_event('done', {'answer': answer, 'message_id': message.id, 'cached': cache_tier})
+
+    return event_stream_response(events())
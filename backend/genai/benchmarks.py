@@ -0,0 +1,210 @@
+# Shared helpers for the benchmark management commands.
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+
+def percentile(values, pct):
+    """
+    Returns the `pct` percentile of `values` using linear interpolation.
+
+    Args:
+    values (list[float]): The samples.
+    pct (float): The percentile, between 0 and 100.
+
+    Returns:
+    float: The percentile value, or 0.0 when there are no samples.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(latencies, wall_time):
+    """
+    Summarises request latencies in milliseconds.
+
+    Args:
+    latencies (list[float]): The per-request latencies in seconds.
+    wall_time (float): The total wall time of the run in seconds.
+
+    Returns:
+    dict: Request count, p50/p95/p99/max latency in ms and throughput in requests per second.
+    """
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+        'qps': round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, name, parameters, results):
+    """
+    Writes benchmark results as JSON, tagged with the commit and host so runs can be compared.
+
+    Args:
+    path (str): The output file.
+    name (str): The benchmark name.
+    parameters (dict): The parameters the benchmark ran with.
+    results (dict): The measured results.
+    """
+    payload = {
+        'benchmark': name,
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'parameters': parameters,
+        'results': results,
+    }
+    with open(path, 'w') as output:
+        json.dump(payload, output, indent=2)
+
+
+SYNTHETIC_WORDS = (
+    "device", "configuration", "firmware", "network", "interface", "error", "code", "reset",
+    "procedure", "maintenance", "battery", "module", "sensor", "calibration", "voltage", "warning",
+    "install", "update", "manual", "section", "parameter", "default", "value", "range", "status",
+)
+
+
+def peak_rss_mb(children=False):
+    """
+    Returns the peak resident set size of this process so far, in megabytes. The value is a
+    high-water mark for the whole process lifetime, so measure each scenario in a fresh process.
+
+    Args:
+    children (bool): Report the largest peak among terminated and waited-for child processes
+        (e.g. parser workers) instead.
+
+    Returns:
+    float: The peak RSS, or 0.0 where `resource` is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def synthetic_texts(count, min_words=8, max_words=300, seed=0):
+    """
+    Generates deterministic pseudo-random texts of varying length from `SYNTHETIC_WORDS`, from
+    query-sized to longer than the embedder's token limit.
+
+    Args:
+    count (int): The number of texts.
+    min_words (int): The shortest text in words.
+    max_words (int): The longest text in words.
+    seed (int): Changes the generated text.
+
+    Returns:
+    list[str]: The texts.
+    """
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(SYNTHETIC_WORDS, k=rng.randint(min_words, max_words))) + f" ERR-{index:05d}"
+        for index in range(count)
+    ]
+
+
+def synthetic_vectors(count, dimension=384, clusters=200, noise=0.6, seed=0):
+    """
+    Generates unit vectors grouped around random centres, a rough stand-in for sentence
+    embeddings of a corpus with many topics.
+
+    Args:
+    count (int): The number of vectors.
+    dimension (int): The vector dimension (384 for MiniLM).
+    clusters (int): The number of topic centres.
+    noise (float): The spread around each centre.
+    seed (int): The random seed, so runs are repeatable.
+
+    Returns:
+    numpy.ndarray: A `(count, dimension)` float32 array of unit vectors.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + noise * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_synthetic_pdf(path, pages, words_per_page=400, seed=0):
+    """
+    Writes a text-only PDF with deterministic pseudo-random content, so ingestion benchmarks run
+    on identical input across commits without a PDF-generation dependency.
+
+    Args:
+    path (str): The output file.
+    pages (int): The number of pages.
+    words_per_page (int): The number of words on each page.
+    seed (int): Changes the generated text.
+    """
+    words_per_line = 12
+    objects = []
+    page_ids = []
+    # Objects 1 and 2 are the catalog and page tree, 3 is the font; pages start at 4
+    for page_number in range(pages):
+        rng = random.Random(seed * 1000003 + page_number)
+        lines = []
+        for line_start in range(0, words_per_page, words_per_line):
+            words = rng.choices(SYNTHETIC_WORDS, k=min(words_per_line, words_per_page - line_start))
+            if line_start == 0:
+                words = [f"Page {page_number + 1} code ERR-{seed}-{page_number:05d}"] + words
+            lines.append(" ".join(words))
+        text_ops = "\n".join(f"({_pdf_escape(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td\n{text_ops}\nET".encode('latin-1')
+
+        page_id = 4 + len(objects)
+        content_id = page_id + 1
+        page_ids.append(page_id)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode('latin-1')
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    header_objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode('latin-1'),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    with open(path, 'wb') as pdf:
+        pdf.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(header_objects + objects, start=1):
+            offsets.append(pdf.tell())
+            pdf.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = pdf.tell()
+        pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        for offset in offsets:
+            pdf.write(b"%010d 00000 n \n" % offset)
+        pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, xref_offset))
@@ -0,0 +1,235 @@
+# Assembles the prompt context from retrieved chunks. Neighbouring chunks share `CHUNK_OVERLAP`
+# characters and the same passage is often retrieved from several uploads, so the raw chunks
+# repeat a lot of text. The builder merges overlapping chunks of the same page, drops near
+# duplicates, picks a diverse set with maximal marginal relevance (MMR) and trims the result to a
+# token budget.
+import math
+import re
+
+import numpy as np
+
+from .retrieval import NO_CONTEXT_MESSAGE
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text, chars_per_token=4):
+    """
+    Estimates the number of LLM tokens in a text from its length.
+
+    Args:
+    text (str): The text.
+    chars_per_token (float): The average number of characters per token.
+
+    Returns:
+    int: The estimated token count.
+    """
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+def _page_key(metadata):
+    source, page = metadata.get('source'), metadata.get('page')
+    return None if source is None or page is None else (source, page)
+
+
+def _overlap_merge(first, second, min_overlap=16):
+    # Returns `first` extended by `second` when the start of `second` repeats the end of `first`
+    if second in first:
+        return first
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    position = first.find(probe)
+    while position != -1:
+        overlap = len(first) - position
+        if second[:overlap] == first[position:]:
+            return first + second[overlap:]
+        position = first.find(probe, position + 1)
+    return None
+
+
+def _shingles(text, size=3):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[index:index + size]) for index in range(len(words) - size + 1)}
+
+
+def _jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def merge_overlapping(hits):
+    """
+    Merges retrieved chunks of the same page whose text overlaps, e.g. neighbours produced by the
+    splitter's overlap, into one block.
+
+    Args:
+    hits (list[dict]): The hits in rank order, with `id`, `text`, `metadata` and optionally
+        `embedding`.
+
+    Returns:
+    list[dict]: Blocks in rank order of their best chunk, each with `ids`, `text`, `rank` and
+    `embedding` (the normalised mean of its chunks' embeddings, or None).
+    """
+    blocks = []
+    for rank, hit in enumerate(hits):
+        embedding = hit.get('embedding')
+        block = {
+            'ids': [hit['id']],
+            'text': hit['text'],
+            'rank': rank,
+            'page': _page_key(hit.get('metadata') or {}),
+            'embeddings': [_unit(embedding)] if embedding is not None else [],
+        }
+        # A new chunk can bridge two blocks, so keep merging until nothing changes
+        merged = True
+        while merged:
+            merged = False
+            for other in blocks:
+                if block['page'] is None or other['page'] != block['page']:
+                    continue
+                text = _overlap_merge(other['text'], block['text']) or _overlap_merge(block['text'], other['text'])
+                if text is None:
+                    continue
+                blocks.remove(other)
+                block = {
+                    'ids': other['ids'] + block['ids'],
+                    'text': text,
+                    'rank': min(other['rank'], block['rank']),
+                    'page': block['page'],
+                    'embeddings': other['embeddings'] + block['embeddings'],
+                }
+                merged = True
+                break
+        blocks.append(block)
+
+    blocks.sort(key=lambda block: block['rank'])
+    for block in blocks:
+        embeddings = block.pop('embeddings')
+        block['embedding'] = _unit(np.mean(embeddings, axis=0)) if embeddings else None
+    return blocks
+
+
+def drop_near_duplicates(blocks, threshold=0.8):
+    """
+    Drops blocks whose text is contained in, or nearly the same as, a better-ranked block.
+
+    Args:
+    blocks (list[dict]): The blocks in rank order.
+    threshold (float): The word-trigram Jaccard similarity above which two blocks are duplicates.
+
+    Returns:
+    list[dict]: The remaining blocks in rank order, each with its `shingles`.
+    """
+    kept = []
+    for block in blocks:
+        block['shingles'] = _shingles(block['text'])
+        if any(
+            block['text'] in other['text'] or _jaccard(block['shingles'], other['shingles']) >= threshold
+            for other in kept
+        ):
+            continue
+        kept.append(block)
+    return kept
+
+
+def _similarity(first, second):
+    if first['embedding'] is not None and second['embedding'] is not None:
+        return float(first['embedding'] @ second['embedding'])
+    return _jaccard(first['shingles'], second['shingles'])
+
+
+def select_mmr(blocks, query_embedding, budget, mmr_lambda=0.7, chars_per_token=4):
+    """
+    Picks blocks by maximal marginal relevance until the token budget is used up: each step takes
+    the block maximising `mmr_lambda * relevance - (1 - mmr_lambda) * similarity to the picked
+    blocks`. Blocks that no longer fit are skipped; if not even the best block fits, it is cut at
+    a word boundary.
+
+    Args:
+    blocks (list[dict]): The candidate blocks in rank order.
+    query_embedding (list[float]): The embedded query, or None to rank by retrieval order.
+    budget (int): The maximum number of context tokens.
+    mmr_lambda (float): The trade-off between relevance (1.0) and diversity (0.0).
+    chars_per_token (float): Passed to `estimate_tokens`.
+
+    Returns:
+    list[dict]: The selected blocks in selection order.
+    """
+    query = _unit(query_embedding) if query_embedding is not None else None
+    for block in blocks:
+        if query is not None and block['embedding'] is not None:
+            block['relevance'] = float(block['embedding'] @ query)
+        else:
+            # Without embeddings fall back to the fused retrieval rank
+            block['relevance'] = 1.0 - block['rank'] / max(len(blocks), 1)
+        block['tokens'] = estimate_tokens(block['text'], chars_per_token)
+
+    selected = []
+    remaining = list(blocks)
+    used = 0
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda block: mmr_lambda * block['relevance'] - (1 - mmr_lambda) * max(
+                (_similarity(block, other) for other in selected), default=0.0
+            ),
+        )
+        remaining.remove(best)
+        if used + best['tokens'] <= budget:
+            selected.append(best)
+            used += best['tokens']
+        elif not selected:
+            text = best['text'][:int(budget * chars_per_token)]
+            best = {**best, 'text': text.rsplit(' ', 1)[0] if ' ' in text else text}
+            best['tokens'] = estimate_tokens(best['text'], chars_per_token)
+            selected.append(best)
+            used += best['tokens']
+    return selected
+
+
+def assemble_context(hits, query_embedding, budget, baseline_k=6, mmr_lambda=0.7, duplicate_threshold=0.8,
+                     chars_per_token=4):
+    """
+    Builds the prompt context from retrieved chunks: merge overlapping chunks of the same page,
+    drop near duplicates, select with MMR and trim to the token budget.
+
+    Args:
+    hits (list[dict]): The hits in rank order.
+    query_embedding (list[float]): The embedded query.
+    budget (int): The maximum number of context tokens.
+    baseline_k (int): The number of raw chunks the context used to be made of; the savings are
+        reported against their concatenation.
+    mmr_lambda (float): The MMR trade-off between relevance and diversity.
+    duplicate_threshold (float): The Jaccard similarity above which blocks are duplicates.
+    chars_per_token (float): Passed to `estimate_tokens`.
+
+    Returns:
+    tuple: `(context, stats)`, where `stats` has the `chunks` retrieved, the `blocks` used, and the
+    `baseline_tokens`, `context_tokens` and `tokens_saved` (baseline minus context; negative when the
+    context is larger than the baseline).
+    """
+    baseline_tokens = estimate_tokens("\n".join(hit['text'] for hit in hits[:baseline_k]), chars_per_token)
+    blocks = drop_near_duplicates(merge_overlapping(hits), duplicate_threshold)
+    selected = select_mmr(blocks, query_embedding, budget, mmr_lambda, chars_per_token)
+
+    context = "\n\n".join(block['text'].strip() for block in selected).strip()
+    context_tokens = estimate_tokens(context, chars_per_token)
+    stats = {
+        'chunks': len(hits),
+        'blocks': len(selected),
+        'baseline_tokens': baseline_tokens,
+        'context_tokens': context_tokens,
+        'tokens_saved': baseline_tokens - context_tokens,
+    }
+    return context or NO_CONTEXT_MESSAGE, stats
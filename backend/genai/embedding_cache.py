@@ -0,0 +1,189 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def normalize_text(text):
+    """
+    Normalizes text before hashing so chunks that only differ in whitespace share a cache entry.
+
+    Args:
+    text (str): The text to normalize.
+
+    Returns:
+    str: The text with runs of whitespace collapsed and the ends stripped.
+    """
+    return " ".join(text.split())
+
+
+def cache_namespace(model_name, backend='torch', model_path=None):
+    """
+    Builds the cache key namespace of an embedding runtime. Vectors computed by different backends
+    or model files (e.g. the float32 and int8 ONNX exports) differ slightly, so each gets its own
+    entries.
+
+    Args:
+    model_name (str): The HuggingFace model name.
+    backend (str): The runtime, 'torch' or 'onnx'.
+    model_path (str): The exported model file, for the 'onnx' backend. Its name and a hash of its
+        content are part of the namespace, so a re-export does not reuse the old vectors.
+
+    Returns:
+    str: The namespace passed to `get_many` and `put_many`.
+    """
+    if model_path is None:
+        return f"{model_name}:{backend}"
+    hasher = hashlib.sha256()
+    with open(model_path, 'rb') as model_file:
+        for block in iter(lambda: model_file.read(1024 * 1024), b''):
+            hasher.update(block)
+    return f"{model_name}:{backend}:{os.path.basename(model_path)}:{hasher.hexdigest()[:16]}"
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (namespace, normalized text hash), where the namespace
+    identifies the model and runtime (see `cache_namespace`). Vectors are stored as
+    compact float16 or float32 blobs in a SQLite file, which is safe to share between worker
+    processes. When the cache grows past `max_entries`, the least recently used entries are evicted.
+    Last-use times are only refreshed when older than `TOUCH_INTERVAL`, so hits rarely write, and
+    the size is only checked after each 5% of `max_entries` inserted, so the file can briefly overshoot.
+
+    Args:
+    path (str): The SQLite database file.
+    max_entries (int): The maximum number of vectors kept on disk.
+    dtype (str): The storage dtype, 'float16' or 'float32'.
+    """
+
+    # Eviction trims the cache to this fraction of max_entries so it does not run on every write
+    EVICTION_TARGET = 0.9
+    # Seconds a hit may leave last_used stale; LRU order only needs to be roughly right
+    TOUCH_INTERVAL = 3600
+
+    def __init__(self, path, max_entries=500000, dtype='float16'):
+        self.path = path
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        # Rows written since the size was last checked, and how many may be written between checks
+        self._unchecked_inserts = 0
+        self._eviction_interval = max(1, (max_entries - int(max_entries * self.EVICTION_TARGET)) // 2)
+
+    @property
+    def connection(self):
+        # SQLite connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._local.connection = conn
+        return conn
+
+    @staticmethod
+    def make_key(namespace, text):
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def get_many(self, namespace, texts):
+        """
+        Looks up cached vectors for the given texts.
+
+        Args:
+        namespace (str): The model and runtime the vectors were computed with (`cache_namespace`).
+        texts (list[str]): The texts to look up.
+
+        Returns:
+        list: One float32 vector (as a list) per text, or None where the text is not cached.
+        """
+        keys = [self.make_key(namespace, text) for text in texts]
+        found = {}
+        stale = []
+        now = time.time()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, vector, last_used in rows:
+                found[key] = vector
+                if last_used < now - self.TOUCH_INTERVAL:
+                    stale.append((now, key))
+
+        if stale:
+            with self.connection:
+                self.connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", stale)
+
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return [
+            np.frombuffer(found[key], dtype=self.dtype).astype(np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, namespace, texts, vectors):
+        """
+        Stores vectors for the given texts and evicts old entries if the cache is full.
+
+        Args:
+        namespace (str): The model and runtime the vectors were computed with (`cache_namespace`).
+        texts (list[str]): The embedded texts.
+        vectors (list): The vectors, in the same order as `texts`.
+        """
+        now = time.time()
+        rows = [
+            (self.make_key(namespace, text), np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+        with self._stats_lock:
+            self._unchecked_inserts += len(rows)
+            if self._unchecked_inserts < self._eviction_interval:
+                return
+            self._unchecked_inserts = 0
+        self._evict()
+
+    def _evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * self.EVICTION_TARGET)
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self):
+        """
+        Returns hit/miss counters for this process.
+
+        Returns:
+        dict: The hit and miss counts and the hit rate.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,203 @@
+import os
+import threading
+
+from django.conf import settings
+
+from .embedding_cache import EmbeddingCache, cache_namespace
+from .query_batcher import QueryBatcher
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding service shared by document ingestion and query retrieval.
+    The underlying sentence-transformers model is loaded lazily on first use and only once,
+    so every caller in the process reuses the same weights. It implements the Langchain
+    embeddings interface (`embed_documents` / `embed_query`) without importing Langchain.
+
+    Args:
+    model_name (str): The HuggingFace model used to compute embeddings.
+    batch_size (int): The number of texts encoded per forward pass.
+    num_threads (int): The number of CPU threads used by torch or ONNX Runtime, or 0 to keep the
+        default.
+    cache (EmbeddingCache): Optional persistent cache consulted before running the model.
+    query_batch_size (int): The most concurrent queries embedded in one forward pass, or 0 to
+        embed each query on its own.
+    query_batch_wait_ms (float): How long a query waits for others to join its batch.
+    backend (str): 'torch' runs the model through sentence-transformers; 'onnx' runs the model
+        exported by `manage.py export_onnx_embedder` and never imports torch.
+    onnx_dir (str): The directory of the exported model, for the 'onnx' backend.
+    onnx_file (str): The model file in `onnx_dir`, e.g. the int8 `model_int8.onnx`.
+    """
+
+    def __init__(self, model_name, batch_size=32, num_threads=0, cache=None, query_batch_size=0,
+                 query_batch_wait_ms=5, backend='torch', onnx_dir=None, onnx_file=None):
+        if backend not in ('torch', 'onnx'):
+            raise ValueError("EmbeddingService backend must be 'torch' or 'onnx'.")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache = cache
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.onnx_file = onnx_file
+        self.query_batcher = None
+        if query_batch_size:
+            self.query_batcher = QueryBatcher(
+                lambda texts: self.model.embed_documents(texts),
+                max_batch_size=query_batch_size,
+                max_wait_ms=query_batch_wait_ms,
+                name=model_name,
+            )
+        self._model = None
+        self._cache_namespace = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        """
+        Returns the loaded embedding model, loading it on first access.
+        """
+        if self._model is None:
+            with self._lock:
+                # Re-check inside the lock so concurrent callers load the model only once
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def cache_namespace(self):
+        """
+        Returns the embedding cache namespace: the model name, the backend and, for ONNX, the model
+        file and a hash of its content.
+        """
+        if self._cache_namespace is None:
+            model_path = None
+            if self.backend == 'onnx':
+                model_path = os.path.join(self.onnx_dir, self._onnx_file())
+            self._cache_namespace = cache_namespace(self.model_name, self.backend, model_path)
+        return self._cache_namespace
+
+    def _onnx_file(self):
+        from .onnx_embeddings import QUANTIZED_MODEL_FILE
+
+        return self.onnx_file or QUANTIZED_MODEL_FILE
+
+    def _load_model(self):
+        if self.backend == 'onnx':
+            from .onnx_embeddings import OnnxEmbeddings
+
+            return OnnxEmbeddings(
+                self.onnx_dir,
+                model_file=self._onnx_file(),
+                batch_size=self.batch_size,
+                num_threads=self.num_threads,
+            )
+
+        from langchain.embeddings import HuggingFaceEmbeddings
+
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'batch_size': self.batch_size},
+        )
+
+    def embed_documents(self, texts):
+        """
+        Embeds a list of document chunks in batches of `batch_size`. Texts already in the
+        embedding cache are not sent to the model.
+
+        Args:
+        texts (list[str]): The texts to embed.
+
+        Returns:
+        list[list[float]]: One embedding per input text.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return self.model.embed_documents(texts)
+
+        vectors = self.cache.get_many(self.cache_namespace, texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            computed = self.model.embed_documents(missing_texts)
+            self.cache.put_many(self.cache_namespace, missing_texts, computed)
+            for index, vector in zip(missing, computed):
+                vectors[index] = vector
+        return vectors
+
+    def _embed_query_uncached(self, text):
+        if self.query_batcher is not None:
+            return self.query_batcher.embed(text)
+        return self.model.embed_query(text)
+
+    def embed_query(self, text):
+        """
+        Embeds a single query string, going through the embedding cache when one is configured.
+        Cache misses are micro-batched with concurrent queries when `query_batch_size` is set.
+
+        Args:
+        text (str): The query to embed.
+
+        Returns:
+        list[float]: The query embedding.
+        """
+        if self.cache is None:
+            return self._embed_query_uncached(text)
+
+        vector = self.cache.get_many(self.cache_namespace, [text])[0]
+        if vector is None:
+            vector = self._embed_query_uncached(text)
+            self.cache.put_many(self.cache_namespace, [text], [vector])
+        return vector
+
+    def warm_up(self):
+        """
+        Loads the model and runs one throwaway forward pass so the first real request
+        does not pay for model loading or lazy kernel initialisation.
+        """
+        self.model.embed_query("warm up")
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """
+    Returns the embedding service for this process, creating it on first call.
+
+    Returns:
+    EmbeddingService: The shared embedding service.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                cache = None
+                if settings.EMBEDDING_CACHE_PATH:
+                    cache = EmbeddingCache(
+                        settings.EMBEDDING_CACHE_PATH,
+                        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                        dtype=settings.EMBEDDING_CACHE_DTYPE,
+                    )
+                _service = EmbeddingService(
+                    model_name=settings.EMBEDDING_MODEL_NAME,
+                    batch_size=settings.EMBEDDING_BATCH_SIZE,
+                    num_threads=settings.EMBEDDING_NUM_THREADS,
+                    cache=cache,
+                    query_batch_size=settings.QUERY_EMBEDDING_BATCH_SIZE,
+                    query_batch_wait_ms=settings.QUERY_EMBEDDING_BATCH_WAIT_MS,
+                    backend=settings.EMBEDDING_BACKEND,
+                    onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                    onnx_file=settings.EMBEDDING_ONNX_FILE,
+                )
+    return _service
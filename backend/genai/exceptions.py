@@ -0,0 +1,17 @@
+from rest_framework.exceptions import APIException
+
+
+class HTTPException(APIException):
+    """
+    Error raised by the query pipeline. It keeps the `HTTPException(status_code=..., detail=...)`
+    signature the views used with FastAPI, but is a DRF exception, so DRF renders it as a JSON
+    error response and importing it does not pull in FastAPI.
+
+    Args:
+    status_code (int): The HTTP status code of the error response.
+    detail (str): The error message.
+    """
+
+    def __init__(self, status_code=500, detail=None):
+        self.status_code = status_code
+        super().__init__(detail=detail)
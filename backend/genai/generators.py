@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseGenerator:
+    """
+    Interface of an answer generator backend. Backends are selected with the `GENAI_GENERATOR`
+    setting, which names the class in `BACKEND` and passes `OPTIONS` to its constructor.
+    """
+
+    def generate(self, prompt):
+        """
+        Generates the full answer for a prompt.
+
+        Args:
+        prompt (str): The prompt built by `generate_rag_prompt`.
+
+        Returns:
+        str: The generated answer.
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """
+        Generates the answer for a prompt piece by piece. Defaults to one piece.
+
+        Args:
+        prompt (str): The prompt built by `generate_rag_prompt`.
+
+        Yields:
+        str: Pieces of the answer as soon as they are produced.
+        """
+        yield self.generate(prompt)
+
+    async def agenerate(self, prompt):
+        """
+        Async variant of `generate`. Defaults to running `generate` in a thread.
+
+        Args:
+        prompt (str): The prompt built by `generate_rag_prompt`.
+
+        Returns:
+        str: The generated answer.
+        """
+        return await asyncio.to_thread(self.generate, prompt)
+
+    @property
+    def is_loaded(self):
+        return True
+
+    def warm_up(self):
+        pass
+
+
+class GeminiGenerator(BaseGenerator):
+    """
+    Generates answers with the Google Gemini API.
+
+    Args:
+    model_name (str): The Gemini model to call.
+    """
+
+    def __init__(self, model_name="gemini-pro"):
+        self.model_name = model_name
+
+    def _model(self):
+        from .resources import get_gemini
+
+        return get_gemini().GenerativeModel(model_name=self.model_name)
+
+    def generate(self, prompt):
+        return self._model().generate_content(prompt).text
+
+    def stream(self, prompt):
+        for chunk in self._model().generate_content(prompt, stream=True):
+            # Chunks without candidate parts (e.g. safety metadata only) have no text
+            if chunk.parts:
+                yield chunk.text
+
+    async def agenerate(self, prompt):
+        response = await self._model().generate_content_async(prompt)
+        return response.text
+
+    @property
+    def is_loaded(self):
+        from . import resources
+
+        return resources._gemini is not None
+
+    def warm_up(self):
+        from .resources import get_gemini
+
+        get_gemini()
+
+
+class FakeGenerator(BaseGenerator):
+    """
+    Deterministic local stand-in for load and latency benchmarks. It needs no network access:
+    the answer is derived from a hash of the prompt, and timing follows a fixed time to first
+    token plus a constant token rate, so benchmark runs are repeatable.
+
+    Args:
+    first_token_latency (float): Seconds before the first token is produced.
+    tokens_per_second (float): The rate at which the remaining tokens are produced; 0 means instant.
+    answer_tokens (int): The number of tokens in every answer.
+    """
+
+    VOCABULARY = (
+        "the", "document", "context", "answer", "based", "on", "provided", "manual", "section",
+        "describes", "configuration", "step", "value", "error", "code", "system", "user", "page",
+    )
+
+    def __init__(self, first_token_latency=0.5, tokens_per_second=50.0, answer_tokens=120):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+
+    def _tokens(self, prompt):
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        return [
+            self.VOCABULARY[digest[index % len(digest)] % len(self.VOCABULARY)]
+            for index in range(self.answer_tokens)
+        ]
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def stream(self, prompt):
+        tokens = self._tokens(prompt)
+        time.sleep(self.first_token_latency)
+        delay = self._token_delay()
+        for index, token in enumerate(tokens):
+            if index and delay:
+                time.sleep(delay)
+            yield token if index == 0 else " " + token
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt))
+
+    async def agenerate(self, prompt):
+        tokens = self._tokens(prompt)
+        await asyncio.sleep(self.first_token_latency + self._token_delay() * max(len(tokens) - 1, 0))
+        return " ".join(tokens)
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    """
+    Returns the answer generator configured by `GENAI_GENERATOR`, creating it on first call.
+
+    Returns:
+    BaseGenerator: The generator backend for this process.
+    """
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                config = settings.GENAI_GENERATOR
+                _generator = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _generator
+
+
+def set_generator(generator):
+    """
+    Replaces the generator for this process, e.g. to run a benchmark against `FakeGenerator`.
+
+    Args:
+    generator (BaseGenerator): The generator to use from now on.
+    """
+    global _generator
+    with _generator_lock:
+        _generator = generator
@@ -0,0 +1,272 @@
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from users.models import File
+from .embeddings import get_embedding_service
+from .metrics import stage, timed_iter
+from .models import FileChunk
+from .parsing import iter_cached_pages, iter_chunks, make_text_splitter
+from .resources import get_vector_db
+from .sparse_index import index_chunks, unindex_chunks
+
+
+class IngestionCancelled(Exception):
+    """
+    Raised inside `ragLLL` when the owning job has been cancelled.
+    """
+
+
+def _noop_progress(stage, **counters):
+    pass
+
+
+def _never_cancel():
+    return False
+
+
+def content_hash(text):
+    """
+    Returns the deterministic ID of a chunk: the SHA-256 of its text. The same text always maps
+    to the same vector ID, which makes re-ingestion idempotent.
+
+    Args:
+    text (str): The chunk text.
+
+    Returns:
+    str: The hex digest used as the Chroma document ID.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def batched(iterable, size):
+    """
+    Groups an iterable into lists of at most `size` items without materialising it.
+
+    Args:
+    iterable (iterable): The items to group.
+    size (int): The maximum batch size.
+
+    Yields:
+    list: The next batch of items.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_chunks(file_id, chunks, progress=None, should_cancel=None, counters=None):
+    """
+    Writes a stream of chunks for one file into the vector store in embedding batches. This is
+    the single writer shared by `ragLLL` and bulk ingestion. Chunks are stored under content-hash
+    IDs and ingestion is incremental: chunks the file already references are skipped, chunks
+    already stored for another upload are reused without being embedded again, and chunks the
+    file no longer contains are removed.
+
+    New vectors record the `file_id`, uploader (`uploaded_by`) and `page` that first produced
+    them. Because a vector can be shared by several files, the store also records every file
+    referencing it (`set_file_membership`), which scoped queries filter on.
+
+    Args:
+    file_id (int): The ID of the file the chunks belong to.
+    chunks (iterable): The chunk documents, consumed lazily.
+    progress (callable): Optional callback invoked as `progress(stage, **counters)`.
+    should_cancel (callable): Optional callback returning True when processing should stop.
+    counters (dict): Optional progress counters updated in place; `pages_parsed` may be
+        advanced by the producer of `chunks`.
+
+    Returns:
+    dict: The document count and how many chunks were added, reused, kept and removed.
+
+    Raises:
+    IngestionCancelled: If `should_cancel` returned True; vectors already written are removed.
+    """
+    progress = progress or _noop_progress
+    should_cancel = should_cancel or _never_cancel
+    if counters is None:
+        counters = {}
+    counters.setdefault('pages_parsed', 0)
+    counters.setdefault('chunks_embedded', 0)
+    counters.setdefault('vectors_written', 0)
+
+    vectorstore = get_vector_db()
+    uploaded_by = File.objects.filter(id=file_id).values_list('user_id', flat=True).first()
+
+    known_hashes = set(FileChunk.objects.filter(file_id=file_id).values_list('content_hash', flat=True))
+    seen_hashes = set()
+    new_refs = []
+    written_ids = []
+    tagged_ids = []  # Vectors of other files this file started sharing in this run
+    reused = 0
+
+    try:
+        for batch in timed_iter(batched(chunks, settings.EMBEDDING_BATCH_SIZE), 'ingest_parse_split'):
+            if should_cancel():
+                raise IngestionCancelled()
+
+            # Keep the first occurrence of each chunk the file does not reference yet
+            fresh = {}
+            unchanged = []
+            for doc in batch:
+                chunk_hash = content_hash(doc.page_content)
+                if chunk_hash in seen_hashes:
+                    continue
+                seen_hashes.add(chunk_hash)
+                if chunk_hash in known_hashes:
+                    unchanged.append(chunk_hash)
+                else:
+                    fresh[chunk_hash] = doc
+
+            # Embed and write only chunks missing from the store
+            present = vectorstore.existing_ids(list(fresh))
+            missing = [chunk_hash for chunk_hash in fresh if chunk_hash not in present]
+            reused += len(present)
+            if missing:
+                docs = [fresh[chunk_hash] for chunk_hash in missing]
+                texts = [doc.page_content for doc in docs]
+                with stage('ingest_embed'):
+                    vectors = get_embedding_service().embed_documents(texts)
+                with stage('ingest_write'):
+                    vectorstore.upsert(
+                        missing,
+                        vectors,
+                        texts,
+                        [{**doc.metadata, 'file_id': file_id, 'uploaded_by': uploaded_by} for doc in docs],
+                    )
+                written_ids.extend(missing)
+                index_chunks(missing, texts)
+            # Marking unchanged chunks too backfills vectors written before membership existed
+            with stage('ingest_write'):
+                vectorstore.set_file_membership(missing + list(present) + unchanged, file_id, True)
+            tagged_ids.extend(present)
+            with stage('ingest_db_write'):
+                FileChunk.objects.bulk_create(
+                    [FileChunk(file_id_id=file_id, content_hash=chunk_hash) for chunk_hash in fresh],
+                    ignore_conflicts=True,
+                )
+            new_refs.extend(fresh)
+
+            counters['chunks_embedded'] += len(missing)
+            counters['vectors_written'] += len(missing)
+            progress('embedding', **counters)
+    except Exception:
+        # Roll back a partial write so a failed or cancelled job leaves no orphan vectors.
+        # Vectors another file has started referencing in the meantime are kept.
+        FileChunk.objects.filter(file_id=file_id, content_hash__in=new_refs).delete()
+        orphaned = set(written_ids) - set(
+            FileChunk.objects.filter(content_hash__in=written_ids).values_list('content_hash', flat=True)
+        )
+        if orphaned:
+            vectorstore.delete(list(orphaned))
+            unindex_chunks(orphaned)
+        untagged = [chunk_hash for chunk_hash in tagged_ids if chunk_hash not in orphaned]
+        vectorstore.set_file_membership(untagged, file_id, False)
+        raise
+
+    progress('committing', **counters)
+    stale_hashes = known_hashes - seen_hashes
+    with transaction.atomic():
+        FileChunk.objects.filter(file_id=file_id, content_hash__in=stale_hashes).delete()
+        # Stale vectors are only dropped when no other file still shares them
+        still_shared = set(
+            FileChunk.objects.filter(content_hash__in=stale_hashes).values_list('content_hash', flat=True)
+        )
+    removable = list(stale_hashes - still_shared)
+    if removable:
+        vectorstore.delete(removable)
+        unindex_chunks(removable)
+    vectorstore.set_file_membership(list(stale_hashes & still_shared), file_id, False)
+
+    # Get the count of documents in the collection
+    doc_count = vectorstore.count()
+
+    return {
+        'document_count': doc_count,
+        'page_count': counters['pages_parsed'],
+        'chunk_count': len(seen_hashes),
+        'chunks_added': len(written_ids),
+        'chunks_reused': reused,
+        'chunks_unchanged': len(seen_hashes) - len(new_refs),
+        'chunks_removed': len(removable),
+    }
+
+
+def link_file_chunks(file_id, source_file_id):
+    """
+    Makes a file reference every chunk of another file without parsing or embedding anything,
+    for uploads whose content is identical to an earlier one. The chunks are recorded for the
+    file and the file is added to the membership of their vectors, so scoped queries find it.
+
+    Args:
+    file_id (int): The ID of the new file.
+    source_file_id (int): The ID of the file with the same content.
+
+    Returns:
+    int: The number of chunks linked.
+    """
+    hashes = list(FileChunk.objects.filter(file_id=source_file_id).values_list('content_hash', flat=True))
+    if not hashes:
+        return 0
+    vectorstore = get_vector_db()
+    for batch in batched(hashes, 1000):
+        vectorstore.set_file_membership(batch, file_id, True)
+        FileChunk.objects.bulk_create(
+            [FileChunk(file_id_id=file_id, content_hash=chunk_hash) for chunk_hash in batch],
+            ignore_conflicts=True,
+        )
+    return len(hashes)
+
+
+def ragLLL(file_path, file_id, progress=None, should_cancel=None, sha256=None, chunk_size=None,
+           chunk_overlap=None, artifact_dir=None):
+    """
+    Processes the provided file for RAG LLL (Retrieve and Generate) using Langchain.
+    The document is streamed through a load page -> split -> embed batch -> upsert batch
+    pipeline, so memory use does not grow with the page count and the first vectors are
+    queryable before the last page is parsed. Pages come from the parsed-document artifact when
+    one exists (see `parsing.iter_cached_pages`). Marking the file as raged is left to the caller,
+    so it only happens once the whole document has been written.
+
+    Args:
+    file_path (str): The file path of the uploaded document.
+    file_id (int): The ID of the file being processed.
+    progress (callable): Optional callback invoked as `progress(stage, **counters)`.
+    should_cancel (callable): Optional callback returning True when processing should stop.
+    sha256 (str): The SHA-256 of the file if known, to find its artifact without hashing it.
+    chunk_size (int): Overrides `CHUNK_SIZE`, e.g. when re-chunking.
+    chunk_overlap (int): Overrides `CHUNK_OVERLAP`.
+    artifact_dir (str): Overrides `PARSED_ARTIFACTS_DIR`, e.g. for a bulk run's artifacts.
+
+    Returns:
+    dict: The document count and how many chunks were added, reused, kept and removed.
+
+    Raises:
+    IngestionCancelled: If `should_cancel` returned True; vectors already written are removed.
+    Exception: If any error occurs during the processing of the file.
+    """
+    counters = {'pages_parsed': 0}
+
+    def pages():
+        for page in iter_cached_pages(file_path, artifact_dir or settings.PARSED_ARTIFACTS_DIR, sha256):
+            counters['pages_parsed'] += 1
+            yield page
+
+    text_splitter = make_text_splitter(
+        chunk_size or settings.CHUNK_SIZE,
+        settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
+    )
+
+    if progress:
+        progress('parsing')
+    return ingest_chunks(
+        file_id,
+        iter_chunks(pages(), text_splitter),
+        progress=progress,
+        should_cancel=should_cancel,
+        counters=counters,
+    )
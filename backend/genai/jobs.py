@@ -0,0 +1,337 @@
+import datetime
+import multiprocessing
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from users.models import File
+from .ingestion import IngestionCancelled, ragLLL
+from .models import BulkIngestion, IngestionJob
+from .parsing import parse_to_artifact
+
+
+# How often a bulk run refreshes the heartbeat of its jobs while they wait for a parser
+BULK_HEARTBEAT_SECONDS = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the process-local worker pool that runs ingestion jobs, creating it on first use.
+
+    Returns:
+    ThreadPoolExecutor: The shared ingestion worker pool.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.INGESTION_WORKERS,
+                    thread_name_prefix='ingestion',
+                )
+    return _executor
+
+
+def _stale_before():
+    return timezone.now() - datetime.timedelta(seconds=settings.INGESTION_JOB_TIMEOUT)
+
+
+def recover_stale_jobs(file_ids=None):
+    """
+    Fails running jobs whose worker stopped reporting progress, e.g. because its process was
+    restarted. Running jobs refresh `updated_at` at every batch, so a job silent for longer than
+    `INGESTION_JOB_TIMEOUT` seconds is assumed dead and no longer blocks its file.
+
+    Args:
+    file_ids (list[int]): Optionally only look at the jobs of these files.
+
+    Returns:
+    int: The number of jobs marked as failed.
+    """
+    jobs = IngestionJob.objects.filter(status=IngestionJob.STATUS_RUNNING, updated_at__lt=_stale_before())
+    if file_ids is not None:
+        jobs = jobs.filter(file_id__in=file_ids)
+    return jobs.update(
+        status=IngestionJob.STATUS_FAILED,
+        error="The ingestion worker stopped responding.",
+        updated_at=timezone.now(),
+    )
+
+
+def requeue_queued_jobs():
+    """
+    Hands every queued job to this process's worker pool. Jobs queued in a process that has since
+    exited would otherwise stay queued forever; a job still queued elsewhere is harmless to submit
+    twice because workers claim jobs atomically.
+
+    Returns:
+    int: The number of jobs submitted.
+    """
+    job_ids = list(IngestionJob.objects.filter(status=IngestionJob.STATUS_QUEUED).values_list('id', flat=True))
+    for job_id in job_ids:
+        get_executor().submit(run_ingestion_job, job_id)
+    return len(job_ids)
+
+
+def enqueue_ingestion(uploaded_file, chunk_size=None, chunk_overlap=None):
+    """
+    Queues an ingestion job for the given file. If the file already has a queued or running
+    job, that job is returned instead of starting a second one. The check and the insert run
+    under a lock on the file row, so concurrent requests cannot both enqueue.
+
+    Args:
+    uploaded_file (File): The file to ingest.
+    chunk_size (int): Overrides `CHUNK_SIZE` for this job, e.g. when re-chunking.
+    chunk_overlap (int): Overrides `CHUNK_OVERLAP` for this job.
+
+    Returns:
+    IngestionJob: The queued (or already active) job.
+    """
+    with transaction.atomic():
+        File.objects.select_for_update().filter(id=uploaded_file.id).first()
+        recover_stale_jobs(file_ids=[uploaded_file.id])
+        active_job = IngestionJob.objects.filter(
+            file_id=uploaded_file, status__in=IngestionJob.ACTIVE_STATUSES
+        ).first()
+        if active_job:
+            if active_job.status == IngestionJob.STATUS_QUEUED and active_job.updated_at < _stale_before():
+                # Queued by a process that is gone; the claim makes a second submission safe
+                IngestionJob.objects.filter(id=active_job.id).update(updated_at=timezone.now())
+                transaction.on_commit(lambda: get_executor().submit(run_ingestion_job, active_job.id))
+            return active_job
+
+        job = IngestionJob.objects.create(file_id=uploaded_file, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        # Only hand the job to a worker once its row is visible to other connections
+        transaction.on_commit(lambda: get_executor().submit(run_ingestion_job, job.id))
+        return job
+
+
+def enqueue_bulk_ingestion(files):
+    """
+    Queues one bulk run covering the given files. Each file gets its own IngestionJob so it can
+    be polled and cancelled individually; files that already have an active job are skipped.
+
+    Args:
+    files (iterable): The File instances to ingest.
+
+    Returns:
+    BulkIngestion: The queued bulk run.
+    """
+    with transaction.atomic():
+        file_ids = [uploaded_file.id for uploaded_file in files]
+        list(File.objects.select_for_update().filter(id__in=file_ids).values_list('id', flat=True))
+        recover_stale_jobs(file_ids=file_ids)
+        busy_file_ids = set(
+            IngestionJob.objects.filter(
+                file_id__in=file_ids, status__in=IngestionJob.ACTIVE_STATUSES
+            ).values_list('file_id', flat=True)
+        )
+        files = [uploaded_file for uploaded_file in files if uploaded_file.id not in busy_file_ids]
+
+        bulk = BulkIngestion.objects.create(files_total=len(files))
+        IngestionJob.objects.bulk_create([IngestionJob(file_id=uploaded_file, bulk_id=bulk) for uploaded_file in files])
+        transaction.on_commit(lambda: get_executor().submit(run_bulk_ingestion, bulk.id))
+        return bulk
+
+
+def cancel_job(job):
+    """
+    Requests cancellation of a job. Queued jobs are cancelled immediately; running jobs stop
+    at the next batch boundary and roll back the vectors they already wrote.
+
+    Args:
+    job (IngestionJob): The job to cancel.
+
+    Returns:
+    bool: True if the job was still active and cancellation was requested.
+    """
+    if job.status not in IngestionJob.ACTIVE_STATUSES:
+        return False
+    IngestionJob.objects.filter(id=job.id).update(cancel_requested=True)
+    IngestionJob.objects.filter(id=job.id, status=IngestionJob.STATUS_QUEUED).update(
+        status=IngestionJob.STATUS_CANCELLED
+    )
+    return True
+
+
+def cancel_bulk(bulk):
+    """
+    Requests cancellation of every job of a bulk run that has not finished yet.
+
+    Args:
+    bulk (BulkIngestion): The bulk run to cancel.
+
+    Returns:
+    int: The number of jobs cancellation was requested for.
+    """
+    return IngestionJob.objects.filter(
+        bulk_id=bulk, status__in=IngestionJob.ACTIVE_STATUSES
+    ).update(cancel_requested=True)
+
+
+def _job_progress(job_id):
+    def progress(stage, **counters):
+        # update() skips auto_now; updated_at doubles as the heartbeat `recover_stale_jobs` checks
+        IngestionJob.objects.filter(id=job_id).update(stage=stage, updated_at=timezone.now(), **counters)
+    return progress
+
+
+def _job_should_cancel(job_id):
+    def should_cancel():
+        return IngestionJob.objects.filter(id=job_id, cancel_requested=True).exists()
+    return should_cancel
+
+
+def _commit_job(job_id, file_id):
+    # The file becomes raged in the same transaction that completes the job
+    with transaction.atomic():
+        # update() skips auto_now, so bump updated_at for the uploaded-files ETag
+        File.objects.filter(id=file_id).update(raged=True, updated_at=timezone.now())
+        IngestionJob.objects.filter(id=job_id).update(status=IngestionJob.STATUS_COMPLETED, stage='done')
+
+
+def run_ingestion_job(job_id):
+    """
+    Worker entry point. Runs `ragLLL` for the job's file, records per-stage progress and
+    marks the file as raged only when every vector has been written.
+
+    Args:
+    job_id (int): The ID of the job to run.
+    """
+    close_old_connections()
+    try:
+        # Claim the job; a job cancelled while queued is skipped
+        claimed = IngestionJob.objects.filter(id=job_id, status=IngestionJob.STATUS_QUEUED).update(
+            status=IngestionJob.STATUS_RUNNING, updated_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        job = IngestionJob.objects.select_related('file_id').get(id=job_id)
+        uploaded_file = job.file_id
+
+        try:
+            ragLLL(
+                uploaded_file.file.path,
+                uploaded_file.id,
+                progress=_job_progress(job_id),
+                should_cancel=_job_should_cancel(job_id),
+                sha256=uploaded_file.sha256,
+                chunk_size=job.chunk_size,
+                chunk_overlap=job.chunk_overlap,
+            )
+        except IngestionCancelled:
+            IngestionJob.objects.filter(id=job_id).update(status=IngestionJob.STATUS_CANCELLED)
+            return
+        except Exception as e:
+            IngestionJob.objects.filter(id=job_id).update(status=IngestionJob.STATUS_FAILED, error=str(e))
+            return
+
+        _commit_job(job_id, uploaded_file.id)
+    finally:
+        close_old_connections()
+
+
+def run_bulk_ingestion(bulk_id):
+    """
+    Worker entry point for bulk runs. PDFs are parsed into parsed-document artifacts in a process
+    pool across all cores; each file's pages are then streamed back from its artifact, split and
+    sent through the shared embedding service and a single vector-store writer (this thread) in
+    `EMBEDDING_BATCH_SIZE` batches, one file at a time. When `PARSED_ARTIFACTS_DIR` is disabled the
+    artifacts go to a temporary directory removed after the run. Throughput counters are saved
+    after every file.
+
+    Args:
+    bulk_id (int): The ID of the bulk run.
+    """
+    close_old_connections()
+    try:
+        BulkIngestion.objects.filter(id=bulk_id).update(status='running')
+        jobs = []
+        for job in IngestionJob.objects.select_related('file_id').filter(
+            bulk_id=bulk_id, status=IngestionJob.STATUS_QUEUED
+        ):
+            if IngestionJob.objects.filter(id=job.id, status=IngestionJob.STATUS_QUEUED).update(
+                status=IngestionJob.STATUS_RUNNING, stage='parsing', updated_at=timezone.now()
+            ):
+                jobs.append(job)
+
+        totals = {'files_completed': 0, 'files_failed': 0, 'pages_parsed': 0,
+                  'chunks_processed': 0, 'embeddings_computed': 0}
+        started = time.monotonic()
+
+        def save_totals():
+            BulkIngestion.objects.filter(id=bulk_id).update(
+                elapsed_seconds=time.monotonic() - started, **totals
+            )
+
+        # Spawned workers do not inherit this process's threads, DB connections or model weights
+        processes = settings.INGESTION_PROCESSES
+        pending_jobs = list(jobs)
+        in_flight = {}
+        with tempfile.TemporaryDirectory(prefix='bulk-artifacts-') as scratch_dir, \
+                ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            artifact_dir = settings.PARSED_ARTIFACTS_DIR or scratch_dir
+            while pending_jobs or in_flight:
+                # Keep a bounded number of parsed files waiting so memory does not grow with the batch
+                while pending_jobs and len(in_flight) < processes * 2:
+                    job = pending_jobs.pop(0)
+                    if _job_should_cancel(job.id)():
+                        IngestionJob.objects.filter(id=job.id).update(status=IngestionJob.STATUS_CANCELLED)
+                        continue
+                    future = pool.submit(
+                        parse_to_artifact, job.id, job.file_id.file.path, artifact_dir, job.file_id.sha256,
+                    )
+                    in_flight[future] = job
+
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, timeout=BULK_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                # Jobs waiting for a parser are alive too; keep them clear of recover_stale_jobs
+                IngestionJob.objects.filter(bulk_id=bulk_id, status=IngestionJob.STATUS_RUNNING).update(
+                    updated_at=timezone.now()
+                )
+                for future in done:
+                    job = in_flight.pop(future)
+                    should_cancel = _job_should_cancel(job.id)
+                    try:
+                        _, sha256 = future.result()
+                        if should_cancel():
+                            raise IngestionCancelled()
+                        result = ragLLL(
+                            job.file_id.file.path,
+                            job.file_id_id,
+                            progress=_job_progress(job.id),
+                            should_cancel=should_cancel,
+                            sha256=sha256,
+                            artifact_dir=artifact_dir,
+                        )
+                    except IngestionCancelled:
+                        IngestionJob.objects.filter(id=job.id).update(status=IngestionJob.STATUS_CANCELLED)
+                        continue
+                    except Exception as e:
+                        IngestionJob.objects.filter(id=job.id).update(status=IngestionJob.STATUS_FAILED, error=str(e))
+                        totals['files_failed'] += 1
+                        save_totals()
+                        continue
+
+                    _commit_job(job.id, job.file_id_id)
+                    totals['pages_parsed'] += result['page_count']
+                    totals['chunks_processed'] += result['chunk_count']
+                    totals['embeddings_computed'] += result['chunks_added']
+                    totals['files_completed'] += 1
+                    save_totals()
+
+        save_totals()
+        cancelled = IngestionJob.objects.filter(bulk_id=bulk_id, status=IngestionJob.STATUS_CANCELLED).exists()
+        BulkIngestion.objects.filter(id=bulk_id).update(status='cancelled' if cancelled else 'completed')
+    finally:
+        close_old_connections()
@@ -0,0 +1,96 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from genai.benchmarks import latency_summary, peak_rss_mb, synthetic_texts, write_results
+from genai.embeddings import EmbeddingService
+from genai.management.commands.bench_queries import DEFAULT_QUERIES
+
+BACKENDS = {
+    'torch': {'backend': 'torch'},
+    'onnx': {'backend': 'onnx', 'onnx_file': 'model.onnx'},
+    'onnx-int8': {'backend': 'onnx', 'onnx_file': 'model_int8.onnx'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the embedding backends (torch, onnx, onnx-int8): load time, document embeddings/s, "
+        "single-query latency and peak RSS. Each backend runs in its own process so RSS is not shared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default=','.join(BACKENDS), help="Comma-separated backends to run.")
+        parser.add_argument('--texts', type=int, default=1000, help="Chunk texts embedded for throughput.")
+        parser.add_argument('--queries', type=int, default=200, help="Single queries embedded for latency.")
+        parser.add_argument('--batch-size', type=int, default=settings.EMBEDDING_BATCH_SIZE)
+        parser.add_argument('--threads', type=int, default=settings.EMBEDDING_NUM_THREADS)
+        parser.add_argument('--onnx-dir', default=settings.EMBEDDING_ONNX_DIR)
+        parser.add_argument('--run-one', help="Internal: measure this backend in-process and print JSON.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['run_one']:
+            self.stdout.write(json.dumps(self._measure(options['run_one'], options)))
+            return
+
+        results = {}
+        for name in [name.strip() for name in options['backends'].split(',') if name.strip()]:
+            command = [
+                sys.executable, sys.argv[0], 'bench_embedding_backends', '--run-one', name,
+                '--texts', str(options['texts']), '--queries', str(options['queries']),
+                '--batch-size', str(options['batch_size']), '--threads', str(options['threads']),
+                '--onnx-dir', options['onnx_dir'],
+            ]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode:
+                self.stderr.write(f"{name}: failed\n{completed.stderr.strip()}")
+                continue
+            result = results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                f"{name}: load {result['load_s']}s, {result['embeddings_per_s']} emb/s, "
+                f"query p50 {result['query']['p50_ms']} ms, peak RSS {result['peak_rss_mb']} MB, "
+                f"torch imported: {result['torch_imported']}"
+            )
+
+        if options['output']:
+            parameters = {key: options[key] for key in ('backends', 'texts', 'queries', 'batch_size', 'threads')}
+            write_results(options['output'], 'bench_embedding_backends', parameters, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _measure(self, name, options):
+        embedder = EmbeddingService(
+            settings.EMBEDDING_MODEL_NAME,
+            batch_size=options['batch_size'],
+            num_threads=options['threads'],
+            onnx_dir=options['onnx_dir'],
+            **BACKENDS[name],
+        )
+        started = time.perf_counter()
+        embedder.warm_up()
+        load_seconds = time.perf_counter() - started
+
+        texts = synthetic_texts(options['texts'])
+        started = time.perf_counter()
+        embedder.embed_documents(texts)
+        embed_seconds = time.perf_counter() - started
+
+        latencies = []
+        started = time.perf_counter()
+        for index in range(options['queries']):
+            query_started = time.perf_counter()
+            embedder.embed_query(f"{DEFAULT_QUERIES[index % len(DEFAULT_QUERIES)]} #{index}")
+            latencies.append(time.perf_counter() - query_started)
+        query_seconds = time.perf_counter() - started
+
+        return {
+            'load_s': round(load_seconds, 3),
+            'embeddings_per_s': round(len(texts) / embed_seconds, 2) if embed_seconds else 0.0,
+            'query': latency_summary(latencies, query_seconds),
+            'peak_rss_mb': peak_rss_mb(),
+            'torch_imported': 'torch' in sys.modules,
+        }
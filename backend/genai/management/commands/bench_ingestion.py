@@ -0,0 +1,167 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from genai.benchmarks import peak_rss_mb, write_results, write_synthetic_pdf
+from users.models import File
+
+STAGES = ('ingest_parse_split', 'ingest_embed', 'ingest_write', 'ingest_db_write')
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic PDFs of several sizes and ingest them through the real pipeline (ragLLL, or "
+        "a bulk run with --workers > 1), reporting wall time, peak RSS and pages/s, chunks/s and "
+        "embeddings/s per stage. Each size runs in a fresh process with a throwaway database, a temporary "
+        "vector store and no embedding cache, so nothing touches the real index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help="Comma-separated page counts.")
+        parser.add_argument('--words-per-page', type=int, default=400)
+        parser.add_argument('--chunk-size', type=int, default=settings.CHUNK_SIZE)
+        parser.add_argument('--chunk-overlap', type=int, default=settings.CHUNK_OVERLAP)
+        parser.add_argument('--batch-size', type=int, default=settings.EMBEDDING_BATCH_SIZE,
+                            help="Embedding and vector-write batch size.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Documents ingested as one bulk run with this many parser processes.")
+        parser.add_argument('--threads', type=int, default=settings.EMBEDDING_NUM_THREADS,
+                            help="Embedding runtime threads (0 keeps the default).")
+        parser.add_argument('--run-one', type=int, help="Internal: ingest this many pages in-process and print JSON.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['run_one']:
+            self.stdout.write(json.dumps(self._run(options['run_one'], options)))
+            return
+
+        results = []
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        for pages in sizes:
+            # RSS is a per-process high-water mark, so every size gets its own process
+            command = [sys.executable, sys.argv[0], 'bench_ingestion', '--run-one', str(pages)]
+            for option in ('words_per_page', 'chunk_size', 'chunk_overlap', 'batch_size', 'workers', 'threads'):
+                command += [f"--{option.replace('_', '-')}", str(options[option])]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode:
+                self.stderr.write(f"{pages} pages: failed\n{completed.stderr.strip()}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            self.stdout.write(
+                f"{pages} pages x{result['documents']}: total {result['total_s']}s, "
+                f"peak RSS {result['peak_rss_mb']} MB (parsers {result['parser_peak_rss_mb']} MB), "
+                f"parse {result['parse']['pages_per_s']} pages/s, "
+                f"embed {result['embed']['embeddings_per_s']} emb/s, "
+                f"write {result['write']['chunks_per_s']} chunks/s"
+            )
+
+        if options['output']:
+            parameters = {key: options[key] for key in (
+                'sizes', 'words_per_page', 'chunk_size', 'chunk_overlap', 'batch_size', 'workers', 'threads',
+            )}
+            write_results(options['output'], 'bench_ingestion', parameters, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _run(self, pages, options):
+        workers = max(options['workers'], 1)
+        with tempfile.TemporaryDirectory(prefix='bench-ingestion-') as workdir:
+            # No embedding cache or parsed artifacts: every run must pay for what it measures
+            overrides = override_settings(
+                VECTOR_STORE=_temporary_store(settings.VECTOR_STORE, os.path.join(workdir, 'vectors')),
+                MEDIA_ROOT=workdir,
+                EMBEDDING_CACHE_PATH='',
+                PARSED_ARTIFACTS_DIR='',
+                EMBEDDING_BATCH_SIZE=options['batch_size'],
+                EMBEDDING_NUM_THREADS=options['threads'],
+                CHUNK_SIZE=options['chunk_size'],
+                CHUNK_OVERLAP=options['chunk_overlap'],
+                INGESTION_PROCESSES=workers,
+                GENAI_METRICS_ENABLED=True,
+            )
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                with overrides:
+                    return self._ingest(pages, workers, workdir, options)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+    def _ingest(self, pages, workers, workdir, options):
+        from genai.embeddings import get_embedding_service
+        from genai.ingestion import ragLLL
+        from genai.jobs import run_bulk_ingestion
+        from genai.metrics import stage_duration
+        from genai.models import BulkIngestion, IngestionJob
+
+        get_embedding_service().warm_up()
+        user = User.objects.create(username='bench-ingestion')
+        files = []
+        for copy in range(workers):
+            # Distinct content per document, so later copies are not served by chunk deduplication
+            name = f'synthetic-{pages}-{copy}.pdf'
+            write_synthetic_pdf(os.path.join(workdir, name), pages, words_per_page=options['words_per_page'], seed=copy)
+            files.append(File.objects.create(file=name, user_id=user))
+
+        started = time.perf_counter()
+        if workers == 1:
+            result = ragLLL(files[0].file.path, files[0].id)
+            pages_parsed, chunks, embedded = result['page_count'], result['chunk_count'], result['chunks_added']
+        else:
+            bulk = BulkIngestion.objects.create(files_total=len(files))
+            IngestionJob.objects.bulk_create([IngestionJob(file_id=uploaded, bulk_id=bulk) for uploaded in files])
+            run_bulk_ingestion(bulk.id)
+            bulk.refresh_from_db()
+            pages_parsed, chunks, embedded = bulk.pages_parsed, bulk.chunks_processed, bulk.embeddings_computed
+        total_seconds = time.perf_counter() - started
+
+        seconds = {name: stage_duration.total(name)[0] for name in STAGES}
+        # Bulk runs parse in worker processes that overlap embedding; the in-process stage only covers splitting
+        parse_seconds = seconds['ingest_parse_split']
+        write_seconds = seconds['ingest_write'] + seconds['ingest_db_write']
+        return {
+            'pages': pages,
+            'documents': workers,
+            'chunks': chunks,
+            'total_s': round(total_seconds, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'parser_peak_rss_mb': peak_rss_mb(children=True),
+            'parse': {
+                'seconds': round(parse_seconds, 3),
+                'pages_per_s': _rate(pages_parsed, parse_seconds),
+                'chunks_per_s': _rate(chunks, parse_seconds),
+            },
+            'embed': {
+                'seconds': round(seconds['ingest_embed'], 3),
+                'embeddings_per_s': _rate(embedded, seconds['ingest_embed']),
+            },
+            'write': {
+                'seconds': round(write_seconds, 3),
+                'chunks_per_s': _rate(chunks, write_seconds),
+            },
+            'end_to_end': {
+                'pages_per_s': _rate(pages_parsed, total_seconds),
+                'chunks_per_s': _rate(chunks, total_seconds),
+            },
+        }
+
+
+def _temporary_store(config, path):
+    # Same backend as configured, pointed at a scratch directory
+    options = dict(config.get('OPTIONS', {}))
+    if config['BACKEND'].endswith('ChromaVectorStore'):
+        options['persist_directory'] = path
+    else:
+        options['path'] = path
+    return {'BACKEND': config['BACKEND'], 'OPTIONS': options}
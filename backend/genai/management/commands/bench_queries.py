@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from rest_framework.test import APIRequestFactory
+
+from genai.benchmarks import latency_summary, write_results
+from genai.generators import FakeGenerator, set_generator
+from genai.views import handle_query
+
+
+DEFAULT_QUERIES = [
+    "How do I reset the device to factory settings?",
+    "What does error code E42 mean?",
+    "Which firmware versions are supported?",
+    "How do I configure the network settings?",
+    "What are the safety precautions before maintenance?",
+    "How do I replace the battery?",
+    "What is the recommended operating temperature?",
+    "How do I export the logs?",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive handle_query end to end with concurrent requests and report p50/p95/p99 latency and "
+        "queries per second. Use --fake to replace Gemini with the deterministic local generator. "
+        "Users and messages are written to a temporary test database, never the real one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Total number of queries to send.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Number of concurrent clients.")
+        parser.add_argument('--queries-file', help="File with one query per line (defaults to a built-in set).")
+        parser.add_argument('--fake', action='store_true', help="Use FakeGenerator instead of the configured backend.")
+        parser.add_argument('--first-token-latency', type=float, default=0.5, help="FakeGenerator time to first token (s).")
+        parser.add_argument('--tokens-per-second', type=float, default=50.0, help="FakeGenerator token rate.")
+        parser.add_argument('--answer-tokens', type=int, default=120, help="FakeGenerator answer length in tokens.")
+        parser.add_argument('--answer-cache', action='store_true', help="Keep the answer cache enabled.")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed queries sent before measuring.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['fake']:
+            set_generator(FakeGenerator(
+                first_token_latency=options['first_token_latency'],
+                tokens_per_second=options['tokens_per_second'],
+                answer_tokens=options['answer_tokens'],
+            ))
+        if options['queries_file']:
+            with open(options['queries_file']) as queries_file:
+                queries = [line.strip() for line in queries_file if line.strip()]
+        else:
+            queries = DEFAULT_QUERIES
+
+        # The benchmark user and the messages every query saves go to a throwaway test database;
+        # repeated queries would otherwise be served from the answer cache
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(ANSWER_CACHE_ENABLED=options['answer_cache']):
+                results = self._run(queries, options)
+        finally:
+            close_old_connections()
+            teardown_databases(old_config, verbosity=0)
+
+        for key, value in results.items():
+            self.stdout.write(f"{key}: {value}")
+
+        if options['output']:
+            parameters = {key: options[key] for key in (
+                'requests', 'concurrency', 'fake', 'first_token_latency', 'tokens_per_second',
+                'answer_tokens', 'answer_cache', 'warmup',
+            )}
+            write_results(options['output'], 'bench_queries', parameters, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def _run(self, queries, options):
+        user = User.objects.create(username='bench-queries', email='bench@example.com')
+        factory = APIRequestFactory()
+
+        def send(index):
+            request = factory.post(
+                '/api/genai/query/', {'user_id': user.id, 'query': queries[index % len(queries)]}, format='json'
+            )
+            started = time.perf_counter()
+            response = handle_query(request)
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            return elapsed, response.status_code
+
+        for index in range(options['warmup']):
+            send(index)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            outcomes = list(pool.map(send, range(options['requests'])))
+        wall_time = time.perf_counter() - started
+
+        latencies = [elapsed for elapsed, status in outcomes if status == 200]
+        results = latency_summary(latencies, wall_time)
+        results['errors'] = sum(1 for _, status in outcomes if status != 200)
+        results['wall_time_s'] = round(wall_time, 3)
+        return results
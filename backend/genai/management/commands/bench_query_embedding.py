@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from genai.benchmarks import latency_summary, write_results
+from genai.embeddings import EmbeddingService
+from genai.management.commands.bench_queries import DEFAULT_QUERIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed queries from concurrent clients with and without micro-batching and report "
+        "embeddings/s and p50/p95/p99 latency. The embedding cache is bypassed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Queries embedded per run.")
+        parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated client counts.")
+        parser.add_argument('--batch-size', type=int, default=settings.QUERY_EMBEDDING_BATCH_SIZE)
+        parser.add_argument('--wait-ms', type=float, default=settings.QUERY_EMBEDDING_BATCH_WAIT_MS)
+        parser.add_argument('--threads', type=int, default=settings.EMBEDDING_NUM_THREADS,
+                            help="Torch threads (0 keeps the default).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        # Make every query unique so nothing could be served from a cache
+        queries = [f"{DEFAULT_QUERIES[index % len(DEFAULT_QUERIES)]} #{index}" for index in range(options['requests'])]
+        modes = {
+            'single': EmbeddingService(settings.EMBEDDING_MODEL_NAME, num_threads=options['threads']),
+            'batched': EmbeddingService(
+                settings.EMBEDDING_MODEL_NAME,
+                num_threads=options['threads'],
+                query_batch_size=options['batch_size'],
+                query_batch_wait_ms=options['wait_ms'],
+            ),
+        }
+        for embedder in modes.values():
+            embedder.warm_up()
+
+        results = {}
+        for concurrency in [int(value) for value in options['concurrency'].split(',') if value.strip()]:
+            for mode, embedder in modes.items():
+                latencies = []
+
+                def embed(query):
+                    started = time.perf_counter()
+                    embedder.embed_query(query)
+                    latencies.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(embed, queries))
+                wall_time = time.perf_counter() - started
+
+                result = latency_summary(latencies, wall_time)
+                results[f'{mode}_x{concurrency}'] = result
+                self.stdout.write(
+                    f"{mode} x{concurrency}: {result['qps']} embeddings/s, p50 {result['p50_ms']} ms, "
+                    f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms"
+                )
+
+        if options['output']:
+            parameters = {key: options[key] for key in ('requests', 'concurrency', 'batch_size', 'wait_ms', 'threads')}
+            write_results(options['output'], 'bench_query_embedding', parameters, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
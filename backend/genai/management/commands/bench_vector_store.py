@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from genai.benchmarks import latency_summary, synthetic_vectors, write_results
+from genai.vector_stores import ChromaVectorStore, QuantizedVectorStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare vector store backends on synthetic embeddings: recall@k against exact float32 search, "
+        "query latency and bytes per vector. Indexes are built in a temporary directory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vectors', type=int, default=100000)
+        parser.add_argument('--dimension', type=int, default=384)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=6)
+        parser.add_argument('--no-chroma', action='store_true', help="Skip the Chroma baseline.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        count, k = options['vectors'], options['k']
+        vectors = synthetic_vectors(count, options['dimension'], seed=0)
+        # Queries are perturbed corpus vectors, so each has a well-defined neighbourhood
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, count, options['queries'])]
+        queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = [set(np.argpartition(-(vectors @ query), k)[:k].tolist()) for query in queries]
+
+        ids = [str(index) for index in range(count)]
+        documents = [""] * count
+        metadatas = [{'row': index} for index in range(count)]
+
+        backends = [
+            ('int8+rerank', lambda path: QuantizedVectorStore(path, dtype='int8')),
+            ('int8', lambda path: QuantizedVectorStore(path, dtype='int8', store_float=False)),
+            ('float16', lambda path: QuantizedVectorStore(path, dtype='float16', store_float=False)),
+        ]
+        if not options['no_chroma']:
+            backends.insert(0, ('chroma', lambda path: ChromaVectorStore(path, collection_name='bench_vectors')))
+
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='bench-vector-store-') as workdir:
+            for name, factory in backends:
+                store = factory(os.path.join(workdir, name))
+                build_started = time.perf_counter()
+                for start in range(0, count, 5000):
+                    end = start + 5000
+                    store.upsert(ids[start:end], vectors[start:end], documents[start:end], metadatas[start:end])
+                build_seconds = time.perf_counter() - build_started
+
+                store.query(queries[0], k)
+                latencies = []
+                recalls = []
+                started = time.perf_counter()
+                for query, expected in zip(queries, truth):
+                    query_started = time.perf_counter()
+                    hits = store.query(query, k)
+                    latencies.append(time.perf_counter() - query_started)
+                    recalls.append(len({int(hit['id']) for hit in hits} & expected) / k)
+                wall_time = time.perf_counter() - started
+
+                result = latency_summary(latencies, wall_time)
+                result['recall_at_k'] = round(float(np.mean(recalls)), 4)
+                result['build_s'] = round(build_seconds, 3)
+                if isinstance(store, QuantizedVectorStore):
+                    result['bytes_per_vector'] = store.memory_stats()['bytes_per_vector']
+                else:
+                    result['bytes_per_vector'] = options['dimension'] * 4
+                results[name] = result
+                self.stdout.write(
+                    f"{name}: recall@{k} {result['recall_at_k']}, p50 {result['p50_ms']} ms, "
+                    f"p95 {result['p95_ms']} ms, {result['bytes_per_vector']} bytes/vector"
+                )
+
+        if options['output']:
+            parameters = {key: options[key] for key in ('vectors', 'dimension', 'queries', 'k', 'no_chroma')}
+            write_results(options['output'], 'bench_vector_store', parameters, results)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from genai.benchmarks import synthetic_texts
+from genai.embeddings import EmbeddingService
+from genai.management.commands.bench_queries import DEFAULT_QUERIES
+from genai.onnx_embeddings import cosine_agreement
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed the same texts with the PyTorch model and the exported ONNX model and check that the "
+        "vectors agree: fails when the lowest cosine similarity is below --threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--onnx-dir', default=settings.EMBEDDING_ONNX_DIR)
+        parser.add_argument('--onnx-file', default=settings.EMBEDDING_ONNX_FILE)
+        parser.add_argument('--texts', type=int, default=200, help="Synthetic chunk texts added to the sample queries.")
+        parser.add_argument('--threshold', type=float, default=0.97,
+                            help="Minimum acceptable cosine similarity; int8 quantization typically stays above 0.98.")
+
+    def handle(self, *args, **options):
+        texts = DEFAULT_QUERIES + synthetic_texts(options['texts'])
+        reference = EmbeddingService(settings.EMBEDDING_MODEL_NAME).embed_documents(texts)
+        candidate = EmbeddingService(
+            settings.EMBEDDING_MODEL_NAME,
+            backend='onnx',
+            onnx_dir=options['onnx_dir'],
+            onnx_file=options['onnx_file'],
+        ).embed_documents(texts)
+
+        agreement = cosine_agreement(reference, candidate)
+        self.stdout.write(
+            f"{options['onnx_file']}: cosine min {agreement['min']}, mean {agreement['mean']} over {len(texts)} texts"
+        )
+        if agreement['min'] < options['threshold']:
+            raise CommandError(f"Cosine similarity {agreement['min']} is below the threshold {options['threshold']}.")
+        self.stdout.write(self.style.SUCCESS("The ONNX embeddings match the PyTorch embeddings."))
@@ -0,0 +1,56 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from genai.vector_stores import ChromaVectorStore, QuantizedVectorStore
+
+
+FILE_KEY_PATTERN = re.compile(r'^file_(\d+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the Chroma collection into a QuantizedVectorStore directory, including file membership, "
+        "so VECTOR_STORE can be switched without re-ingesting every PDF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Directory of the quantized index to create or update.")
+        parser.add_argument('--dtype', default='int8', choices=['int8', 'float16'])
+        parser.add_argument('--no-float', action='store_true', help="Do not keep float32 copies for re-ranking.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        source = ChromaVectorStore(settings.CHROMA_PERSIST_DIRECTORY)
+        target = QuantizedVectorStore(options['path'], dtype=options['dtype'], store_float=not options['no_float'])
+
+        ids = source.all_ids()
+        batch_size = options['batch_size']
+        for start in range(0, len(ids), batch_size):
+            chunks = source.get(ids[start:start + batch_size])
+            memberships = {}
+            metadatas = []
+            for chunk in chunks:
+                metadata = {}
+                for key, value in chunk['metadata'].items():
+                    match = FILE_KEY_PATTERN.match(key)
+                    if match is None:
+                        metadata[key] = value
+                    elif value is True:
+                        memberships.setdefault(int(match.group(1)), []).append(chunk['id'])
+                metadatas.append(metadata)
+            target.upsert(
+                [chunk['id'] for chunk in chunks],
+                [chunk['embedding'] for chunk in chunks],
+                [chunk['text'] for chunk in chunks],
+                metadatas,
+            )
+            for file_id, file_chunk_ids in memberships.items():
+                target.set_file_membership(file_chunk_ids, file_id, True)
+            self.stdout.write(f"{min(start + batch_size, len(ids))}/{len(ids)} chunks copied")
+
+        stats = target.memory_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {stats['rows']} vectors ({stats['bytes_per_vector']} bytes each in the scanned index)."
+        ))
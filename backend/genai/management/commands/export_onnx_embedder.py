@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from genai.onnx_embeddings import MODEL_FILE, QUANTIZED_MODEL_FILE, export_onnx_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the embedding model to ONNX (float32 and int8 dynamically quantized) for "
+        "EMBEDDING_BACKEND='onnx', then check both against the PyTorch model. Needs torch, "
+        "transformers and onnx on the machine running the export only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.EMBEDDING_ONNX_DIR, help="Directory to write the model to.")
+        parser.add_argument('--no-quantize', action='store_true', help="Only write the float32 model.")
+        parser.add_argument('--skip-check', action='store_true', help="Do not run check_embedding_parity.")
+
+    def handle(self, *args, **options):
+        paths = export_onnx_model(settings.EMBEDDING_MODEL_NAME, options['output'], quantize=not options['no_quantize'])
+        for path in paths:
+            self.stdout.write(f"Wrote {path}")
+
+        if not options['skip_check']:
+            model_files = [MODEL_FILE] if options['no_quantize'] else [MODEL_FILE, QUANTIZED_MODEL_FILE]
+            for model_file in model_files:
+                call_command('check_embedding_parity', onnx_dir=options['output'], onnx_file=model_file)
+        self.stdout.write(self.style.SUCCESS(f"Set EMBEDDING_ONNX_DIR={options['output']} and EMBEDDING_BACKEND=onnx."))
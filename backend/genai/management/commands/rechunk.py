@@ -0,0 +1,102 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from genai.jobs import enqueue_ingestion, get_executor
+from genai.models import IngestionJob
+from genai.parsing import artifact_path, file_sha256, iter_cached_pages, iter_chunks, make_text_splitter
+from users.models import File
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-chunk ingested files with a different chunk size or overlap, reading page text from the "
+        "parsed-document artifacts (PDFs without one are parsed once and their artifact saved). Each file is "
+        "re-ingested incrementally through an ingestion job, so unchanged chunks keep their vectors; files "
+        "with an ingestion job already queued or running are skipped. With --dry-run only chunk statistics "
+        "are reported and nothing is written, not even missing artifacts or hashes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.CHUNK_SIZE)
+        parser.add_argument('--chunk-overlap', type=int, default=settings.CHUNK_OVERLAP)
+        parser.add_argument('--files', help="Comma-separated file IDs (defaults to every raged file).")
+        parser.add_argument('--dry-run', action='store_true', help="Only split and report, write nothing.")
+
+    def handle(self, *args, **options):
+        if not settings.PARSED_ARTIFACTS_DIR:
+            raise CommandError("PARSED_ARTIFACTS_DIR is not set, so every file would be parsed again.")
+        if options['chunk_overlap'] >= options['chunk_size']:
+            raise CommandError("--chunk-overlap must be smaller than --chunk-size.")
+
+        files = File.objects.filter(file__isnull=False).exclude(file='').order_by('id')
+        if options['files']:
+            files = files.filter(id__in=[int(file_id) for file_id in options['files'].split(',') if file_id.strip()])
+        else:
+            files = files.filter(raged=True)
+
+        # Only a dry run splits here; re-ingestion splits in the ingestion job
+        text_splitter = None
+        if options['dry_run']:
+            text_splitter = make_text_splitter(options['chunk_size'], options['chunk_overlap'])
+        totals = {'files': 0, 'pages': 0, 'chunks': 0, 'chunk_chars': 0, 'artifacts_reused': 0, 'parsed': 0}
+        job_ids = []
+        started = time.perf_counter()
+        for uploaded_file in files.iterator():
+            path = uploaded_file.file.path
+            if not os.path.exists(path):
+                self.stderr.write(f"File {uploaded_file.id}: {path} is missing, skipped")
+                continue
+            sha256 = uploaded_file.sha256
+            if sha256 is None:
+                sha256 = file_sha256(path)
+                if not options['dry_run']:
+                    File.objects.filter(id=uploaded_file.id).update(sha256=sha256)
+            cached = os.path.exists(artifact_path(settings.PARSED_ARTIFACTS_DIR, sha256))
+
+            if options['dry_run']:
+                # Read existing artifacts, but parse the other PDFs without saving theirs
+                artifact_dir = settings.PARSED_ARTIFACTS_DIR if cached else ''
+                for page in iter_cached_pages(path, artifact_dir, sha256):
+                    totals['pages'] += 1
+                    for chunk in iter_chunks([page], text_splitter):
+                        totals['chunks'] += 1
+                        totals['chunk_chars'] += len(chunk.page_content)
+            else:
+                job = enqueue_ingestion(
+                    uploaded_file, chunk_size=options['chunk_size'], chunk_overlap=options['chunk_overlap']
+                )
+                if (job.chunk_size, job.chunk_overlap) != (options['chunk_size'], options['chunk_overlap']):
+                    # The file is being ingested with other parameters; a second run would race it
+                    self.stderr.write(
+                        f"File {uploaded_file.id}: ingestion job {job.id} is already {job.status}, skipped"
+                    )
+                    continue
+                job_ids.append(job.id)
+            totals['artifacts_reused' if cached else 'parsed'] += 1
+            totals['files'] += 1
+
+        if job_ids:
+            # Run the queued jobs here, in this process, before reporting
+            get_executor().shutdown(wait=True)
+            for job in IngestionJob.objects.filter(id__in=job_ids).order_by('file_id'):
+                totals['pages'] += job.pages_parsed
+                totals['chunks'] += job.chunks_embedded
+                message = f"File {job.file_id_id}: job {job.id} {job.status}, {job.chunks_embedded} chunks embedded"
+                self.stdout.write(f"{message}: {job.error}" if job.error else message)
+
+        seconds = time.perf_counter() - started
+        average = f", {totals['chunk_chars'] // totals['chunks']} chars per chunk" if totals['chunk_chars'] else ""
+        chunks = "chunks" if options['dry_run'] else "chunks embedded"
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['files']} files, {totals['pages']} pages, {totals['chunks']} {chunks}{average} "
+            f"in {seconds:.1f}s ({totals['artifacts_reused']} artifacts reused, {totals['parsed']} PDFs parsed)."
+        ))
+        if not options['dry_run'] and (
+            options['chunk_size'] != settings.CHUNK_SIZE or options['chunk_overlap'] != settings.CHUNK_OVERLAP
+        ):
+            self.stdout.write(
+                "Set CHUNK_SIZE and CHUNK_OVERLAP to the same values so new uploads are chunked the same way."
+            )
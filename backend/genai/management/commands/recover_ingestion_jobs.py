@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from genai.jobs import get_executor, recover_stale_jobs, requeue_queued_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Fail running ingestion jobs that stopped reporting progress for INGESTION_JOB_TIMEOUT seconds "
+        "and run the jobs still queued, e.g. after the server process that queued them was restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-run', action='store_true', help="Only fail stale jobs; leave queued jobs alone.")
+
+    def handle(self, *args, **options):
+        failed = recover_stale_jobs()
+        self.stdout.write(f"{failed} stale running jobs marked as failed")
+        if options['no_run']:
+            return
+        queued = requeue_queued_jobs()
+        # Run the queued jobs here, in this process, before exiting
+        get_executor().shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f"{queued} queued jobs processed"))
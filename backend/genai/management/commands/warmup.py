@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from genai.resources import warm_up
+
+
+class Command(BaseCommand):
+    help = "Load the embedding model, vector store and Gemini client, and report how long each took."
+
+    def handle(self, *args, **options):
+        timings = warm_up()
+        for resource, seconds in timings.items():
+            self.stdout.write(f"{resource}: {seconds:.3f}s")
+        self.stdout.write(self.style.SUCCESS("GenAI resources are warm."))
@@ -0,0 +1,266 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+
+logger = logging.getLogger('genai.requests')
+
+# Upper bounds in seconds, from sub-millisecond cache hits to minute-long LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage timings of the request being served, as a list of (stage, seconds)
+_request_stages = contextvars.ContextVar('genai_request_stages', default=None)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram with one series per label value.
+
+    Args:
+    name (str): The metric name.
+    documentation (str): The HELP text.
+    label (str): The label name distinguishing series.
+    buckets (tuple): The bucket upper bounds in seconds.
+    """
+
+    def __init__(self, name, documentation, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def total(self, label_value):
+        """
+        Returns the sum of the observations and their count for one label value.
+
+        Args:
+        label_value (str): The series.
+
+        Returns:
+        tuple: `(sum, count)`, zeros when nothing was observed.
+        """
+        with self._lock:
+            series = self._series.get(label_value)
+            return (series[-2], series[-1]) if series else (0.0, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {label_value: list(series) for label_value, series in self._series.items()}
+        for label_value, series in sorted(snapshot.items()):
+            labels = f'{self.label}="{label_value}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return "\n".join(lines)
+
+
+class Counter:
+    """
+    Thread-safe Prometheus-style counter with one series per label value.
+
+    Args:
+    name (str): The metric name.
+    documentation (str): The HELP text.
+    label (str): The label name distinguishing series.
+    """
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_value, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return "\n".join(lines)
+
+
+stage_duration = Histogram(
+    'genai_stage_duration_seconds', 'Duration of RAG pipeline stages (query and ingestion).', 'stage'
+)
+request_duration = Histogram(
+    'genai_request_duration_seconds', 'Duration of API requests by URL name.', 'view'
+)
+context_tokens = Counter(
+    'genai_context_tokens_total', 'Estimated prompt context tokens: baseline (raw chunks) and sent.', 'kind'
+)
+
+
+def record_stage(name, seconds):
+    """
+    Records a stage duration in the stage histogram and in the current request's timings.
+
+    Args:
+    name (str): The stage name, e.g. 'vector_search'.
+    seconds (float): The measured duration.
+    """
+    stage_duration.observe(name, seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def stage(name):
+    """
+    Context manager timing one pipeline stage. It does nothing when `GENAI_METRICS_ENABLED` is off.
+
+    Args:
+    name (str): The stage name.
+
+    Returns:
+    contextmanager: The timing context.
+    """
+    if not settings.GENAI_METRICS_ENABLED:
+        return nullcontext()
+    return _timed(name)
+
+
+def timed_iter(iterable, name):
+    """
+    Yields the items of `iterable`, recording the time spent producing each one as stage `name`.
+    Used to time lazy producers such as the page -> chunk pipeline.
+
+    Args:
+    iterable (iterable): The producer.
+    name (str): The stage name.
+
+    Yields:
+    object: The items of `iterable`.
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def render_metrics():
+    """
+    Renders every metric of this process in the Prometheus text exposition format.
+
+    Returns:
+    str: The metrics page.
+    """
+    from .answer_cache import get_answer_cache
+    from .query_batcher import batch_size_histogram, batch_wait_histogram
+
+    cache_stats = get_answer_cache().stats()
+    lines = [
+        stage_duration.render(),
+        request_duration.render(),
+        context_tokens.render(),
+        batch_size_histogram.render(),
+        batch_wait_histogram.render(),
+        "# HELP genai_answer_cache_lookups_total Answer cache lookups by result.",
+        "# TYPE genai_answer_cache_lookups_total counter",
+        f'genai_answer_cache_lookups_total{{result="exact_hit"}} {cache_stats["exact_hits"]}',
+        f'genai_answer_cache_lookups_total{{result="semantic_hit"}} {cache_stats["semantic_hits"]}',
+        f'genai_answer_cache_lookups_total{{result="miss"}} {cache_stats["misses"]}',
+        "# HELP genai_answer_cache_entries Answers currently cached.",
+        "# TYPE genai_answer_cache_entries gauge",
+        f"genai_answer_cache_entries {cache_stats['entries']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(stages, total):
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _finish(request, response, stages, started):
+    total = time.perf_counter() - started
+    if stages:
+        response['Server-Timing'] = _server_timing(stages, total)
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name:
+        request_duration.observe(match.url_name, total)
+    if settings.GENAI_REQUEST_LOGGING:
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'stages': {name: round(seconds * 1000, 2) for name, seconds in stages},
+        }))
+    return response
+
+
+@sync_and_async_middleware
+def ServerTimingMiddleware(get_response):
+    """
+    Collects the stage timings recorded while serving a request, adds them as a `Server-Timing`
+    header, feeds the request-duration histogram and optionally writes one structured log line per
+    request. The middleware removes itself when `GENAI_METRICS_ENABLED` is off.
+    """
+    if not settings.GENAI_METRICS_ENABLED:
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stages = []
+            token = _request_stages.set(stages)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _request_stages.reset(token)
+            return _finish(request, response, stages, started)
+    else:
+        def middleware(request):
+            stages = []
+            token = _request_stages.set(stages)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _request_stages.reset(token)
+            return _finish(request, response, stages, started)
+
+    return middleware
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genai', '0002_ingestionjob'),
+        ('users', '0002_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('file_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='users.file')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('file_id', 'content_hash'), name='unique_file_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genai', '0003_filechunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkIngestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='queued', max_length=20)),
+                ('files_total', models.PositiveIntegerField(default=0)),
+                ('files_completed', models.PositiveIntegerField(default=0)),
+                ('files_failed', models.PositiveIntegerField(default=0)),
+                ('pages_parsed', models.PositiveIntegerField(default=0)),
+                ('chunks_processed', models.PositiveIntegerField(default=0)),
+                ('embeddings_computed', models.PositiveIntegerField(default=0)),
+                ('elapsed_seconds', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='bulk_id',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='genai.bulkingestion'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genai', '0004_bulkingestion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usermessage',
+            index=models.Index(fields=['user_id', 'timestamp'], name='usermessage_user_timestamp'),
+        ),
+    ]
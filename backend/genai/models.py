@@ -10,5 +10,98 @@ class UserMessage(models.Model):
     bot_reply = models.TextField()  # To store the bot's reply
     timestamp = models.DateTimeField(auto_now_add=True)  # To track when the message was created
 
+    class Meta:
+        indexes = [
+            # Serves keyset pagination of a user's history on (timestamp, id)
+            models.Index(fields=['user_id', 'timestamp'], name='usermessage_user_timestamp'),
+        ]
+
     def __str__(self):
         return f"Message by {self.user.username} at {self.timestamp}"
+
+
+class BulkIngestion(models.Model):
+    # Groups the per-file IngestionJobs started by one bulk request and records throughput
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    files_total = models.PositiveIntegerField(default=0)
+    files_completed = models.PositiveIntegerField(default=0)
+    files_failed = models.PositiveIntegerField(default=0)
+    pages_parsed = models.PositiveIntegerField(default=0)
+    chunks_processed = models.PositiveIntegerField(default=0)
+    embeddings_computed = models.PositiveIntegerField(default=0)
+    elapsed_seconds = models.FloatField(default=0)  # Wall time since the bulk run started
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def _per_second(self, count):
+        return round(count / self.elapsed_seconds, 2) if self.elapsed_seconds else 0.0
+
+    @property
+    def pages_per_second(self):
+        return self._per_second(self.pages_parsed)
+
+    @property
+    def chunks_per_second(self):
+        return self._per_second(self.chunks_processed)
+
+    @property
+    def embeddings_per_second(self):
+        return self._per_second(self.embeddings_computed)
+
+    def __str__(self):
+        return f"Bulk ingestion {self.id} ({self.status})"
+
+
+class IngestionJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    file_id = models.ForeignKey('users.File', on_delete=models.CASCADE, related_name='ingestion_jobs')
+    bulk_id = models.ForeignKey(BulkIngestion, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    stage = models.CharField(max_length=50, blank=True, default='')  # Current pipeline stage (parsing, embedding, ...)
+    pages_parsed = models.PositiveIntegerField(default=0)
+    chunks_embedded = models.PositiveIntegerField(default=0)
+    vectors_written = models.PositiveIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)  # Polled by the worker between batches
+    chunk_size = models.PositiveIntegerField(null=True, blank=True)  # Overrides CHUNK_SIZE, e.g. for `rechunk`
+    chunk_overlap = models.PositiveIntegerField(null=True, blank=True)  # Overrides CHUNK_OVERLAP
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ingestion job {self.id} for file {self.file_id_id} ({self.status})"
+
+
+class FileChunk(models.Model):
+    # One row per distinct chunk of a file. The chunk's vector is stored once in Chroma under
+    # `content_hash`, so identical chunks from different uploads share a single vector.
+    file_id = models.ForeignKey('users.File', on_delete=models.CASCADE, related_name='chunks')
+    content_hash = models.CharField(max_length=64, db_index=True)  # SHA-256 of the chunk text
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['file_id', 'content_hash'], name='unique_file_chunk'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.content_hash[:12]} of file {self.file_id_id}"
@@ -0,0 +1,159 @@
+# Sentence-transformers MiniLM run through ONNX Runtime instead of PyTorch. The model is exported
+# once (optionally with int8 dynamic quantization) by `manage.py export_onnx_embedder`; at runtime
+# only onnxruntime, tokenizers and NumPy are imported, so query workers never load torch.
+import os
+
+import numpy as np
+
+
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model_int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+
+class OnnxEmbeddings:
+    """
+    Embeds texts with an exported sentence-transformers model: tokenize, run the transformer,
+    mean-pool the token embeddings over the attention mask and L2-normalise, as the
+    sentence-transformers pipeline of all-MiniLM-L6-v2 does. Implements the Langchain embeddings
+    interface (`embed_documents` / `embed_query`).
+
+    Args:
+    model_dir (str): The directory written by `export_onnx_model`.
+    model_file (str): The model inside it, e.g. `model_int8.onnx` for the quantized export.
+    batch_size (int): The number of texts per forward pass.
+    num_threads (int): ONNX Runtime intra-op threads, or 0 to keep the default.
+    max_length (int): Texts are truncated to this many tokens.
+    normalize (bool): Whether to L2-normalise the embeddings.
+    """
+
+    def __init__(self, model_dir, model_file=QUANTIZED_MODEL_FILE, batch_size=32, num_threads=0, max_length=256,
+                 normalize=True):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+    def embed_documents(self, texts):
+        """
+        Embeds texts in batches of `batch_size`.
+
+        Args:
+        texts (list[str]): The texts to embed.
+
+        Returns:
+        list[list[float]]: One embedding per input text.
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        """
+        Embeds a single query.
+
+        Args:
+        text (str): The query to embed.
+
+        Returns:
+        list[float]: The query embedding.
+        """
+        return self.embed_documents([text])[0]
+
+
+def export_onnx_model(model_name, output_dir, quantize=True, opset=17):
+    """
+    Exports a sentence-transformers model to ONNX, with its tokenizer, and optionally writes an
+    int8 dynamically quantized copy next to it. This needs torch, transformers and onnx, which
+    only the machine doing the export has to install.
+
+    Args:
+    model_name (str): The HuggingFace model, e.g. `sentence-transformers/all-MiniLM-L6-v2`.
+    output_dir (str): The directory to write `model.onnx`, `model_int8.onnx` and `tokenizer.json`.
+    quantize (bool): Whether to write the int8 model.
+    opset (int): The ONNX opset version.
+
+    Returns:
+    list[str]: The paths of the model files written.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    # The fast tokenizer is saved as tokenizer.json, readable by the tokenizers library alone
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    paths = [model_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        paths.append(quantized_path)
+    return paths
+
+
+def cosine_agreement(reference, candidate):
+    """
+    Compares two sets of embeddings of the same texts row by row.
+
+    Args:
+    reference (list[list[float]]): The reference embeddings, e.g. from PyTorch.
+    candidate (list[list[float]]): The embeddings to check.
+
+    Returns:
+    dict: The `min` and `mean` cosine similarity of corresponding rows.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {'min': round(float(cosines.min()), 6), 'mean': round(float(cosines.mean()), 6)}
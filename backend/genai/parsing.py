@@ -0,0 +1,165 @@
+# PDF parsing and splitting helpers. This module deliberately has no Django imports so its
+# functions can run in worker processes of a ProcessPoolExecutor. Langchain is imported inside
+# the functions so importing this module stays cheap.
+#
+# The extracted text of every page is saved as a parsed-document artifact, a gzip-compressed JSON
+# Lines file keyed by the PDF's SHA-256 and `PARSER_VERSION`, so re-ingestion and re-chunking read
+# it back instead of running PyPDFLoader again.
+import gzip
+import hashlib
+import json
+import os
+import uuid
+
+# Bump when extraction changes (loader, its options or library upgrade) so old artifacts are ignored
+PARSER_VERSION = 'pypdf-1'
+
+
+def make_text_splitter(chunk_size, chunk_overlap):
+    """
+    Builds the text splitter used for every ingestion path.
+
+    Args:
+    chunk_size (int): The maximum number of characters per chunk.
+    chunk_overlap (int): The number of characters shared by neighbouring chunks.
+
+    Returns:
+    RecursiveCharacterTextSplitter: The configured splitter.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def iter_pages(file_path):
+    """
+    Yields the pages of a PDF one at a time, so only the current page is held in memory.
+
+    Args:
+    file_path (str): The path of the PDF document.
+
+    Yields:
+    Document: One Langchain document per page.
+    """
+    from langchain.document_loaders import PyPDFLoader
+
+    yield from PyPDFLoader(file_path).lazy_load()
+
+
+def file_sha256(file_path):
+    """
+    Computes the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+    file_path (str): The path of the file.
+
+    Returns:
+    str: The hex digest.
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as content:
+        for data in iter(lambda: content.read(1024 * 1024), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def artifact_path(artifact_dir, sha256):
+    """
+    Returns where the parsed-document artifact of a PDF is stored.
+
+    Args:
+    artifact_dir (str): The artifact root directory.
+    sha256 (str): The SHA-256 of the PDF.
+
+    Returns:
+    str: The path, sharded by the first two hex digits of the hash.
+    """
+    return os.path.join(artifact_dir, sha256[:2], f"{sha256}.{PARSER_VERSION}.jsonl.gz")
+
+
+def _read_artifact(path, file_path):
+    from langchain_core.documents import Document
+
+    with gzip.open(path, 'rt', encoding='utf-8') as artifact:
+        for line in artifact:
+            page = json.loads(line)
+            # Identical PDFs share an artifact, so point `source` at the file being ingested
+            yield Document(page_content=page['text'], metadata={**page['metadata'], 'source': file_path})
+
+
+def _parse_to_artifact(path, file_path):
+    # Pages are written as they are parsed; the artifact only appears once the whole PDF is done
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with gzip.open(temporary, 'wt', encoding='utf-8') as artifact:
+            for page in iter_pages(file_path):
+                artifact.write(json.dumps(
+                    {'text': page.page_content, 'metadata': page.metadata}, ensure_ascii=False
+                ) + "\n")
+                yield page
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def iter_cached_pages(file_path, artifact_dir, sha256=None):
+    """
+    Yields the pages of a PDF from its parsed-document artifact, parsing the PDF and writing the
+    artifact on the first call. Without an `artifact_dir` this is `iter_pages`.
+
+    Args:
+    file_path (str): The path of the PDF document.
+    artifact_dir (str): The artifact root directory, or '' / None to always parse.
+    sha256 (str): The SHA-256 of the PDF if known; it is computed otherwise.
+
+    Yields:
+    Document: One Langchain document per page, with the `page` number in its metadata.
+    """
+    if not artifact_dir:
+        yield from iter_pages(file_path)
+        return
+    path = artifact_path(artifact_dir, sha256 or file_sha256(file_path))
+    if os.path.exists(path):
+        yield from _read_artifact(path, file_path)
+    else:
+        yield from _parse_to_artifact(path, file_path)
+
+
+def iter_chunks(pages, text_splitter):
+    """
+    Splits each page as it arrives and yields its chunks.
+
+    Args:
+    pages (iterable): The page documents, typically from `iter_pages`.
+    text_splitter (TextSplitter): The splitter applied to each page.
+
+    Yields:
+    Document: One Langchain document per chunk.
+    """
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+
+def parse_to_artifact(file_id, file_path, artifact_dir, sha256=None):
+    """
+    Writes the parsed-document artifact of a PDF unless it already exists. Used by bulk ingestion,
+    where PDFs are parsed in worker processes and the parent then streams the pages back from the
+    artifact (see `iter_cached_pages`), so no process holds a whole document's chunks.
+
+    Args:
+    file_id (int): The ID of the file, passed through so results can be matched to files.
+    file_path (str): The path of the PDF document.
+    artifact_dir (str): The parsed-document artifact directory.
+    sha256 (str): The SHA-256 of the PDF if known; it is computed otherwise.
+
+    Returns:
+    tuple: `(file_id, sha256)`.
+    """
+    sha256 = sha256 or file_sha256(file_path)
+    path = artifact_path(artifact_dir, sha256)
+    if not os.path.exists(path):
+        for _ in _parse_to_artifact(path, file_path):
+            pass
+    return file_id, sha256
@@ -0,0 +1,113 @@
+# Micro-batching of query embeddings. Concurrent requests each used to run their own MiniLM forward
+# pass, and many one-text passes compete for the same CPU threads. The batcher queues query texts,
+# waits a few milliseconds for more to arrive and embeds them in one batched pass on a single
+# dispatcher thread, so peak load costs fewer, larger passes.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .metrics import Histogram
+
+# Upper bounds of the batch-size histogram
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+batch_size_histogram = Histogram(
+    'genai_query_embedding_batch_size', 'Number of queries embedded per batched forward pass.', 'model',
+    buckets=BATCH_SIZE_BUCKETS,
+)
+batch_wait_histogram = Histogram(
+    'genai_query_embedding_wait_seconds', 'Time a query spent queued before its batch was embedded.', 'model',
+)
+
+
+class QueryBatcher:
+    """
+    Collects query texts from concurrent callers and embeds them in batches. The first queued
+    query opens a batch; the batch is embedded once it holds `max_batch_size` queries or
+    `max_wait_ms` has passed since it opened, whichever comes first. A lone query therefore waits
+    at most `max_wait_ms`.
+
+    Args:
+    embed_batch (callable): Embeds a list of texts, returning one vector per text.
+    max_batch_size (int): The most queries embedded in one pass.
+    max_wait_ms (float): How long an open batch waits for more queries.
+    name (str): The label of the batch metrics, e.g. the model name.
+    """
+
+    def __init__(self, embed_batch, max_batch_size=16, max_wait_ms=5, name='default'):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000
+        self.name = name
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_dispatcher(self):
+        # Threads do not survive a fork, so a pre-forking server starts one dispatcher per worker
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name='query-embedding-batcher', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, text):
+        """
+        Queues a query for the next batch.
+
+        Args:
+        text (str): The query to embed.
+
+        Returns:
+        Future: Resolves to the query embedding, or to the exception the model raised.
+        """
+        self._ensure_dispatcher()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text):
+        """
+        Embeds a query as part of a batch, blocking until its batch has been embedded.
+
+        Args:
+        text (str): The query to embed.
+
+        Returns:
+        list[float]: The query embedding.
+        """
+        return self.submit(text).result()
+
+    def _collect(self):
+        # Block for the first query, then gather more until the batch is full or the wait is over
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(block=remaining > 0, timeout=remaining if remaining > 0 else None))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                batch_wait_histogram.observe(self.name, started - queued_at)
+            batch_size_histogram.observe(self.name, len(batch))
+            try:
+                vectors = self.embed_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,97 @@
+# Heavy resources of the query pipeline (vector store, Gemini client, generator backend). Nothing here is created at
+# import time, so management commands and tests that never serve a query do not pay for it.
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .embeddings import get_embedding_service
+from .generators import get_generator
+
+
+_vector_db = None
+_gemini = None
+_lock = threading.Lock()
+
+
+def get_vector_db():
+    """
+    Returns the vector store shared by ingestion and retrieval in this process, opening the
+    backend configured by `VECTOR_STORE` on first use.
+
+    Returns:
+    BaseVectorStore: The shared vector store.
+    """
+    global _vector_db
+    if _vector_db is None:
+        with _lock:
+            if _vector_db is None:
+                config = settings.VECTOR_STORE
+                _vector_db = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _vector_db
+
+
+def get_gemini():
+    """
+    Returns the `google.generativeai` module, importing and configuring it on first use.
+
+    Returns:
+    module: The configured `google.generativeai` module.
+    """
+    global _gemini
+    if _gemini is None:
+        with _lock:
+            if _gemini is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=settings.GEMEINI_API_KEY)
+                _gemini = genai
+    return _gemini
+
+
+def readiness():
+    """
+    Reports which resources are loaded in this process.
+
+    Returns:
+    dict: One boolean per resource, plus `ready` when all of them are loaded.
+    """
+    status = {
+        'embedding_model': get_embedding_service().is_loaded,
+        'vector_store': _vector_db is not None,
+        'generator': get_generator().is_loaded,
+    }
+    status['ready'] = all(status.values())
+    return status
+
+
+def warm_up():
+    """
+    Loads every resource the query path needs, so a worker can preload before taking traffic.
+
+    Returns:
+    dict: The time in seconds spent on each resource.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    get_embedding_service().warm_up()
+    timings['embedding_model'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    get_vector_db().count()
+    timings['vector_store'] = round(time.perf_counter() - started, 3)
+
+    if settings.HYBRID_SEARCH_ENABLED:
+        from .sparse_index import get_synced_index
+
+        started = time.perf_counter()
+        get_synced_index(get_vector_db())
+        timings['sparse_index'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    get_generator().warm_up()
+    timings['generator'] = round(time.perf_counter() - started, 3)
+
+    return timings
@@ -0,0 +1,89 @@
+from .metrics import stage
+from .sparse_index import get_synced_index
+
+
+NO_CONTEXT_MESSAGE = "No relevant context available from the database."
+
+
+def search_vectors(vector_db, query_embedding, k=6, file_ids=None):
+    """
+    Runs a nearest-neighbour search against the vector store with a precomputed query
+    embedding, returning the chunk IDs along with the text so callers can key caches on them.
+
+    Args:
+    vector_db (BaseVectorStore): The vector store to search.
+    query_embedding (list[float]): The embedded query.
+    k (int): The number of chunks to return.
+    file_ids (list[int]): Optionally restrict the search to these files. The filter is applied by
+        the store before ranking, so only the vectors of those files are scored.
+
+    Returns:
+    list[dict]: The hits in rank order, each with `id`, `text`, `metadata`, `distance` and
+    `embedding`.
+    """
+    return vector_db.query(query_embedding, k, file_ids=file_ids)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several rankings of chunk IDs with reciprocal rank fusion: each ID scores
+    `sum(1 / (k + rank))` over the rankings it appears in. Only ranks are used, so BM25 scores and
+    vector distances need no calibration against each other.
+
+    Args:
+    rankings (list[list[str]]): The rankings, best first.
+    k (int): The RRF constant; larger values flatten the advantage of top ranks.
+
+    Returns:
+    list[tuple]: `(chunk_id, score)` pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def hybrid_search(vector_db, query, query_embedding, k=6, file_ids=None, candidates=20, rrf_k=60):
+    """
+    Retrieves chunks with both the vector search and the BM25 sparse index and fuses the two
+    rankings with reciprocal rank fusion, so exact matches on part numbers or error codes surface
+    even when their embeddings are not the nearest.
+
+    Args:
+    vector_db (BaseVectorStore): The vector store to search.
+    query (str): The query text, for the sparse search.
+    query_embedding (list[float]): The embedded query, for the vector search.
+    k (int): The number of chunks to return.
+    file_ids (list[int]): Optionally restrict both searches to these files.
+    candidates (int): The number of candidates taken from each search before fusion.
+    rrf_k (int): The reciprocal rank fusion constant.
+
+    Returns:
+    list[dict]: The hits in fused rank order, each with `id`, `text`, `metadata`, `embedding`,
+    `distance` (None for chunks only the sparse search found) and the fused `score`.
+    """
+    with stage('vector_search'):
+        dense = search_vectors(vector_db, query_embedding, k=candidates, file_ids=file_ids)
+
+    with stage('sparse_search'):
+        index = get_synced_index(vector_db)
+        allowed = None
+        if file_ids:
+            allowed = vector_db.ids_for_files(file_ids)
+        sparse = index.search(query, candidates, ids=allowed)
+
+    with stage('rank_fusion'):
+        rankings = [[hit['id'] for hit in dense], [chunk_id for chunk_id, _ in sparse]]
+        fused = reciprocal_rank_fusion(rankings, k=rrf_k)[:k]
+        hits_by_id = {hit['id']: hit for hit in dense}
+        # Chunks found only by the sparse search still need their text and metadata
+        sparse_only = [chunk_id for chunk_id, _ in fused if chunk_id not in hits_by_id]
+        if sparse_only:
+            for chunk in vector_db.get(sparse_only):
+                hits_by_id[chunk['id']] = {**chunk, 'distance': None}
+        return [
+            {**hits_by_id[chunk_id], 'score': score}
+            for chunk_id, score in fused
+            if chunk_id in hits_by_id
+        ]
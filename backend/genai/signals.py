@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import File
+from users.signals import duplicate_uploaded
+from .ingestion import link_file_chunks
+
+
+@receiver(duplicate_uploaded)
+def link_duplicate_upload(sender, file, original, **kwargs):
+    """
+    Makes a duplicate upload reference the chunks and vectors of the original, and marks it raged
+    straight away if the original is. The vector store is not part of the database transaction, so
+    the linking waits until the upload's File has been committed.
+    """
+    def link():
+        link_file_chunks(file.id, original.id)
+        # Only mark the copy raged once its chunks are linked; until then it can be ingested normally
+        if original.raged:
+            File.objects.filter(id=file.id).update(raged=True, updated_at=timezone.now())
+            file.raged = True
+
+    transaction.on_commit(link)
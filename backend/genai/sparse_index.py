@@ -0,0 +1,332 @@
+# In-process BM25 inverted index over the chunks in the vector store. Dense MiniLM retrieval misses
+# exact tokens such as part numbers and error codes; this index catches them and its ranking is
+# fused with the vector results (see `retrieval.hybrid_search`).
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._/-][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[._/-]")
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase terms. Compound tokens such as `E-42` or `v2.1.0` are kept whole
+    and also indexed as their parts and with the separators removed (`e42`), so codes match
+    however they are written.
+
+    Args:
+    text (str): The text to tokenize.
+
+    Returns:
+    list[str]: The terms, with repetitions.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = TOKEN_SEPARATORS.split(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+            terms.append("".join(parts))
+    return terms
+
+
+class SparseIndex:
+    """
+    Incrementally updated BM25 index. Documents are numbered in insertion order; each term keeps
+    a postings list of document numbers and term frequencies, converted to NumPy arrays on first
+    use so a query is scored with a handful of vector operations. Removed documents are
+    tombstoned and compacted away once they outnumber the live ones.
+
+    Args:
+    k1 (float): BM25 term-frequency saturation.
+    b (float): BM25 length normalisation.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids = []  # document number -> chunk ID
+        self._numbers = {}  # live chunk ID -> document number
+        self._lengths = []
+        self._alive = []
+        self._postings = {}  # term -> ([document numbers], [term frequencies])
+        self._arrays = {}  # term -> (numbers, frequencies) as NumPy arrays
+        self._length_array = None
+        self._alive_array = None
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._numbers
+
+    def add(self, ids, texts):
+        """
+        Indexes documents. IDs already indexed are skipped, since chunk IDs are content hashes.
+
+        Args:
+        ids (list[str]): The chunk IDs.
+        texts (list[str]): The chunk texts.
+        """
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self._numbers:
+                    continue
+                number = len(self._ids)
+                frequencies = Counter(tokenize(text or ""))
+                length = sum(frequencies.values())
+                for term, frequency in frequencies.items():
+                    numbers, counts = self._postings.setdefault(term, ([], []))
+                    numbers.append(number)
+                    counts.append(frequency)
+                    self._arrays.pop(term, None)
+                self._ids.append(chunk_id)
+                self._numbers[chunk_id] = number
+                self._lengths.append(length)
+                self._alive.append(True)
+                self._total_length += length
+            self._length_array = self._alive_array = None
+
+    def remove(self, ids):
+        """
+        Removes documents from the index.
+
+        Args:
+        ids (list[str]): The chunk IDs; unknown IDs are ignored.
+        """
+        with self._lock:
+            for chunk_id in ids:
+                number = self._numbers.pop(chunk_id, None)
+                if number is None:
+                    continue
+                self._alive[number] = False
+                self._total_length -= self._lengths[number]
+            self._alive_array = None
+            if len(self._ids) - len(self._numbers) > max(len(self._numbers), 1000):
+                self._compact()
+
+    def _compact(self):
+        # Renumber live documents and drop tombstoned postings
+        renumber = np.full(len(self._ids), -1, dtype=np.int64)
+        live = [number for number, alive in enumerate(self._alive) if alive]
+        renumber[live] = np.arange(len(live))
+        postings = {}
+        for term, (numbers, counts) in self._postings.items():
+            kept = [
+                (int(renumber[number]), count) for number, count in zip(numbers, counts) if renumber[number] >= 0
+            ]
+            if kept:
+                postings[term] = ([number for number, _ in kept], [count for _, count in kept])
+        self._ids = [self._ids[number] for number in live]
+        self._numbers = {chunk_id: number for number, chunk_id in enumerate(self._ids)}
+        self._lengths = [self._lengths[number] for number in live]
+        self._alive = [True] * len(live)
+        self._postings = postings
+        self._arrays = {}
+        self._length_array = self._alive_array = None
+
+    def _term_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            numbers, counts = self._postings[term]
+            arrays = self._arrays[term] = (np.array(numbers, dtype=np.int64), np.array(counts, dtype=np.float32))
+        return arrays
+
+    def _snapshot(self, query_terms, ids):
+        # Arrays are replaced, never modified, when the index changes, and `_ids` is only appended
+        # to or swapped for a new list, so these references stay consistent once the lock is released
+        with self._lock:
+            live_count = len(self._numbers)
+            terms = [self._term_arrays(term) for term in query_terms if term in self._postings]
+            if not live_count or not terms:
+                return None
+            if self._length_array is None:
+                self._length_array = np.array(self._lengths, dtype=np.float32)
+            if self._alive_array is None:
+                self._alive_array = np.array(self._alive, dtype=bool)
+            allowed = None
+            if ids is not None:
+                allowed = np.fromiter(
+                    (self._numbers[chunk_id] for chunk_id in ids if chunk_id in self._numbers), dtype=np.int64
+                )
+            return (
+                terms, self._length_array, self._alive_array, self._ids, self._total_length / live_count,
+                live_count, allowed,
+            )
+
+    def search(self, query, k, ids=None):
+        """
+        Ranks the indexed documents against a query with BM25. Only the documents containing a
+        query term are scored, against a snapshot taken under the lock, so concurrent queries and
+        index updates do not wait on each other's scoring.
+
+        Args:
+        query (str): The query text.
+        k (int): The maximum number of results.
+        ids (iterable): Optionally only rank these chunk IDs, e.g. the chunks of a scoped query.
+
+        Returns:
+        list[tuple]: `(chunk_id, score)` pairs, best first; documents matching no term are omitted.
+        """
+        snapshot = self._snapshot(set(tokenize(query)), ids)
+        if snapshot is None:
+            return []
+        terms, lengths, alive, document_ids, average_length, live_count, allowed = snapshot
+
+        matched, contributions = [], []
+        for numbers, frequencies in terms:
+            live = alive[numbers]
+            document_frequency = np.count_nonzero(live)
+            if not document_frequency:
+                continue
+            numbers, frequencies = numbers[live], frequencies[live]
+            idf = np.log1p((live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[numbers] / average_length)
+            matched.append(numbers)
+            contributions.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+        if not matched:
+            return []
+
+        # Sum each document's per-term scores over the candidates only, not the whole collection
+        candidates, positions = np.unique(np.concatenate(matched), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(contributions))
+        if allowed is not None:
+            kept = np.isin(candidates, allowed)
+            candidates, scores = candidates[kept], scores[kept]
+            if not len(scores):
+                return []
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (document_ids[candidates[position]], float(scores[position])) for position in top if scores[position] > 0
+        ]
+
+    def sync(self, vector_db, batch_size=1000):
+        """
+        Brings the index in line with the vector store: indexes chunks it is missing and drops
+        chunks that were deleted. Used for the initial build and, from a background thread, to
+        pick up ingestion done by other processes.
+
+        Args:
+        vector_db (BaseVectorStore): The vector store.
+        batch_size (int): The number of documents fetched per request.
+        """
+        # Snapshot the index before reading the store: a chunk indexed by a concurrent ingestion in
+        # between is then absent from both and cannot be mistaken for a deleted one
+        with self._lock:
+            indexed = list(self._numbers)
+        stored = set(vector_db.all_ids())
+        missing = [chunk_id for chunk_id in stored if chunk_id not in self]
+        deleted = [chunk_id for chunk_id in indexed if chunk_id not in stored]
+        self.remove(deleted)
+        for start in range(0, len(missing), batch_size):
+            batch = vector_db.get(missing[start:start + batch_size], embeddings=False)
+            self.add([chunk['id'] for chunk in batch], [chunk['text'] for chunk in batch])
+        self.synced_at = time.monotonic()
+
+
+_sparse_index = None
+_sparse_index_lock = threading.Lock()
+_sync_thread = None
+_sync_pid = None
+
+
+def get_sparse_index():
+    """
+    Returns the process-wide sparse index, creating it empty on first call. Use `get_synced_index`
+    on the query path so it is built from the vector store.
+
+    Returns:
+    SparseIndex: The shared index.
+    """
+    global _sparse_index
+    if _sparse_index is None:
+        with _sparse_index_lock:
+            if _sparse_index is None:
+                _sparse_index = SparseIndex(k1=settings.BM25_K1, b=settings.BM25_B)
+    return _sparse_index
+
+
+def _sync_periodically(vector_db):
+    while True:
+        time.sleep(settings.SPARSE_INDEX_SYNC_SECONDS)
+        try:
+            get_sparse_index().sync(vector_db)
+        except Exception:
+            # A failed pass is retried on the next interval; queries keep using the current index
+            logger.exception("Sparse index sync failed")
+
+
+def _ensure_sync_thread(vector_db):
+    # Threads do not survive a fork, so a pre-forking server starts one sync thread per worker
+    global _sync_thread, _sync_pid
+    if settings.SPARSE_INDEX_SYNC_SECONDS <= 0:
+        return
+    if _sync_thread is not None and _sync_thread.is_alive() and _sync_pid == os.getpid():
+        return
+    with _sparse_index_lock:
+        if _sync_thread is None or not _sync_thread.is_alive() or _sync_pid != os.getpid():
+            _sync_thread = threading.Thread(
+                target=_sync_periodically, args=(vector_db,), name='sparse-index-sync', daemon=True
+            )
+            _sync_pid = os.getpid()
+            _sync_thread.start()
+
+
+def get_synced_index(vector_db):
+    """
+    Returns the sparse index, building it from the vector store on first use. Ingestion in this
+    process updates the index directly (`index_chunks` / `unindex_chunks`); writes made by other
+    processes are picked up by a background thread that re-syncs every
+    `SPARSE_INDEX_SYNC_SECONDS`, so queries never wait on a sync after the first build.
+
+    Args:
+    vector_db (BaseVectorStore): The vector store.
+
+    Returns:
+    SparseIndex: The shared index.
+    """
+    index = get_sparse_index()
+    if index.synced_at is None:
+        with _sparse_index_lock:
+            if index.synced_at is None:
+                index.sync(vector_db)
+    _ensure_sync_thread(vector_db)
+    return index
+
+
+def index_chunks(ids, texts):
+    """
+    Adds freshly written chunks to the sparse index if it has been built in this process.
+
+    Args:
+    ids (list[str]): The chunk IDs.
+    texts (list[str]): The chunk texts.
+    """
+    if _sparse_index is not None and _sparse_index.synced_at is not None:
+        _sparse_index.add(ids, texts)
+
+
+def unindex_chunks(ids):
+    """
+    Removes deleted chunks from the sparse index if it has been built in this process.
+
+    Args:
+    ids (list[str]): The chunk IDs.
+    """
+    if _sparse_index is not None and _sparse_index.synced_at is not None:
+        _sparse_index.remove(ids)
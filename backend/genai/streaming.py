@@ -0,0 +1,56 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+def sse_event(event, data):
+    """
+    Formats one server-sent event.
+
+    Args:
+    event (str): The event name (e.g. 'context', 'token', 'done', 'error').
+    data (dict): The JSON-serializable payload.
+
+    Returns:
+    str: The encoded event, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def event_stream_response(events):
+    """
+    Wraps server-sent events in an unbuffered streaming response.
+
+    Args:
+    events (iterator): The encoded events; a plain iterator for WSGI views, an async one for ASGI.
+
+    Returns:
+    StreamingHttpResponse: A `text/event-stream` response.
+    """
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop reverse proxies from buffering the stream
+    return response
+
+
+async def aiter_sync(iterator):
+    """
+    Adapts a blocking iterator (such as a streaming Gemini response) to an async iterator.
+    Each `next()` call runs in a worker thread, so the event loop keeps serving other requests
+    while waiting for the next token.
+
+    Args:
+    iterator (iterator): The blocking iterator.
+
+    Yields:
+    object: The items of `iterator`, in order.
+    """
+    sentinel = object()
+    next_item = sync_to_async(next, thread_sensitive=False)
+    while True:
+        item = await next_item(iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
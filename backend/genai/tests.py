@@ -1,3 +1,651 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from users.models import File
+from .answer_cache import AnswerCache
+from .benchmarks import synthetic_vectors
+from .context_builder import assemble_context, drop_near_duplicates, merge_overlapping, select_mmr
+from .embedding_cache import EmbeddingCache, cache_namespace
+from .generators import FakeGenerator, set_generator
+from .jobs import enqueue_ingestion, recover_stale_jobs
+from .metrics import stage_duration
+from .models import IngestionJob, UserMessage
+from .parsing import artifact_path, file_sha256, iter_cached_pages, parse_to_artifact
+from .query_batcher import QueryBatcher
+from .retrieval import reciprocal_rank_fusion, search_vectors
+from .sparse_index import SparseIndex
+from .vector_stores import QuantizedVectorStore, file_filter, file_key
+from .views import resolve_query_scope
+
+
+class IngestionJobRecoveryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='editor', email='editor@example.com')
+        cls.file = File.objects.create(file='uploads/manual.pdf', user_id=user)
+
+    def test_active_job_is_reused(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = enqueue_ingestion(self.file)
+            self.assertEqual(enqueue_ingestion(self.file).id, job.id)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(IngestionJob.objects.count(), 1)
+
+    def test_stale_running_job_is_failed_and_replaced(self):
+        job = IngestionJob.objects.create(file_id=self.file, status=IngestionJob.STATUS_RUNNING)
+        IngestionJob.objects.filter(id=job.id).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+
+        with self.captureOnCommitCallbacks():
+            new_job = enqueue_ingestion(self.file)
+        self.assertNotEqual(new_job.id, job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_FAILED)
+
+    def test_recent_running_job_is_kept(self):
+        IngestionJob.objects.create(file_id=self.file, status=IngestionJob.STATUS_RUNNING)
+        self.assertEqual(recover_stale_jobs(), 0)
+
+    def test_chunk_parameters_are_stored(self):
+        with self.captureOnCommitCallbacks():
+            job = enqueue_ingestion(self.file, chunk_size=500, chunk_overlap=50)
+        self.assertEqual((job.chunk_size, job.chunk_overlap), (500, 50))
+
+    def test_rechunk_skips_files_being_ingested(self):
+        active_job = IngestionJob.objects.create(file_id=self.file, status=IngestionJob.STATUS_RUNNING)
+        with tempfile.TemporaryDirectory() as media_root:
+            os.makedirs(os.path.join(media_root, 'uploads'))
+            with open(os.path.join(media_root, 'uploads', 'manual.pdf'), 'wb') as pdf:
+                pdf.write(b'%PDF-1.4')
+            errors = StringIO()
+            with override_settings(MEDIA_ROOT=media_root, PARSED_ARTIFACTS_DIR=os.path.join(media_root, 'parsed')):
+                call_command(
+                    'rechunk', files=str(self.file.id), chunk_size=500, chunk_overlap=50,
+                    stdout=StringIO(), stderr=errors,
+                )
+        self.assertIn(f"ingestion job {active_job.id} is already running, skipped", errors.getvalue())
+        self.assertEqual(IngestionJob.objects.count(), 1)
+
+
+class QuantizedVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+        self.vectors = synthetic_vectors(2000, dimension=64, clusters=50, seed=1)
+        self.ids = [f'chunk-{index}' for index in range(len(self.vectors))]
+        rng = np.random.default_rng(2)
+        queries = self.vectors[:20] + 0.05 * rng.normal(size=(20, 64)).astype(np.float32)
+        self.queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def _store(self, **options):
+        store = QuantizedVectorStore(self.path, block_rows=256, **options)
+        store.upsert(self.ids, self.vectors.tolist(), [f'text {index}' for index in range(len(self.ids))],
+                     [{'index': index} for index in range(len(self.ids))])
+        return store
+
+    def _recall(self, store, k=10):
+        recalls = []
+        for query in self.queries:
+            exact = {self.ids[index] for index in np.argsort(-(self.vectors @ query))[:k]}
+            found = {hit['id'] for hit in store.query(query.tolist(), k)}
+            recalls.append(len(exact & found) / k)
+        return float(np.mean(recalls))
+
+    def test_int8_with_rerank_matches_float32(self):
+        store = self._store(dtype='int8', store_float=True)
+        self.assertEqual(self._recall(store), 1.0)
+        query = self.queries[0]
+        hits = store.query(query.tolist(), 5)
+        exact = 2 - 2 * (self.vectors @ query)
+        for hit in hits:
+            self.assertAlmostEqual(hit['distance'], float(exact[self.ids.index(hit['id'])]), places=4)
+
+    def test_quantized_scan_recall(self):
+        for dtype in ('int8', 'float16'):
+            with self.subTest(dtype=dtype):
+                store = QuantizedVectorStore(tempfile.mkdtemp(dir=self.path), dtype=dtype, store_float=False)
+                store.upsert(self.ids, self.vectors.tolist(), [''] * len(self.ids), [{}] * len(self.ids))
+                self.assertGreaterEqual(self._recall(store), 0.9)
+
+    def test_deleted_chunks_are_hidden(self):
+        store = self._store()
+        query = self.vectors[0].tolist()
+        self.assertEqual(store.query(query, 1)[0]['id'], 'chunk-0')
+
+        store.delete(['chunk-0'])
+        self.assertNotIn('chunk-0', [hit['id'] for hit in store.query(query, 10)])
+        self.assertEqual(store.get(['chunk-0']), [])
+        self.assertEqual(store.count(), len(self.ids) - 1)
+
+        # A re-ingested chunk is published again under a new row
+        store.upsert(['chunk-0'], [query], ['text 0'], [{}])
+        self.assertEqual(store.query(query, 1)[0]['id'], 'chunk-0')
+
+    def test_upsert_replaces_the_vector_of_an_existing_chunk(self):
+        for store_float in (True, False):
+            with self.subTest(store_float=store_float):
+                store = QuantizedVectorStore(tempfile.mkdtemp(dir=self.path), store_float=store_float)
+                store.upsert(self.ids, self.vectors.tolist(), [''] * len(self.ids), [{}] * len(self.ids))
+                query = self.vectors[0].tolist()
+                self.assertEqual(store.query(query, 1)[0]['id'], 'chunk-0')
+
+                # chunk-5 now holds chunk-0's embedding and outranks every other chunk
+                store.upsert(['chunk-5', 'chunk-0'], [query, (-self.vectors[0]).tolist()], ['new', 'moved'], [{}, {}])
+                hits = store.query(query, 2)
+                self.assertEqual(hits[0]['id'], 'chunk-5')
+                self.assertNotIn('chunk-0', [hit['id'] for hit in store.query(query, 10)])
+                self.assertEqual(store.get(['chunk-5'])[0]['text'], 'new')
+                self.assertEqual(store.count(), len(self.ids))
+
+    def test_file_filter(self):
+        store = self._store()
+        store.set_file_membership(self.ids[100:110], 7, True)
+        hits = store.query(self.vectors[0].tolist(), 20, file_ids=[7])
+        self.assertEqual({hit['id'] for hit in hits}, set(self.ids[100:110]))
+        store.delete(['chunk-100'])
+        hits = store.query(self.vectors[0].tolist(), 20, file_ids=[7])
+        self.assertNotIn('chunk-100', {hit['id'] for hit in hits})
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def test_backends_and_model_files_do_not_share_vectors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model_paths = []
+            for name, content in (('model.onnx', b'float32'), ('model_int8.onnx', b'int8')):
+                model_paths.append(os.path.join(directory, name))
+                with open(model_paths[-1], 'wb') as model_file:
+                    model_file.write(content)
+            namespaces = [cache_namespace('minilm')] + [cache_namespace('minilm', 'onnx', path) for path in model_paths]
+            self.assertEqual(len(set(namespaces)), 3)
+
+            cache = EmbeddingCache(os.path.join(directory, 'cache.sqlite3'))
+            cache.put_many(namespaces[0], ['pump'], [[1.0, 0.0]])
+            self.assertEqual(cache.get_many(namespaces[0], ['pump']), [[1.0, 0.0]])
+            self.assertEqual(cache.get_many(namespaces[1], ['pump']), [None])
+
+            # Re-exporting under the same name changes the namespace too
+            with open(model_paths[1], 'wb') as model_file:
+                model_file.write(b'int8 re-export')
+            self.assertNotEqual(cache_namespace('minilm', 'onnx', model_paths[1]), namespaces[2])
+
+    def test_size_is_checked_every_few_inserts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EmbeddingCache(os.path.join(directory, 'cache.sqlite3'), max_entries=100)
+            cache.put_many('minilm', [f'chunk {i}' for i in range(104)], [[float(i)] for i in range(104)])
+            self.assertEqual(cache.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0], 90)
+
+            # The size is checked again once 5 more rows have been written
+            cache._evict = mock.Mock(wraps=cache._evict)
+            cache.put_many('minilm', [f'extra {i}' for i in range(4)], [[0.0]] * 4)
+            cache._evict.assert_not_called()
+            cache.put_many('minilm', [f'more {i}' for i in range(7)], [[0.0]] * 7)
+            cache._evict.assert_called_once()
+            self.assertEqual(cache.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0], 90)
+
+    def test_hits_only_write_stale_last_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EmbeddingCache(os.path.join(directory, 'cache.sqlite3'))
+            cache.put_many('minilm', ['fresh', 'stale'], [[1.0], [2.0]])
+            with cache.connection:
+                cache.connection.execute("UPDATE embeddings SET last_used = 0 WHERE key = ?",
+                                         (cache.make_key('minilm', 'stale'),))
+            changes = cache.connection.total_changes
+            self.assertEqual(cache.get_many('minilm', ['fresh', 'stale']), [[1.0], [2.0]])
+            self.assertEqual(cache.connection.total_changes - changes, 1)
+            last_used = cache.connection.execute("SELECT MIN(last_used) FROM embeddings").fetchone()[0]
+            self.assertGreater(last_used, 0)
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def test_exact_hit_ignores_case_and_chunk_order(self):
+        cache = AnswerCache()
+        cache.put("How do I reset the pump?", ['a', 'b'], "Hold the button.")
+        self.assertEqual(cache.get("how do i reset the pump", ['b', 'a']), ("Hold the button.", 'exact'))
+
+    def test_different_chunks_miss(self):
+        cache = AnswerCache()
+        cache.put("reset the pump", ['a', 'b'], "Hold the button.", query_embedding=[1.0, 0.0])
+        self.assertIsNone(cache.get("reset the pump", ['a', 'c']))
+        self.assertIsNone(cache.get("pump reset", ['a', 'c'], query_embedding=[1.0, 0.0]))
+
+    def test_semantic_hit(self):
+        cache = AnswerCache(similarity_threshold=0.95)
+        cache.put("reset the pump", ['a'], "Hold the button.", query_embedding=[1.0, 0.0])
+        self.assertEqual(cache.get("pump reset", ['a'], query_embedding=[0.99, 0.05])[1], 'semantic')
+        self.assertIsNone(cache.get("pump reset", ['a'], query_embedding=[0.5, 0.5]))
+
+    def test_entries_expire(self):
+        cache = AnswerCache(ttl_seconds=0)
+        cache.put("reset the pump", ['a'], "Hold the button.", query_embedding=[1.0, 0.0])
+        self.assertIsNone(cache.get("reset the pump", ['a'], query_embedding=[1.0, 0.0]))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = AnswerCache(max_entries=2)
+        cache.put("first", ['a'], "1")
+        cache.put("second", ['a'], "2")
+        cache.get("first", ['a'])
+        cache.put("third", ['a'], "3")
+        self.assertIsNone(cache.get("second", ['a']))
+        self.assertEqual(cache.get("first", ['a'])[0], "1")
+        self.assertEqual(cache.get("third", ['a'])[0], "3")
+
+
+class SparseSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SparseIndex()
+        self.index.add(
+            ['manual', 'codes', 'long', 'other'],
+            [
+                "Reset the pump by holding the power button.",
+                "Error E-42 means the pump is blocked.",
+                "The pump " + "is a pump that pumps water and " * 20 + "may show E42.",
+                "Clean the filter every month.",
+            ],
+        )
+
+    def test_exact_code_match_ranks_first(self):
+        results = self.index.search("what does e42 mean", 3)
+        self.assertEqual([chunk_id for chunk_id, _ in results], ['codes', 'long'])
+        self.assertGreater(results[0][1], results[1][1])
+
+    def test_filter_and_removal(self):
+        self.assertEqual([chunk_id for chunk_id, _ in self.index.search("pump", 5, ids=['long'])], ['long'])
+        self.index.remove(['codes'])
+        self.assertEqual([chunk_id for chunk_id, _ in self.index.search("E-42", 5)], ['long'])
+        self.assertEqual(self.index.search("unknown words", 5), [])
+
+    def test_sync_keeps_chunks_indexed_meanwhile(self):
+        index = self.index
+
+        class Store:
+            def all_ids(self):
+                # Ingestion in another thread indexes a chunk while the store's IDs are being read
+                index.add(['new'], ["Replace the E-42 seal."])
+                return ['manual', 'codes', 'long']
+
+            def get(self, ids, embeddings=True):
+                return []
+
+        index.sync(Store())
+        self.assertIn('new', index)
+        self.assertNotIn('other', index)
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a', 'd']], k=60)
+        self.assertEqual([chunk_id for chunk_id, _ in fused], ['a', 'c', 'b', 'd'])
+        self.assertAlmostEqual(fused[0][1], 1 / 61 + 1 / 62)
+
+
+class ContextBuilderTests(SimpleTestCase):
+    def _hit(self, chunk_id, text, embedding, page=1):
+        metadata = {'source': 'manual.pdf', 'page': page}
+        return {'id': chunk_id, 'text': text, 'embedding': embedding, 'metadata': metadata}
+
+    def test_mmr_prefers_diverse_blocks(self):
+        blocks = drop_near_duplicates(merge_overlapping([
+            self._hit('a', "pump reset steps one", [1.0, 0.0, 0.0], page=1),
+            self._hit('b', "pump reset steps two", [0.99, 0.1, 0.0], page=2),
+            self._hit('c', "filter cleaning schedule", [0.7, 0.0, 0.7], page=3),
+        ]))
+        selected = select_mmr(blocks, [1.0, 0.0, 0.0], budget=100, mmr_lambda=1.0)
+        self.assertEqual([block['ids'] for block in selected[:2]], [['a'], ['b']])
+        selected = select_mmr(blocks, [1.0, 0.0, 0.0], budget=100, mmr_lambda=0.3)
+        self.assertEqual([block['ids'] for block in selected[:2]], [['a'], ['c']])
+
+    def test_overlapping_chunks_are_merged(self):
+        first = "The pump is reset by holding the power button for five seconds"
+        second = "holding the power button for five seconds until the light blinks"
+        blocks = merge_overlapping([self._hit('a', first, None), self._hit('b', second, None)])
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0]['text'], first + " until the light blinks")
+
+    def test_budget_is_respected(self):
+        hits = [self._hit(str(index), f"section {index} " + "word " * 50, None, page=index) for index in range(6)]
+        context, stats = assemble_context(hits, None, budget=150, baseline_k=6)
+        self.assertLessEqual(stats['context_tokens'], 150)
+        self.assertEqual(stats['tokens_saved'], stats['baseline_tokens'] - stats['context_tokens'])
+        self.assertGreater(stats['tokens_saved'], 0)
+
+        # A single block larger than the budget is cut at a word boundary
+        context, stats = assemble_context(hits[:1], None, budget=10)
+        self.assertLessEqual(stats['context_tokens'], 10)
+        self.assertFalse(context.endswith("wor"))
+
+    def test_saving_can_be_negative(self):
+        hits = [self._hit('a', "short", None), self._hit('b', "word " * 200, None, page=2)]
+        _, stats = assemble_context(hits, None, budget=1000, baseline_k=1)
+        self.assertLess(stats['tokens_saved'], 0)
+
+
+class QueryStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com')
+
+    def setUp(self):
+        self.generator = FakeGenerator(first_token_latency=0, tokens_per_second=0, answer_tokens=3)
+        set_generator(self.generator)
+        self.addCleanup(set_generator, None)
+        patcher = mock.patch('genai.views.retrieve_context', return_value=("Hold the button.", [], None, {}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(ANSWER_CACHE_ENABLED=False, GENAI_METRICS_ENABLED=True)
+    def test_tokens_are_streamed_as_they_are_generated(self):
+        produced = []
+        stream = self.generator.stream
+
+        def tracked_stream(prompt):
+            for piece in stream(prompt):
+                produced.append(piece)
+                yield piece
+
+        self.generator.stream = tracked_stream
+        generate_count = stage_duration.total('generate')[1]
+        response = self.client.post(
+            '/api/genai/query/stream/', {'query': 'How do I reset the pump?', 'user_id': self.user.id},
+            content_type='application/json',
+        )
+        self.assertFalse(response.is_async)
+        events = iter(response.streaming_content)
+
+        self.assertIn(b'event: context', next(events))
+        self.assertEqual(produced, [])
+        self.assertIn(b'event: token', next(events))
+        self.assertEqual(len(produced), 1)
+
+        remaining = b''.join(events)
+        self.assertIn(b'event: done', remaining)
+        self.assertEqual(UserMessage.objects.get(user_id=self.user).bot_reply, "".join(produced))
+        self.assertEqual(stage_duration.total('generate')[1], generate_count + 1)
+
+
+class ChatHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com')
+        other = User.objects.create_user(username='other', email='other@example.com')
+        UserMessage.objects.create(user_id=other, user_question="Not mine", bot_reply="No")
+        cls.messages = [
+            UserMessage.objects.create(user_id=cls.user, user_question=f"Question {i}", bot_reply=f"Reply {i}")
+            for i in range(5)
+        ]
+        # Messages saved in the same instant are ordered by id
+        now = timezone.now()
+        UserMessage.objects.filter(id__in=[message.id for message in cls.messages[1:4]]).update(timestamp=now)
+        UserMessage.objects.filter(id=cls.messages[4].id).update(timestamp=now + datetime.timedelta(seconds=1))
+
+    def test_pages_follow_the_cursor_newest_first(self):
+        url = f'/api/genai/chat_history/{self.user.id}/'
+        seen = []
+        params = {'page_size': 2}
+        pages = 0
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages += 1
+            seen.extend(row['id'] for row in response.data['results'])
+            self.assertEqual(response.data['has_more'], response.data['next_cursor'] is not None)
+            if not response.data['has_more']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [message.id for message in reversed(self.messages)])
+
+    @override_settings(CHAT_HISTORY_PREVIEW_CHARS=3)
+    def test_preview_truncates_messages(self):
+        response = self.client.get(f'/api/genai/chat_history/{self.user.id}/', {'page_size': 1, 'preview': 'true'})
+        self.assertEqual(response.data['results'][0]['user_question'], "Que")
+        self.assertEqual(response.data['results'][0]['bot_reply'], "Rep")
+        self.assertTrue(response.data['has_more'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/genai/chat_history/{self.user.id}/', {'cursor': 'not-a-cursor!'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScopedQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        cls.manual = File.objects.create(file='uploads/manual.pdf', user_id=cls.alice)
+        cls.notes = File.objects.create(file='uploads/notes.pdf', user_id=cls.alice)
+        cls.guide = File.objects.create(file='uploads/guide.pdf', user_id=cls.bob)
+
+    def test_resolve_query_scope(self):
+        self.assertIsNone(resolve_query_scope())
+        self.assertEqual(sorted(resolve_query_scope(file_ids=[self.manual.id, str(self.guide.id)])),
+                         [self.manual.id, self.guide.id])
+        self.assertEqual(sorted(resolve_query_scope(uploaded_by=self.alice.id)), [self.manual.id, self.notes.id])
+        self.assertEqual(resolve_query_scope(file_ids=[self.manual.id, self.guide.id], uploaded_by=self.bob.id),
+                         [self.guide.id])
+        # A scope matching no file searches nothing rather than everything
+        self.assertEqual(resolve_query_scope(file_ids=[self.guide.id], uploaded_by=self.alice.id), [])
+
+        for scope in ({'file_ids': self.manual.id}, {'file_ids': ['manual']}, {'uploaded_by': 'alice'}):
+            with self.assertRaises(ValidationError):
+                resolve_query_scope(**scope)
+
+    def test_invalid_scope_is_rejected(self):
+        response = self.client.post(
+            '/api/genai/query/', {'query': 'reset', 'user_id': self.alice.id, 'file_ids': 'all'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_only_scores_chunks_of_the_scoped_files(self):
+        store = QuantizedVectorStore(self.enterContext(tempfile.TemporaryDirectory()))
+        store.upsert(['manual', 'guide', 'shared'], [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]], ['', '', ''], [{}] * 3)
+        store.set_file_membership(['manual', 'shared'], self.manual.id, True)
+        store.set_file_membership(['guide', 'shared'], self.guide.id, True)
+
+        self.assertEqual(set(store.ids_for_files([self.guide.id])), {'guide', 'shared'})
+        hits = search_vectors(store, [0.0, 1.0], k=3, file_ids=[self.manual.id])
+        self.assertEqual([hit['id'] for hit in hits], ['shared', 'manual'])
+        self.assertEqual(search_vectors(store, [0.0, 1.0], k=3, file_ids=[self.notes.id]), [])
+
+    def test_chroma_filter(self):
+        self.assertIsNone(file_filter(None))
+        self.assertEqual(file_filter([self.manual.id]), {file_key(self.manual.id): True})
+        self.assertEqual(
+            file_filter([self.guide.id, self.manual.id, self.manual.id]),
+            {'$or': [{file_key(self.manual.id): True}, {file_key(self.guide.id): True}]},
+        )
+
+
+class QueryBatcherTests(SimpleTestCase):
+    def test_queued_queries_share_batches(self):
+        batches = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def embed_batch(texts):
+            batches.append(list(texts))
+            started.set()
+            release.wait(5)
+            return [[float(len(text))] for text in texts]
+
+        batcher = QueryBatcher(embed_batch, max_batch_size=3, max_wait_ms=50)
+        first = batcher.submit('a')
+        self.assertTrue(started.wait(5))
+        # Queries arriving while the model is busy wait for the next batches
+        futures = [batcher.submit('b' * length) for length in range(1, 6)]
+        release.set()
+
+        self.assertEqual(first.result(5), [1.0])
+        self.assertEqual([future.result(5) for future in futures], [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual([len(batch) for batch in batches], [1, 3, 2])
+
+    def test_model_errors_reach_every_caller_of_the_batch(self):
+        def embed_batch(texts):
+            if 'broken' in texts:
+                raise ValueError("model failed")
+            return [[0.0] for _ in texts]
+
+        batcher = QueryBatcher(embed_batch, max_batch_size=2, max_wait_ms=1000)
+        futures = [batcher.submit('broken'), batcher.submit('fine')]
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, "model failed"):
+                future.result(5)
+        # The dispatcher keeps serving later batches
+        self.assertEqual(batcher.embed('fine'), [0.0])
+
+
+class ParsedArtifactTests(TestCase):
+    # PyPDFLoader and the splitter are replaced so the tests only exercise the artifact handling
+    PAGES = [
+        SimpleNamespace(page_content="Hold the reset button.", metadata={'page': 0}),
+        SimpleNamespace(page_content="Release after five seconds.", metadata={'page': 1}),
+    ]
+
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.artifact_dir = os.path.join(self.media_root, 'parsed')
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        self.pdf_path = os.path.join(self.media_root, 'uploads', 'manual.pdf')
+        with open(self.pdf_path, 'wb') as pdf:
+            pdf.write(b'%PDF-1.4 manual')
+        self.sha256 = file_sha256(self.pdf_path)
+        self.iter_pages = self.enterContext(mock.patch('genai.parsing.iter_pages', return_value=iter(self.PAGES)))
+
+    def test_first_parse_writes_the_artifact(self):
+        self.assertEqual(list(iter_cached_pages(self.pdf_path, self.artifact_dir)), self.PAGES)
+        with gzip.open(artifact_path(self.artifact_dir, self.sha256), 'rt', encoding='utf-8') as artifact:
+            pages = [json.loads(line) for line in artifact]
+        self.assertEqual(pages, [{'text': page.page_content, 'metadata': page.metadata} for page in self.PAGES])
+
+    def test_failed_parse_leaves_no_artifact(self):
+        def broken_pages(file_path):
+            yield self.PAGES[0]
+            raise ValueError("corrupt page")
+
+        self.iter_pages.side_effect = broken_pages
+        with self.assertRaises(ValueError):
+            list(iter_cached_pages(self.pdf_path, self.artifact_dir, self.sha256))
+        self.assertEqual(os.listdir(os.path.dirname(artifact_path(self.artifact_dir, self.sha256))), [])
+
+    def test_rechunk_dry_run_writes_nothing(self):
+        user = User.objects.create_user(username='editor', email='editor@example.com')
+        uploaded = File.objects.create(file='uploads/manual.pdf', user_id=user, raged=True)
+        splitter = mock.Mock(split_documents=lambda pages: pages)
+        output = StringIO()
+        with override_settings(MEDIA_ROOT=self.media_root, PARSED_ARTIFACTS_DIR=self.artifact_dir), \
+                mock.patch('genai.management.commands.rechunk.make_text_splitter', return_value=splitter):
+            call_command('rechunk', dry_run=True, chunk_size=500, chunk_overlap=50, stdout=output)
+
+        self.assertIn("1 files, 2 pages, 2 chunks", output.getvalue())
+        self.assertIn("1 PDFs parsed", output.getvalue())
+        uploaded.refresh_from_db()
+        self.assertIsNone(uploaded.sha256)
+        self.assertFalse(os.path.exists(self.artifact_dir))
+        self.assertFalse(IngestionJob.objects.exists())
+
+
+class IngestionJobEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='editor', email='editor@example.com')
+        cls.file = File.objects.create(file='uploads/manual.pdf', user_id=user)
+
+    def test_ingestion_is_queued_once(self):
+        url = reverse('perform-rag-lll', args=[self.file.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url)
+            again = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['job']['status'], IngestionJob.STATUS_QUEUED)
+        self.assertEqual(again.data['job']['id'], response.data['job']['id'])
+        self.assertEqual(len(callbacks), 1)
+
+        response = self.client.get(reverse('get-ingestion-job', args=[again.data['job']['id']]))
+        self.assertEqual(response.data['job']['file_id'], self.file.id)
+        self.assertEqual(self.client.post(reverse('perform-rag-lll', args=[self.file.id + 100])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('get-ingestion-job', args=[0])).status_code, 404)
+
+    def test_cancel(self):
+        queued = IngestionJob.objects.create(file_id=self.file)
+        response = self.client.post(reverse('cancel-ingestion-job', args=[queued.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['job']['status'], IngestionJob.STATUS_CANCELLED)
+        self.assertEqual(self.client.post(reverse('cancel-ingestion-job', args=[queued.id])).status_code, 409)
+
+        # A running job is only flagged; the worker stops at its next batch
+        running = IngestionJob.objects.create(file_id=self.file, status=IngestionJob.STATUS_RUNNING)
+        response = self.client.post(reverse('cancel-ingestion-job', args=[running.id]))
+        self.assertEqual(response.data['job']['status'], IngestionJob.STATUS_RUNNING)
+        self.assertTrue(response.data['job']['cancel_requested'])
+
+
+class BulkIngestionEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='editor', email='editor@example.com')
+        cls.manual = File.objects.create(file='uploads/manual.pdf', user_id=user)
+        cls.notes = File.objects.create(file='uploads/notes.pdf', user_id=user)
+        cls.guide = File.objects.create(file='uploads/guide.pdf', user_id=user, raged=True)
+
+    def test_bulk_run_skips_files_with_an_active_job(self):
+        busy = IngestionJob.objects.create(file_id=self.notes, status=IngestionJob.STATUS_RUNNING)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                reverse('perform-rag-bulk'), {'file_ids': [self.manual.id, self.notes.id]},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(response.data['bulk']['files_total'], 1)
+        self.assertNotIn(busy.id, response.data['job_ids'])
+
+        response = self.client.get(reverse('get-bulk-ingestion', args=[response.data['bulk']['id']]))
+        self.assertEqual([job['file_id'] for job in response.data['jobs']], [self.manual.id])
+
+    def test_pending_covers_files_not_raged(self):
+        with self.captureOnCommitCallbacks():
+            response = self.client.post(reverse('perform-rag-bulk'), {'pending': True}, content_type='application/json')
+        files = IngestionJob.objects.filter(id__in=response.data['job_ids']).values_list('file_id', flat=True)
+        self.assertEqual(sorted(files), [self.manual.id, self.notes.id])
+
+        response = self.client.post(reverse('perform-rag-bulk'), {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('get-bulk-ingestion', args=[0])).status_code, 404)
+
+    def test_cancel(self):
+        with self.captureOnCommitCallbacks():
+            response = self.client.post(reverse('perform-rag-bulk'), {'pending': True}, content_type='application/json')
+        IngestionJob.objects.filter(file_id=self.notes).update(status=IngestionJob.STATUS_COMPLETED)
+
+        response = self.client.post(reverse('cancel-bulk-ingestion', args=[response.data['bulk']['id']]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['jobs_cancelled'], 1)
+        self.assertTrue(IngestionJob.objects.get(file_id=self.manual).cancel_requested)
+
+    def test_workers_reuse_existing_artifacts(self):
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            path = os.path.join(artifact_dir, 'manual.pdf')
+            with open(path, 'wb') as pdf:
+                pdf.write(b'%PDF-1.4 manual')
+            sha256 = file_sha256(path)
+            os.makedirs(os.path.dirname(artifact_path(artifact_dir, sha256)))
+            with gzip.open(artifact_path(artifact_dir, sha256), 'wt', encoding='utf-8') as artifact:
+                artifact.write(json.dumps({'text': "Hold the button.", 'metadata': {'page': 0}}) + "\n")
+
+            with mock.patch('genai.parsing.iter_pages') as iter_pages:
+                self.assertEqual(parse_to_artifact(self.manual.id, path, artifact_dir), (self.manual.id, sha256))
+            iter_pages.assert_not_called()
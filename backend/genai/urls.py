@@ -1,8 +1,20 @@
 from django.urls import path
-from .views import perform_rag_lll,handle_query,get_chat_history  # Import your perform_rag_lll view
+from .async_views import handle_query_async, handle_query_stream_async
+from .views import perform_rag_lll,handle_query,get_chat_history,get_ingestion_job,cancel_ingestion_job,perform_rag_bulk,get_bulk_ingestion,cancel_bulk_ingestion,get_answer_cache_stats,handle_query_stream,get_readiness,get_metrics  # Import your perform_rag_lll view
 
 urlpatterns = [
     path('perform-rag/<int:file_id>/', perform_rag_lll, name='perform-rag-lll'),  # Handle RAG LLL for specific file
     path('query/',handle_query,name="handle_query"),
-    path('chat_history/<int:user_id>/',get_chat_history,name="get_chat_history")
+    path('query/async/', handle_query_async, name='handle_query_async'),
+    path('query/stream/', handle_query_stream, name='handle_query_stream'),
+    path('query/stream/async/', handle_query_stream_async, name='handle_query_stream_async'),
+    path('chat_history/<int:user_id>/',get_chat_history,name="get_chat_history"),
+    path('perform-rag/bulk/', perform_rag_bulk, name='perform-rag-bulk'),
+    path('perform-rag/bulk/<int:bulk_id>/', get_bulk_ingestion, name='get-bulk-ingestion'),
+    path('perform-rag/bulk/<int:bulk_id>/cancel/', cancel_bulk_ingestion, name='cancel-bulk-ingestion'),
+    path('metrics/', get_metrics, name='genai-metrics'),
+    path('ready/', get_readiness, name='genai-ready'),
+    path('answer-cache/stats/', get_answer_cache_stats, name='answer-cache-stats'),
+    path('jobs/<int:job_id>/', get_ingestion_job, name='get-ingestion-job'),
+    path('jobs/<int:job_id>/cancel/', cancel_ingestion_job, name='cancel-ingestion-job'),
 ]
@@ -0,0 +1,536 @@
+# Vector store backends. Ingestion and retrieval only use the `BaseVectorStore` methods, so the
+# backend is chosen with the `VECTOR_STORE` setting (`BACKEND` class path and `OPTIONS`), like the
+# answer generator.
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+
+def file_key(file_id):
+    """
+    Returns the metadata key marking a Chroma vector as part of a file. Identical chunks are
+    stored once and shared between files, so membership is one boolean key per file rather than
+    a single `file_id` value.
+
+    Args:
+    file_id (int): The ID of the file.
+
+    Returns:
+    str: The metadata key, e.g. `file_12`.
+    """
+    return f"file_{file_id}"
+
+
+def file_filter(file_ids):
+    """
+    Builds the Chroma `where` clause restricting a search to the given files.
+
+    Args:
+    file_ids (list[int]): The IDs of the files to search; empty or None means no restriction.
+
+    Returns:
+    dict: The `where` clause, or None for an unrestricted search.
+    """
+    if not file_ids:
+        return None
+    clauses = [{file_key(file_id): True} for file_id in sorted(set(file_ids))]
+    # Chroma requires at least two operands for $or
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class BaseVectorStore:
+    """
+    Interface of a vector store backend. Chunk IDs are content hashes; a chunk shared by several
+    files is stored once and records which files reference it.
+    """
+
+    def query(self, embedding, k, file_ids=None):
+        """
+        Runs a nearest-neighbour search.
+
+        Args:
+        embedding (list[float]): The embedded query.
+        k (int): The number of chunks to return.
+        file_ids (list[int]): Optionally only search chunks of these files, filtering before ranking.
+
+        Returns:
+        list[dict]: The hits in rank order, each with `id`, `text`, `metadata`, `distance` and
+        `embedding`.
+        """
+        raise NotImplementedError
+
+    def get(self, ids, embeddings=True):
+        """
+        Fetches stored chunks by ID; unknown IDs are skipped.
+
+        Args:
+        ids (list[str]): The chunk IDs.
+        embeddings (bool): Whether to include the vectors.
+
+        Returns:
+        list[dict]: The chunks, each with `id`, `text`, `metadata` and `embedding` (None when not
+        requested).
+        """
+        raise NotImplementedError
+
+    def existing_ids(self, ids):
+        """
+        Returns the subset of `ids` that is stored.
+        """
+        raise NotImplementedError
+
+    def all_ids(self):
+        """
+        Returns the IDs of every stored chunk.
+        """
+        raise NotImplementedError
+
+    def ids_for_files(self, file_ids):
+        """
+        Returns the IDs of the chunks referenced by any of the given files.
+        """
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        """
+        Stores chunks, replacing the text and metadata of IDs that already exist.
+        """
+        raise NotImplementedError
+
+    def set_file_membership(self, ids, file_id, member):
+        """
+        Marks chunks as referenced (`member=True`) or no longer referenced by a file.
+        """
+        raise NotImplementedError
+
+    def delete(self, ids):
+        """
+        Removes chunks.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """
+        Returns the number of stored chunks.
+        """
+        raise NotImplementedError
+
+
+class ChromaVectorStore(BaseVectorStore):
+    """
+    The Chroma collection written by Langchain, with float32 vectors and HNSW search. File
+    membership is kept as `file_<id>: True` metadata keys and filtered with a `where` clause.
+
+    Args:
+    persist_directory (str): The Chroma persistence directory.
+    collection_name (str): The collection; Langchain's default unless a benchmark needs its own.
+    """
+
+    def __init__(self, persist_directory, collection_name='langchain'):
+        from langchain.vectorstores import Chroma
+
+        from .embeddings import get_embedding_service
+
+        self.persist_directory = persist_directory
+        self._collection = Chroma(
+            collection_name=collection_name,
+            persist_directory=persist_directory,
+            embedding_function=get_embedding_service(),
+        )._collection
+
+    def query(self, embedding, k, file_ids=None):
+        results = self._collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            where=file_filter(file_ids),
+            include=['documents', 'metadatas', 'distances', 'embeddings'],
+        )
+        return [
+            {'id': chunk_id, 'text': text, 'metadata': metadata or {}, 'distance': distance, 'embedding': vector}
+            for chunk_id, text, metadata, distance, vector in zip(
+                results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0],
+                results['embeddings'][0],
+            )
+        ]
+
+    def get(self, ids, embeddings=True):
+        if not ids:
+            return []
+        include = ['documents', 'metadatas', 'embeddings'] if embeddings else ['documents', 'metadatas']
+        results = self._collection.get(ids=list(ids), include=include)
+        vectors = results['embeddings'] if embeddings else [None] * len(results['ids'])
+        return [
+            {'id': chunk_id, 'text': text, 'metadata': metadata or {}, 'embedding': vector}
+            for chunk_id, text, metadata, vector in zip(
+                results['ids'], results['documents'], results['metadatas'], vectors
+            )
+        ]
+
+    def existing_ids(self, ids):
+        if not ids:
+            return set()
+        return set(self._collection.get(ids=list(ids), include=[])['ids'])
+
+    def all_ids(self):
+        return self._collection.get(include=[])['ids']
+
+    def ids_for_files(self, file_ids):
+        return self._collection.get(where=file_filter(file_ids), include=[])['ids']
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._collection.upsert(ids=list(ids), embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def set_file_membership(self, ids, file_id, member):
+        # Metadata-only update; Chroma merges the key into each vector's existing metadata
+        if ids:
+            self._collection.update(ids=list(ids), metadatas=[{file_key(file_id): member}] * len(ids))
+
+    def delete(self, ids):
+        if ids:
+            self._collection.delete(ids=list(ids))
+
+    def count(self):
+        return self._collection.count()
+
+
+class QuantizedVectorStore(BaseVectorStore):
+    """
+    Compact NumPy vector index. Vectors are L2-normalised and stored as int8 (with one float32
+    scale per vector) or float16 in flat files that every worker memory-maps read-only, so the
+    operating system shares one copy of the pages between processes. Texts, metadata and file
+    membership live in a SQLite file next to them and are only read for the final hits.
+
+    A query scores every live vector (or only those of the requested files) with one matrix-vector
+    product per block, keeps `rerank_factor * k` candidates and, when float32 copies are stored,
+    re-ranks them exactly. Distances are squared L2 between unit vectors (`2 - 2 * cosine`), the
+    same scale as the default Chroma collection.
+
+    Writers are serialised by a SQLite write transaction. A row becomes visible to readers when its
+    byte in the `alive` file is set, after its vector has been written; deleting a chunk clears the
+    byte, and its space is not reused. Upserting an existing chunk rewrites its vector in place
+    with the byte cleared.
+
+    Args:
+    path (str): The directory holding the index files.
+    dtype (str): The quantized storage type, 'int8' (4x smaller than float32) or 'float16' (2x).
+    store_float (bool): Also store float32 vectors for exact re-ranking. They stay on disk and
+        only the candidates' rows are read.
+    rerank_factor (int): How many candidates per requested hit are re-ranked exactly.
+    block_rows (int): Rows scored per matrix-vector product. Small blocks keep the temporary float
+        copy in CPU cache; 4096 rows of 384 dimensions is 6 MB.
+    """
+
+    def __init__(self, path, dtype='int8', store_float=True, rerank_factor=4, block_rows=4096):
+        if dtype not in ('int8', 'float16'):
+            raise ValueError("QuantizedVectorStore dtype must be 'int8' or 'float16'.")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.store_float = store_float
+        self.rerank_factor = rerank_factor
+        self.block_rows = block_rows
+        self._local = threading.local()
+        self._map_lock = threading.Lock()
+        self._maps = None  # (rows, dimension, vectors, scales, floats, alive)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @property
+    def connection(self):
+        # SQLite connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self._file('index.sqlite3'), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memberships ("
+                "file_id INTEGER NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (file_id, row))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._local.connection = conn
+        return conn
+
+    def _dimension(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        return int(row[0]) if row else None
+
+    def _mapped(self):
+        # Remap when another writer (possibly another process) has appended rows
+        alive_path = self._file('alive.u8')
+        rows = os.path.getsize(alive_path) if os.path.exists(alive_path) else 0
+        maps = self._maps
+        if maps is not None and maps[0] == rows:
+            return maps
+        with self._map_lock:
+            if self._maps is not None and self._maps[0] == rows:
+                return self._maps
+            dimension = self._dimension()
+            if not rows or dimension is None:
+                self._maps = (0, dimension, None, None, None, None)
+                return self._maps
+            vectors = np.memmap(self._file(f'vectors.{self.dtype.name}'), dtype=self.dtype, mode='r',
+                                shape=(rows, dimension))
+            scales = None
+            if self.dtype == np.int8:
+                scales = np.memmap(self._file('scales.f32'), dtype=np.float32, mode='r', shape=(rows,))
+            floats = None
+            if self.store_float and os.path.exists(self._file('vectors.f32')):
+                floats = np.memmap(self._file('vectors.f32'), dtype=np.float32, mode='r', shape=(rows, dimension))
+            alive = np.memmap(alive_path, dtype=np.uint8, mode='r', shape=(rows,))
+            self._maps = (rows, dimension, vectors, scales, floats, alive)
+            return self._maps
+
+    def _quantize(self, vectors):
+        if self.dtype == np.int8:
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(np.float16), None
+
+    def _write_at(self, name, offset, data):
+        mode = 'r+b' if os.path.exists(self._file(name)) else 'w+b'
+        with open(self._file(name), mode) as handle:
+            handle.seek(offset)
+            handle.write(data)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = _unit_rows(embeddings)
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dimension = self._dimension()
+            if dimension is None:
+                dimension = vectors.shape[1]
+                conn.execute("INSERT INTO meta (key, value) VALUES ('dimension', ?)", (str(dimension),))
+            elif vectors.shape[1] != dimension:
+                raise ValueError(f"Expected vectors of dimension {dimension}, got {vectors.shape[1]}.")
+
+            existing = dict(self._select("SELECT id, row FROM chunks WHERE id IN ({})", ids))
+            new = [index for index, chunk_id in enumerate(ids) if chunk_id not in existing]
+            conn.executemany(
+                "UPDATE chunks SET document = ?, metadata = ? WHERE row = ?",
+                [(documents[index], json.dumps(metadatas[index]), existing[chunk_id])
+                 for index, chunk_id in enumerate(ids) if chunk_id in existing],
+            )
+            updated = [(index, existing[chunk_id]) for index, chunk_id in enumerate(ids) if chunk_id in existing]
+            if updated:
+                # Rewrite the vectors of existing rows in place, hidden from readers while they change
+                quantized, scales = self._quantize(vectors[[index for index, _ in updated]])
+                for position, (index, row) in enumerate(updated):
+                    self._write_at('alive.u8', row, b'\x00')
+                    self._write_at(f'vectors.{self.dtype.name}', row * dimension * self.dtype.itemsize,
+                                   quantized[position].tobytes())
+                    if scales is not None:
+                        self._write_at('scales.f32', row * 4, scales[position:position + 1].tobytes())
+                    if self.store_float:
+                        self._write_at('vectors.f32', row * dimension * 4, vectors[index].tobytes())
+                    self._write_at('alive.u8', row, b'\x01')
+            if new:
+                alive_path = self._file('alive.u8')
+                start = os.path.getsize(alive_path) if os.path.exists(alive_path) else 0
+                block = vectors[new]
+                quantized, scales = self._quantize(block)
+                self._write_at(f'vectors.{self.dtype.name}', start * dimension * self.dtype.itemsize,
+                               quantized.tobytes())
+                if scales is not None:
+                    self._write_at('scales.f32', start * 4, scales.tobytes())
+                if self.store_float:
+                    self._write_at('vectors.f32', start * dimension * 4, block.tobytes())
+                conn.executemany(
+                    "INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(start + offset, ids[index], documents[index], json.dumps(metadatas[index]))
+                     for offset, index in enumerate(new)],
+                )
+                # Publishing the rows last means readers never see a row without its vector
+                self._write_at('alive.u8', start, b'\x01' * len(new))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _select(self, sql, values, extra=()):
+        # Stay well below SQLite's bound-parameter limit
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            rows.extend(self.connection.execute(sql.format(",".join("?" * len(chunk))), [*chunk, *extra]).fetchall())
+        return rows
+
+    def set_file_membership(self, ids, file_id, member):
+        rows = [row for (row,) in self._select("SELECT row FROM chunks WHERE id IN ({})", ids)]
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if member:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO memberships (file_id, row) VALUES (?, ?)", [(file_id, row) for row in rows]
+                )
+            else:
+                conn.executemany(
+                    "DELETE FROM memberships WHERE file_id = ? AND row = ?", [(file_id, row) for row in rows]
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, ids):
+        if not ids:
+            return
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [row for (row,) in self._select("SELECT row FROM chunks WHERE id IN ({})", ids)]
+            # Hide the rows from readers before their metadata disappears
+            for row in rows:
+                self._write_at('alive.u8', row, b'\x00')
+            conn.executemany("DELETE FROM memberships WHERE row = ?", [(row,) for row in rows])
+            conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _rows_for_files(self, file_ids):
+        return [
+            row for (row,) in self._select("SELECT DISTINCT row FROM memberships WHERE file_id IN ({})", file_ids)
+        ]
+
+    def query(self, embedding, k, file_ids=None):
+        rows_count, _, vectors, scales, floats, alive = self._mapped()
+        if not rows_count:
+            return []
+        query = _unit_rows([embedding])[0]
+
+        if file_ids:
+            rows = np.array(self._rows_for_files(file_ids), dtype=np.int64)
+            rows = rows[rows < rows_count]
+            rows = rows[alive[rows] == 1]
+            if not len(rows):
+                return []
+            scores = vectors[rows].astype(np.float32) @ query
+            if scales is not None:
+                scores *= scales[rows]
+        else:
+            scores = np.empty(rows_count, dtype=np.float32)
+            for start in range(0, rows_count, self.block_rows):
+                end = min(start + self.block_rows, rows_count)
+                scores[start:end] = vectors[start:end].astype(np.float32) @ query
+            if scales is not None:
+                scores *= scales
+            scores[np.asarray(alive) == 0] = -np.inf
+            rows = np.arange(rows_count)
+
+        # Quantized scores pick the candidates; exact float32 scores order them
+        candidates = min(len(rows), k * self.rerank_factor if floats is not None else k)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.isfinite(scores[top])]
+        candidate_rows = rows[top]
+        if floats is not None:
+            candidate_scores = floats[candidate_rows] @ query
+        else:
+            candidate_scores = scores[top]
+        order = np.argsort(-candidate_scores)[:k]
+
+        ranked = [(int(candidate_rows[index]), float(candidate_scores[index])) for index in order]
+        records = {
+            row: (chunk_id, document, metadata)
+            for row, chunk_id, document, metadata in self._select(
+                "SELECT row, id, document, metadata FROM chunks WHERE row IN ({})", [row for row, _ in ranked]
+            )
+        }
+        hits = []
+        for row, score in ranked:
+            if row not in records:
+                continue  # Published by a writer that has not committed yet
+            chunk_id, document, metadata = records[row]
+            hits.append({
+                'id': chunk_id,
+                'text': document,
+                'metadata': json.loads(metadata) if metadata else {},
+                'distance': 2.0 - 2.0 * score,
+                'embedding': self._vector(row, vectors, scales, floats),
+            })
+        return hits
+
+    def _vector(self, row, vectors, scales, floats):
+        if floats is not None:
+            return np.array(floats[row])
+        vector = np.asarray(vectors[row], dtype=np.float32)
+        return vector * scales[row] if scales is not None else vector
+
+    def get(self, ids, embeddings=True):
+        records = {
+            chunk_id: (row, document, metadata)
+            for row, chunk_id, document, metadata in self._select(
+                "SELECT row, id, document, metadata FROM chunks WHERE id IN ({})", ids
+            )
+        }
+        maps = self._mapped() if embeddings else None
+        chunks = []
+        for chunk_id in ids:
+            if chunk_id not in records:
+                continue
+            row, document, metadata = records[chunk_id]
+            vector = None
+            if embeddings and row < maps[0]:
+                vector = self._vector(row, maps[2], maps[3], maps[4])
+            chunks.append({
+                'id': chunk_id,
+                'text': document,
+                'metadata': json.loads(metadata) if metadata else {},
+                'embedding': vector,
+            })
+        return chunks
+
+    def existing_ids(self, ids):
+        return {chunk_id for (chunk_id,) in self._select("SELECT id FROM chunks WHERE id IN ({})", ids)}
+
+    def all_ids(self):
+        return [chunk_id for (chunk_id,) in self.connection.execute("SELECT id FROM chunks")]
+
+    def ids_for_files(self, file_ids):
+        return [
+            chunk_id for (chunk_id,) in self._select(
+                "SELECT DISTINCT chunks.id FROM memberships JOIN chunks ON chunks.row = memberships.row "
+                "WHERE memberships.file_id IN ({})",
+                file_ids,
+            )
+        ]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def memory_stats(self):
+        """
+        Reports the on-disk size of the vector files and the bytes each vector occupies in the
+        scanned (quantized) representation.
+
+        Returns:
+        dict: `rows`, `dimension`, `bytes_per_vector` and `file_bytes` per index file.
+        """
+        rows, dimension = self._mapped()[:2]
+        per_vector = (dimension or 0) * self.dtype.itemsize + (4 if self.dtype == np.int8 else 0) + 1
+        files = {}
+        for name in os.listdir(self.path):
+            files[name] = os.path.getsize(self._file(name))
+        return {'rows': rows, 'dimension': dimension, 'bytes_per_vector': per_vector, 'file_bytes': files}
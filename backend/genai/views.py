@@ -1,34 +1,42 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader
-
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from users.models import File
 
 
 
 from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
-from .models import UserMessage
-
-
-@api_view(['GET'])
+from django.db.models.functions import Substr
+from backend.pagination import get_page_size, keyset_page
+from .models import UserMessage, IngestionJob, BulkIngestion
+from .embeddings import get_embedding_service
+from .exceptions import HTTPException
+from .generators import get_generator
+from .metrics import context_tokens, render_metrics, stage
+from .resources import get_vector_db, readiness
+from .answer_cache import get_answer_cache
+from .retrieval import hybrid_search, search_vectors
+from .context_builder import assemble_context
+from .streaming import event_stream_response, sse_event
+from .jobs import enqueue_ingestion, enqueue_bulk_ingestion, cancel_job, cancel_bulk
+
+
+@api_view(['GET', 'POST'])
 def perform_rag_lll(request, file_id):
     """
-    Performs RAG LLL (Retrieve and Generate) processing on the uploaded file using the provided file ID.
-    The function retrieves the file from the database, processes it using the `ragLLL` function, and returns 
-    the result in a response.
+    Queues RAG LLL (Retrieve and Generate) processing for the uploaded file with the provided file ID.
+    The ingestion runs in the background worker pool; the response carries the job ID that can be
+    polled through `get_ingestion_job` or cancelled through `cancel_ingestion_job`.
 
     Args:
     request (HttpRequest): The HTTP request object.
     file_id (int): The ID of the file to process.
 
     Returns:
-    Response: A Response object containing the message and processing result, or an error if the file is not found.
+    Response: A Response object containing the queued job, or an error if the file is not found.
 
     Raises:
     File.DoesNotExist: If the file with the given ID is not found in the database.
@@ -36,86 +44,234 @@ def perform_rag_lll(request, file_id):
     try:
         # Retrieve the file from the database by ID
         uploaded_file = File.objects.get(id=file_id)
+    except File.DoesNotExist:
+        return Response({'error': 'File not found'}, status=404)
 
-        # Get the file path of the uploaded file
-        file_path = uploaded_file.file.path
+    job = enqueue_ingestion(uploaded_file)
 
-        # print(file_path)
+    return Response({'message': 'RAG processing queued', 'job': _job_data(job)}, status=202)
 
-        # Perform the RAG LLL operation by passing the file path
-        result = ragLLL(file_path,file_id)
 
-        return Response({'message': 'RAG processing completed', 'result': result}, status=200)
+def _job_data(job):
+    return {
+        'id': job.id,
+        'file_id': job.file_id_id,
+        'status': job.status,
+        'stage': job.stage,
+        'pages_parsed': job.pages_parsed,
+        'chunks_embedded': job.chunks_embedded,
+        'vectors_written': job.vectors_written,
+        'cancel_requested': job.cancel_requested,
+        'error': job.error,
+        'created_at': job.created_at,
+        'updated_at': job.updated_at,
+    }
 
-    except File.DoesNotExist:
-        return Response({'error': 'File not found'}, status=404)
 
+@api_view(['GET'])
+def get_ingestion_job(request, job_id):
+    """
+    Returns the status and per-stage progress of an ingestion job.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+    job_id (int): The ID of the ingestion job.
+
+    Returns:
+    Response: A Response object containing the job status, or an error if the job is not found.
+    """
+    try:
+        job = IngestionJob.objects.get(id=job_id)
+    except IngestionJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=404)
+
+    return Response({'job': _job_data(job)}, status=200)
+
+
+@api_view(['POST'])
+def cancel_ingestion_job(request, job_id):
+    """
+    Requests cancellation of a queued or running ingestion job.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+    job_id (int): The ID of the ingestion job.
 
-def ragLLL(file_path,file_id):
+    Returns:
+    Response: A Response object containing the job status, or an error if the job is not found
+    or has already finished.
     """
-    Processes the provided file for RAG LLL (Retrieve and Generate) using Langchain.
-    The function loads the PDF document, splits it into chunks, creates embeddings, 
-    stores them in a Chroma vector store, and updates the file's status in the database.
+    try:
+        job = IngestionJob.objects.get(id=job_id)
+    except IngestionJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=404)
+
+    if not cancel_job(job):
+        return Response({'error': f'Job already {job.status}'}, status=409)
+
+    job.refresh_from_db()
+    return Response({'message': 'Cancellation requested', 'job': _job_data(job)}, status=202)
+
+
+def _bulk_data(bulk):
+    return {
+        'id': bulk.id,
+        'status': bulk.status,
+        'files_total': bulk.files_total,
+        'files_completed': bulk.files_completed,
+        'files_failed': bulk.files_failed,
+        'pages_parsed': bulk.pages_parsed,
+        'chunks_processed': bulk.chunks_processed,
+        'embeddings_computed': bulk.embeddings_computed,
+        'elapsed_seconds': round(bulk.elapsed_seconds, 3),
+        'pages_per_second': bulk.pages_per_second,
+        'chunks_per_second': bulk.chunks_per_second,
+        'embeddings_per_second': bulk.embeddings_per_second,
+        'created_at': bulk.created_at,
+        'updated_at': bulk.updated_at,
+    }
+
+
+@api_view(['POST'])
+def perform_rag_bulk(request):
+    """
+    Queues RAG LLL processing for many files at once. The request either lists `file_ids` or sets
+    `pending` to true to ingest every file that has not been raged yet. PDFs are parsed in a process
+    pool and written through a single vector-store writer in the background.
 
     Args:
-    file_path (str): The file path of the uploaded document.
-    file_id (int): The ID of the file being processed.
+    request (HttpRequest): The HTTP request object containing `file_ids` or `pending`.
 
     Returns:
-    dict: A dictionary containing the document count or an error message.
+    Response: A Response object containing the bulk run and the IDs of its per-file jobs.
 
     Raises:
-    Exception: If any error occurs during the processing of the file.
+    ValidationError: If neither `file_ids` nor `pending` is provided, or `file_ids` is not a list.
+    """
+    file_ids = request.data.get('file_ids')
+    pending = request.data.get('pending')
+
+    if pending in (True, 'true', '1', 1):
+        files = File.objects.filter(raged=False)
+    elif isinstance(file_ids, list) and file_ids:
+        files = File.objects.filter(id__in=file_ids)
+    else:
+        raise ValidationError("Provide a non-empty 'file_ids' list or set 'pending' to true.")
+
+    bulk = enqueue_bulk_ingestion(files.exclude(file=''))
+
+    return Response({
+        'message': 'Bulk RAG processing queued',
+        'bulk': _bulk_data(bulk),
+        'job_ids': list(bulk.jobs.values_list('id', flat=True)),
+    }, status=202)
+
+
+@api_view(['GET'])
+def get_bulk_ingestion(request, bulk_id):
+    """
+    Returns the status and throughput (pages/s, chunks/s, embeddings/s) of a bulk ingestion run,
+    together with the status of each of its per-file jobs.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+    bulk_id (int): The ID of the bulk run.
+
+    Returns:
+    Response: A Response object containing the bulk run, or an error if it is not found.
     """
     try:
-        # Load the document using PyPDFLoader
-        loader = PyPDFLoader(file_path)  # Use the file path directly here
-        docs = loader.load()
+        bulk = BulkIngestion.objects.get(id=bulk_id)
+    except BulkIngestion.DoesNotExist:
+        return Response({'error': 'Bulk ingestion not found'}, status=404)
 
-        # Split the documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        docs = text_splitter.split_documents(docs)
+    return Response({
+        'bulk': _bulk_data(bulk),
+        'jobs': [_job_data(job) for job in bulk.jobs.order_by('id')],
+    }, status=200)
 
-        # Create embeddings for the documents
-        embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2", model_kwargs={'device': 'cpu'})
 
-        # Initialize Chroma vector store and persist the documents
-        vectorstore = Chroma.from_documents(docs, embedding_function, persist_directory="./chroma_db_nccn")
+@api_view(['POST'])
+def cancel_bulk_ingestion(request, bulk_id):
+    """
+    Requests cancellation of every unfinished job of a bulk ingestion run.
 
-        # Get the count of documents in the collection
-        doc_count = vectorstore._collection.count()
+    Args:
+    request (HttpRequest): The HTTP request object.
+    bulk_id (int): The ID of the bulk run.
 
-        if doc_count:
-            uploaded_file = File.objects.get(id=file_id)
-            uploaded_file.raged=True
-            uploaded_file.save()
+    Returns:
+    Response: A Response object with the number of jobs cancellation was requested for.
+    """
+    try:
+        bulk = BulkIngestion.objects.get(id=bulk_id)
+    except BulkIngestion.DoesNotExist:
+        return Response({'error': 'Bulk ingestion not found'}, status=404)
 
-        return {'document_count': doc_count}
+    cancelled = cancel_bulk(bulk)
+    return Response({'message': 'Cancellation requested', 'jobs_cancelled': cancelled}, status=202)
 
-    except Exception as e:
-        return {'error': str(e)}
 
-# FastAPI Application for handling queries
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import google.generativeai as genai
-from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
-from backend.settings import GEMEINI_API_KEY
+# The embedding model, vector store and Gemini client are created lazily on first use (see resources.py)
+embedding_function = get_embedding_service()
+
+# Answers to repeated questions are served from this cache instead of calling Gemini again
+answer_cache = get_answer_cache()
 
-app = FastAPI()
 
-# Configure generative AI API key
-genai.configure(api_key=GEMEINI_API_KEY)
 
-# Initialize Chroma vector database
-embedding_function = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={"device": "cpu"}
-)
+# Function to retrieve the chunks relevant to a query
+def retrieve_context(query: str, k: int = 6, file_ids=None):
+    """
+    Embeds the query once and retrieves the most relevant chunks from the Chroma vector database,
+    fused with the BM25 sparse index when `HYBRID_SEARCH_ENABLED` is set. Up to `CONTEXT_CANDIDATES`
+    chunks are retrieved and `assemble_context` turns them into a deduplicated context within
+    `CONTEXT_TOKEN_BUDGET`. The chunk IDs and query embedding are returned alongside the context
+    so the answer cache can reuse them.
+
+    Args:
+    query (str): The query for which the context is to be retrieved.
+    k (int): The number of raw chunks the context used to contain; the token savings are reported
+        against them.
+    file_ids (list[int]): Optionally restrict the search to these files. An empty list means the
+        scope matched no file, so nothing is retrieved.
 
-vector_db = Chroma(persist_directory="./chroma_db_nccn", embedding_function=embedding_function)
+    Returns:
+    tuple: `(context, hits, query_embedding, context_stats)`.
 
+    Raises:
+    HTTPException: If there is an error during the search process.
+    """
+    try:
+        with stage('embed_query'):
+            query_embedding = embedding_function.embed_query(query)
+        candidates = max(k, settings.CONTEXT_CANDIDATES)
+        if file_ids is not None and not file_ids:
+            hits = []
+        elif settings.HYBRID_SEARCH_ENABLED:
+            hits = hybrid_search(
+                get_vector_db(), query, query_embedding, k=candidates, file_ids=file_ids,
+                candidates=max(candidates, settings.HYBRID_CANDIDATES), rrf_k=settings.RRF_K,
+            )
+        else:
+            with stage('vector_search'):
+                hits = search_vectors(get_vector_db(), query_embedding, k=candidates, file_ids=file_ids)
+        with stage('context_build'):
+            context, context_stats = assemble_context(
+                hits,
+                query_embedding,
+                settings.CONTEXT_TOKEN_BUDGET,
+                baseline_k=k,
+                mmr_lambda=settings.CONTEXT_MMR_LAMBDA,
+                duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD,
+                chars_per_token=settings.CONTEXT_CHARS_PER_TOKEN,
+            )
+        # Counters only go up, so the (signed) saving is baseline minus sent rather than its own series
+        context_tokens.inc('baseline', context_stats['baseline_tokens'])
+        context_tokens.inc('sent', context_stats['context_tokens'])
+        return context, hits, query_embedding, context_stats
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching context: {str(e)}")
 
 
 # Function to get context from the database
@@ -133,15 +289,9 @@ def get_relevant_context_from_db(query: str):
     Raises:
     HTTPException: If there is an error during the search process.
     """
-    try:
-        context = ""
-        search_results = vector_db.similarity_search(query, k=6)
-        for result in search_results:
-            context += result.page_content + "\n"
-        return context.strip() or "No relevant context available from the database."
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching context: {str(e)}")
-    
+    context, _, _, _ = retrieve_context(query)
+    return context
+
 
 
 
@@ -185,7 +335,29 @@ def generate_rag_prompt(query: str, context: str):
 # Function to generate an answer using Gemini
 def generate_answer(prompt: str):
     """
-    Generates an answer using the Gemini Generative AI model based on the provided prompt.
+    Generates an answer based on the provided prompt using the generator backend configured by
+    `GENAI_GENERATOR` (the Gemini Generative AI model by default).
+
+    Args:
+    prompt (str): The prompt to be sent to the Gemini model.
+
+    Returns:
+    str: The generated answer from the Gemini model.
+
+    Raises:
+    HTTPException: If an error occurs while generating the answer.
+    """
+    try:
+        return get_generator().generate(prompt)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
+
+
+# Function to generate an answer using Gemini without blocking the event loop
+async def generate_answer_async(prompt: str):
+    """
+    Async variant of `generate_answer` for the ASGI query path. The request to Gemini is awaited,
+    so the event loop can serve other questions while the answer is generated.
 
     Args:
     prompt (str): The prompt to be sent to the Gemini model.
@@ -197,12 +369,24 @@ def generate_answer(prompt: str):
     HTTPException: If an error occurs while generating the answer.
     """
     try:
-        model = genai.GenerativeModel(model_name="gemini-pro")
-        response = model.generate_content(prompt)
-        return response.text
+        return await get_generator().agenerate(prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
 
+
+# Function to stream an answer using Gemini
+def stream_answer(prompt: str):
+    """
+    Generates an answer with the configured generator backend in streaming mode.
+
+    Args:
+    prompt (str): The prompt to be sent to the Gemini model.
+
+    Yields:
+    str: Pieces of the answer as soon as Gemini produces them.
+    """
+    yield from get_generator().stream(prompt)
+
 # @api_view(['POST'])
 # def handle_query(request):
 #     """
@@ -236,24 +420,41 @@ def generate_answer(prompt: str):
 
 
 
-@api_view(['POST'])
-def handle_query(request):
+def resolve_query_scope(file_ids=None, uploaded_by=None):
     """
-    Handles user queries by fetching relevant context from the database and generating an answer 
-    using the Gemini Generative AI model. The query and user ID are validated, the answer is generated, 
-    and the chat history is saved in the database.
+    Resolves the optional search scope of a query into the list of file IDs to search.
 
     Args:
-    request (HttpRequest): The HTTP request object containing the user's query and user ID.
+    file_ids (list): Restrict the search to these files.
+    uploaded_by (int): Restrict the search to files uploaded by this user.
 
     Returns:
-    Response: A Response object containing the original query, relevant context, and the generated answer.
+    list[int]: The IDs of the files to search, or None when the query is not scoped.
 
     Raises:
-    ValidationError: If the query is empty or the user ID is not provided or invalid.
-    HTTPException: If there is an error in fetching context from the database or generating the answer.
+    ValidationError: If `file_ids` is not a list of integers or `uploaded_by` is not an integer.
     """
-    # Extract user_id and query from request data
+    if file_ids is None and uploaded_by is None:
+        return None
+
+    files = File.objects.all()
+    if file_ids is not None:
+        if not isinstance(file_ids, list):
+            raise ValidationError("file_ids must be a list of file IDs.")
+        try:
+            files = files.filter(id__in=[int(file_id) for file_id in file_ids])
+        except (TypeError, ValueError):
+            raise ValidationError("file_ids must be a list of file IDs.")
+    if uploaded_by is not None:
+        try:
+            files = files.filter(user_id=int(uploaded_by))
+        except (TypeError, ValueError):
+            raise ValidationError("uploaded_by must be a user ID.")
+    return list(files.values_list('id', flat=True))
+
+
+def _validate_query_request(request):
+    # Extract user_id, query and the optional search scope from request data
     user_id = request.data.get('user_id')
     query = request.data.get('query')
 
@@ -269,61 +470,234 @@ def handle_query(request):
     except User.DoesNotExist:
         raise ValidationError("User not found.")
 
-    # Fetch relevant context and generate a response
-    context = get_relevant_context_from_db(query)
-    prompt = generate_rag_prompt(query, context)
-    answer = generate_answer(prompt)
+    file_ids = resolve_query_scope(request.data.get('file_ids'), request.data.get('uploaded_by'))
+    return user, query, file_ids
+
+
+@api_view(['POST'])
+def handle_query(request):
+    """
+    Handles user queries by fetching relevant context from the database and generating an answer 
+    using the Gemini Generative AI model. The query and user ID are validated, the answer is generated, 
+    and the chat history is saved in the database.
+
+    The search can be scoped with an optional `file_ids` list and/or an `uploaded_by` user ID;
+    the restriction is applied inside the vector search, so only those files' chunks are scored.
+
+    Args:
+    request (HttpRequest): The HTTP request object containing the user's query and user ID.
+
+    Returns:
+    Response: A Response object containing the original query, relevant context, and the generated answer.
+
+    Raises:
+    ValidationError: If the query is empty or the user ID is not provided or invalid.
+    HTTPException: If there is an error in fetching context from the database or generating the answer.
+    """
+    user, query, file_ids = _validate_query_request(request)
+
+    # Fetch relevant context, then answer from the cache or generate a response
+    context, hits, query_embedding, context_stats = retrieve_context(query, file_ids=file_ids)
+    chunk_ids = [hit['id'] for hit in hits]
+    with stage('answer_cache'):
+        cached = answer_cache.get(query, chunk_ids, query_embedding) if settings.ANSWER_CACHE_ENABLED else None
+    if cached:
+        answer, cache_tier = cached
+    else:
+        with stage('prompt_build'):
+            prompt = generate_rag_prompt(query, context)
+        with stage('generate'):
+            answer = generate_answer(prompt)
+        cache_tier = None
+        if settings.ANSWER_CACHE_ENABLED:
+            answer_cache.put(query, chunk_ids, answer, query_embedding)
 
     # Save the chat history
-    UserMessage.objects.create(
-        user_id=user,
-        user_question=query,
-        bot_reply=answer
-    )
+    with stage('history_write'):
+        UserMessage.objects.create(
+            user_id=user,
+            user_question=query,
+            bot_reply=answer
+        )
 
     # Return the response
     return Response({
         "query": query,
         "context": context,
-        "answer": answer
+        "answer": answer,
+        "cached": cache_tier,
+        "context_tokens": context_stats
     })
 
 
+@api_view(['POST'])
+def handle_query_stream(request):
+    """
+    Streaming variant of `handle_query`. The answer is sent as server-sent events: a `context`
+    event with the retrieved context first, then one `token` event per piece of text Gemini
+    produces, and a final `done` event once the `UserMessage` has been saved. The events come from
+    a plain generator, so WSGI servers send each token as it arrives; ASGI deployments should use
+    `handle_query_stream_async` instead, because Django buffers synchronous streams under ASGI.
+
+    Args:
+    request (HttpRequest): The HTTP request object containing the user's query and user ID.
+
+    Returns:
+    StreamingHttpResponse: A `text/event-stream` response.
+
+    Raises:
+    ValidationError: If the query is empty or the user ID is not provided or invalid.
+    HTTPException: If there is an error in fetching context from the database.
+    """
+    user, query, file_ids = _validate_query_request(request)
+
+    context, hits, query_embedding, context_stats = retrieve_context(query, file_ids=file_ids)
+    chunk_ids = [hit['id'] for hit in hits]
+    with stage('answer_cache'):
+        cached = answer_cache.get(query, chunk_ids, query_embedding) if settings.ANSWER_CACHE_ENABLED else None
+
+    def events():
+        yield sse_event('context', {
+            'query': query, 'context': context, 'chunk_ids': chunk_ids, 'context_tokens': context_stats,
+        })
+
+        if cached:
+            answer, cache_tier = cached
+            yield sse_event('token', {'text': answer})
+        else:
+            cache_tier = None
+            pieces = []
+            with stage('prompt_build'):
+                prompt = generate_rag_prompt(query, context)
+            try:
+                with stage('generate'):
+                    for piece in stream_answer(prompt):
+                        pieces.append(piece)
+                        yield sse_event('token', {'text': piece})
+            except Exception as e:
+                yield sse_event('error', {'detail': f"Error generating answer: {str(e)}"})
+                return
+            answer = "".join(pieces)
+            if settings.ANSWER_CACHE_ENABLED:
+                answer_cache.put(query, chunk_ids, answer, query_embedding)
+
+        # Save the chat history once the full answer is known
+        with stage('history_write'):
+            message = UserMessage.objects.create(
+                user_id=user,
+                user_question=query,
+                bot_reply=answer
+            )
+        yield sse_event('done', {'answer': answer, 'message_id': message.id, 'cached': cache_tier})
+
+    return event_stream_response(events())
+
+
+@api_view(['GET'])
+def get_readiness(request):
+    """
+    Readiness probe. Returns 200 once the embedding model, vector store and answer generator are
+    loaded in this worker, and 503 before that. Run `manage.py warmup` or set
+    `GENAI_WARM_UP_ON_START` so workers preload before taking traffic.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+
+    Returns:
+    Response: A Response object with the load state of each resource.
+    """
+    status = readiness()
+    return Response(status, status=200 if status['ready'] else 503)
+
+
+def get_metrics(request):
+    """
+    Serves the stage and request latency histograms and answer-cache counters of this worker
+    process in the Prometheus text format.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+
+    Returns:
+    HttpResponse: The metrics page.
+    """
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+def get_answer_cache_stats(request):
+    """
+    Returns the size and hit-rate counters of this process's answer cache.
+
+    Args:
+    request (HttpRequest): The HTTP request object.
+
+    Returns:
+    Response: A Response object containing the cache statistics.
+    """
+    return Response(answer_cache.stats())
+
+
 @api_view(['GET'])
 def get_chat_history(request, user_id):
     """
-    Retrieves the chat history for a given user. It fetches the user's messages from the database 
-    and returns them in chronological order.
+    Retrieves one page of the chat history for a given user, newest first. Pages are fetched with
+    keyset pagination on (timestamp, id) through the (user_id, timestamp) index, so every page costs
+    the same regardless of how long the history is.
+
+    Query parameters:
+    cursor (str): The `next_cursor` of the previous page; omit it for the newest messages.
+    page_size (int): The number of messages per page (default `CHAT_HISTORY_PAGE_SIZE`).
+    preview (bool): When true, only the first `CHAT_HISTORY_PREVIEW_CHARS` characters of each
+        question and reply are returned.
 
     Args:
     request (HttpRequest): The HTTP request object.
     user_id (int): The ID of the user for whom the chat history is being retrieved.
 
     Returns:
-    Response: A Response object containing a list of user messages and bot replies in chronological order.
+    Response: A Response object with the page of messages in `results` and the cursor of the next
+    page in `next_cursor` (None on the last page).
 
     Raises:
-    ValidationError: If the user is not found in the database.
+    ValidationError: If the user is not found in the database or the cursor is invalid.
     """
-    try:
-        # Fetch the user object
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
+    if not User.objects.filter(id=user_id).exists():
         raise ValidationError("User not found.")
 
-    # Retrieve messages for the user
-    messages = UserMessage.objects.filter(user_id=user).order_by('-timestamp')
-
-    # Prepare the data for response
-    data = [
-        {
-            "id": message.id,
-            "user_question": message.user_question,
-            "bot_reply": message.bot_reply,
-            "timestamp": message.timestamp
-        }
-        for message in messages
-    ]
+    page_size = get_page_size(request, settings.CHAT_HISTORY_PAGE_SIZE, settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+    preview = request.query_params.get('preview') in ('1', 'true', 'True')
+
+    messages = UserMessage.objects.filter(user_id=user_id)
+    if preview:
+        # Truncate in the database so full message bodies are never transferred
+        length = settings.CHAT_HISTORY_PREVIEW_CHARS
+        messages = messages.values(
+            'id', 'timestamp',
+            question_preview=Substr('user_question', 1, length),
+            reply_preview=Substr('bot_reply', 1, length),
+        )
+    else:
+        messages = messages.values('id', 'user_question', 'bot_reply', 'timestamp')
+
+    rows, next_cursor = keyset_page(
+        messages, [('timestamp', True), ('id', True)], request.query_params.get('cursor'), page_size
+    )
 
-    return Response(data)
+    if preview:
+        # Annotations cannot shadow model fields, so restore the usual keys here
+        rows = [
+            {
+                'id': row['id'],
+                'user_question': row['question_preview'],
+                'bot_reply': row['reply_preview'],
+                'timestamp': row['timestamp'],
+            }
+            for row in rows
+        ]
 
+    return Response({
+        "results": rows,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    })
@@ -0,0 +1,27 @@
+import hashlib
+
+from django.core.management.base import BaseCommand
+
+from users.models import File
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the SHA-256 of uploaded files that do not have one yet, so uploads made before "
+        "duplicate detection existed are matched too."
+    )
+
+    def handle(self, *args, **options):
+        hashed = missing = 0
+        for uploaded in File.objects.filter(sha256__isnull=True, file__isnull=False).exclude(file='').iterator():
+            try:
+                hasher = hashlib.sha256()
+                with uploaded.file.open('rb') as content:
+                    for data in content.chunks():
+                        hasher.update(data)
+            except FileNotFoundError:
+                missing += 1
+                continue
+            File.objects.filter(id=uploaded.id).update(sha256=hasher.hexdigest())
+            hashed += 1
+        self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} files; {missing} were missing from storage."))
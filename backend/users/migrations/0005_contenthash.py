@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_file_sha256_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+    ]
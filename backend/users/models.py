@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User  # Default User model
 
@@ -25,9 +27,43 @@ class File(models.Model):
     file_caption = models.CharField(max_length=255, null=True, blank=True)  # Optional caption for the file
     user_id = models.ForeignKey(User, on_delete=models.CASCADE)  # Linking to the User model
     raged = models.BooleanField(default=False)  # Boolean field for "raged" status
+    uploaded_at = models.DateTimeField(auto_now_add=True)  # When the file was uploaded
+    updated_at = models.DateTimeField(auto_now=True)  # Last change, e.g. becoming raged; drives the listing ETag
+    sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # Content hash, for duplicate uploads
+
+    class Meta:
+        indexes = [
+            # Serves the per-user listing, newest first
+            models.Index(fields=['user_id', 'uploaded_at'], name='file_user_uploaded_at'),
+        ]
 
     def __str__(self):
         return self.file_caption or f"File {self.id}"
 
 
+class ContentHash(models.Model):
+    # One row per distinct upload content. `uploads.create_file` locks it while it looks for an
+    # earlier File with the same hash and creates the new one, so concurrent uploads of the same
+    # content cannot both miss each other and store two copies.
+    sha256 = models.CharField(max_length=64, unique=True)
+
+    def __str__(self):
+        return self.sha256
 
+
+class UploadSession(models.Model):
+    # A chunked upload in progress. Chunks are appended in order to a partial file under
+    # MEDIA_ROOT/uploads/partial/ and `offset` counts the bytes received so far, so an interrupted
+    # upload resumes from there. `file_id` is set once the last chunk has arrived.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_id = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    file_caption = models.CharField(max_length=255, null=True, blank=True)
+    size = models.PositiveBigIntegerField()  # Total size announced by the client
+    offset = models.PositiveBigIntegerField(default=0)  # Bytes received so far
+    file_id = models.ForeignKey(File, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.filename} ({self.offset}/{self.size})"
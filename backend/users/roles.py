@@ -0,0 +1,86 @@
+# Role resolution backed by Django's cache framework, so authenticated requests do not query
+# AuthUserExt and UserRole every time. Every code path that changes a user's role must call
+# `invalidate_user_role`; `ROLE_CACHE_TIMEOUT` bounds staleness for anything that does not.
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import BasePermission
+
+from .models import AuthUserExt
+
+# IDs of the roles created with the initial data
+ROLE_ADMIN = 1
+ROLE_EDITOR = 2
+ROLE_VIEWER = 3
+
+NO_ROLE_NAME = "No Role"
+
+
+def _cache_key(user_id):
+    return f"users:role:{user_id}"
+
+
+def get_user_role(user_id):
+    """
+    Returns the role of a user, reading the cache first and the database on a miss.
+
+    Args:
+    user_id (int): The ID of the user.
+
+    Returns:
+    dict: `auth_user_ext_id`, `role_id` and `role_name`; the IDs are None when the user has no
+    AuthUserExt record or no role.
+    """
+    key = _cache_key(user_id)
+    role = cache.get(key)
+    if role is None:
+        # One joined query instead of AuthUserExt, then UserRole
+        row = (
+            AuthUserExt.objects.filter(user_id=user_id)
+            .values_list('id', 'user_role_id', 'user_role_id__name')
+            .first()
+        )
+        auth_user_ext_id, role_id, role_name = row if row else (None, None, None)
+        role = {
+            'auth_user_ext_id': auth_user_ext_id,
+            'role_id': role_id,
+            'role_name': role_name or NO_ROLE_NAME,
+        }
+        cache.set(key, role, settings.ROLE_CACHE_TIMEOUT)
+    return role
+
+
+def invalidate_user_role(user_id):
+    """
+    Drops the cached role of a user. Call it after creating or changing their AuthUserExt record.
+
+    Args:
+    user_id (int): The ID of the user.
+    """
+    cache.delete(_cache_key(user_id))
+
+
+class HasRole(BasePermission):
+    """
+    Allows authenticated users whose role is in `allowed_roles`. Subclass it per flow, e.g.
+    `IsEditor`, and list the subclass in a view's `permission_classes`. The role comes from
+    `get_user_role`, never from the token's claims, so a role change applies to tokens already
+    issued as soon as `invalidate_user_role` runs.
+    """
+    allowed_roles = ()
+
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return False
+        return get_user_role(request.user.id)['role_id'] in self.allowed_roles
+
+
+class IsAdmin(HasRole):
+    allowed_roles = (ROLE_ADMIN,)
+
+
+class IsEditor(HasRole):
+    allowed_roles = (ROLE_ADMIN, ROLE_EDITOR)
+
+
+class IsViewer(HasRole):
+    allowed_roles = (ROLE_ADMIN, ROLE_EDITOR, ROLE_VIEWER)
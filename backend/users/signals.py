@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# Sent by `uploads.create_file` inside its transaction when an upload's content matches an earlier
+# file, with `file` (the new File) and `original` (the File whose stored copy it points at).
+# Receivers reuse the original's derived data, e.g. genai links its chunks and vectors and marks the
+# copy raged; a receiver that changes `file` updates the instance it was given. Work outside the
+# database belongs in `transaction.on_commit`, so it only happens once the new File is committed.
+duplicate_uploaded = Signal()
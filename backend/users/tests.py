@@ -1,3 +1,306 @@
-from django.test import TestCase
+import hashlib
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from backend.pagination import encode_cursor
+
+from .models import AuthUserExt, ContentHash, File, UploadSession, UserRole
+from .roles import ROLE_ADMIN, ROLE_EDITOR, ROLE_VIEWER, get_user_role
+
+
+class AllUsersViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = UserRole.objects.create(id=ROLE_ADMIN, name='Admin')
+        cls.viewer_role = UserRole.objects.create(id=ROLE_VIEWER, name='Viewer')
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pw')
+        AuthUserExt.objects.create(user_id=cls.admin, user_role_id=cls.admin_role)
+
+    def setUp(self):
+        cache.clear()
+        # Resolve the admin's role once, so the query counts below only cover the listing
+        get_user_role(self.admin.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _create_users(self, count, role=None):
+        start = User.objects.count()
+        for index in range(start, start + count):
+            user = User.objects.create_user(username=f'user{index}', email=f'user{index}@example.com')
+            AuthUserExt.objects.create(user_id=user, user_role_id=role or self.viewer_role)
+
+    def test_query_count_does_not_grow_with_users(self):
+        self._create_users(3)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('all_users'))
+        self.assertEqual(len(response.data['users']), 4)
+
+        self._create_users(30)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('all_users'))
+        self.assertEqual(len(response.data['users']), 34)
+
+    def test_roles_are_joined(self):
+        User.objects.create_user(username='norole', email='norole@example.com')
+        response = self.client.get(reverse('all_users'))
+        roles = {user['username']: (user['role_id'], user['role_name']) for user in response.data['users']}
+        self.assertEqual(roles['admin'], (self.admin_role.id, 'Admin'))
+        self.assertEqual(roles['norole'], (None, 'No Role'))
+
+    def test_filter_by_role(self):
+        self._create_users(5)
+        response = self.client.get(reverse('all_users'), {'role_id': self.admin_role.id})
+        self.assertEqual([user['username'] for user in response.data['users']], ['admin'])
+
+    def test_requires_admin_role(self):
+        self._create_users(1)
+        self.client.force_authenticate(User.objects.get(username='user1'))
+        response = self.client.get(reverse('all_users'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_role_filter(self):
+        response = self.client.get(reverse('all_users'), {'role_id': 'admin'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination_with_ordering(self):
+        self._create_users(6)
+        usernames = []
+        params = {'page_size': 3, 'ordering': '-username'}
+        while True:
+            response = self.client.get(reverse('all_users'), params)
+            usernames += [user['username'] for user in response.data['users']]
+            if not response.data['has_more']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(usernames, sorted(User.objects.values_list('username', flat=True), reverse=True))
+
+    def test_invalid_ordering(self):
+        response = self.client.get(reverse('all_users'), {'ordering': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tampered_cursor(self):
+        self._create_users(3)
+        for values in (['abc', 1], ['2024-01-01T00:00:00', 'x'], [None, 1], [[1], {}]):
+            cursor = encode_cursor(values)
+            response = self.client.get(reverse('all_users'), {'ordering': 'date_joined', 'cursor': cursor})
+            self.assertEqual(response.status_code, 400, values)
+        response = self.client.get(reverse('all_users'), {'cursor': 'not-a-cursor!'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RoleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = UserRole.objects.create(id=ROLE_ADMIN, name='Admin')
+        cls.editor_role = UserRole.objects.create(id=ROLE_EDITOR, name='Editor')
+        cls.viewer_role = UserRole.objects.create(id=ROLE_VIEWER, name='Viewer')
+        cls.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        AuthUserExt.objects.create(user_id=cls.user, user_role_id=cls.viewer_role)
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com')
+        AuthUserExt.objects.create(user_id=cls.admin, user_role_id=cls.admin_role)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_role_is_cached(self):
+        with self.assertNumQueries(1):
+            get_user_role(self.user.id)
+        with self.assertNumQueries(0):
+            role = get_user_role(self.user.id)
+        self.assertEqual((role['role_id'], role['role_name']), (self.viewer_role.id, 'Viewer'))
+
+    def test_update_user_role_invalidates_cache(self):
+        get_user_role(self.user.id)
+        self.client.force_authenticate(self.admin)
+        response = self.client.put(
+            reverse('update_user_role', args=[self.user.id]), {'role_id': self.editor_role.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_user_role(self.user.id)['role_name'], 'Editor')
+
+    def test_update_user_role_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.put(
+            reverse('update_user_role', args=[self.user.id]), {'role_id': self.editor_role.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_user_info_reads_cached_role(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('user_info'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user_info'))
+        self.assertEqual(response.data['user']['role_name'], 'Viewer')
+
+    def test_token_carries_role_claim(self):
+        response = self.client.post(reverse('login'), {'username': 'viewer', 'password': 'pw'}, format='json')
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['role_id'], token['role_name']), (self.viewer_role.id, 'Viewer'))
+
+    def test_demotion_applies_to_issued_tokens(self):
+        editor = User.objects.create_user(username='editor', email='editor@example.com', password='pw')
+        AuthUserExt.objects.create(user_id=editor, user_role_id=self.editor_role)
+        tokens = self.client.post(reverse('login'), {'username': 'editor', 'password': 'pw'}, format='json').data
+        self.assertEqual(AccessToken(tokens['access'])['role_id'], self.editor_role.id)
+        upload = {'filename': 'manual.pdf', 'size': 4}
+
+        editor_client = APIClient()
+        editor_client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(editor_client.post(reverse('create_upload'), upload).status_code, 201)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.put(
+            reverse('update_user_role', args=[editor.id]), {'role_id': self.viewer_role.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # The old token still claims Editor but is no longer trusted for permissions
+        self.assertEqual(editor_client.post(reverse('create_upload'), upload).status_code, 403)
+
+        # Refreshed tokens carry the new role
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['role_id'], self.viewer_role.id)
+        self.assertEqual(RefreshToken(response.data['refresh'])['role_id'], self.viewer_role.id)
+
+
+class UploadedFilesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='editor', email='editor@example.com')
+        for index in range(5):
+            File.objects.create(file_caption=f'file {index}', user_id=cls.user, raged=index % 2 == 0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pagination_and_raged_filter(self):
+        captions = []
+        params = {'page_size': 2}
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('get_uploaded_files'), params)
+        while True:
+            captions += [file['file_caption'] for file in response.data['results']]
+            if not response.data['has_more']:
+                break
+            params['cursor'] = response.data['next_cursor']
+            response = self.client.get(reverse('get_uploaded_files'), params)
+        self.assertEqual(captions, [f'file {index}' for index in reversed(range(5))])
+
+        response = self.client.get(reverse('get_uploaded_files'), {'raged': 'false'})
+        self.assertEqual([file['file_caption'] for file in response.data['results']], ['file 3', 'file 1'])
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse('get_uploaded_files'))
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('get_uploaded_files'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        File.objects.create(file_caption='new file', user_id=self.user)
+        response = self.client.get(reverse('get_uploaded_files'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader', email='uploader@example.com')
+        editor_role = UserRole.objects.create(id=ROLE_EDITOR, name='Editor')
+        AuthUserExt.objects.create(user_id=cls.user, user_role_id=editor_role)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _start(self, content, filename='manual.pdf'):
+        response = self.client.post(
+            reverse('create_upload'), {'filename': filename, 'size': len(content), 'file_caption': 'manual'}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['upload_id']
+
+    def _put(self, upload_id, offset, data):
+        return self.client.put(
+            reverse('upload_chunk', args=[upload_id]), data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def _upload(self, content, chunk_size=4):
+        upload_id = self._start(content)
+        for offset in range(0, len(content), chunk_size):
+            response = self._put(upload_id, offset, content[offset:offset + chunk_size])
+        return response
+
+    def test_preflight_allows_upload_offset(self):
+        response = self.client.options(
+            reverse('upload_chunk', args=['00000000-0000-0000-0000-000000000000']),
+            HTTP_ORIGIN='http://localhost:5173',
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD='PUT',
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS='authorization, content-type, upload-offset',
+        )
+        self.assertEqual(response.status_code, 200)
+        allowed = {header.strip() for header in response['Access-Control-Allow-Headers'].split(',')}
+        self.assertIn('upload-offset', allowed)
+
+    def test_viewers_cannot_upload(self):
+        viewer = User.objects.create_user(username='viewer', email='viewer@example.com')
+        self.client.force_authenticate(viewer)
+        response = self.client.post(reverse('create_upload'), {'filename': 'manual.pdf', 'size': 4})
+        self.assertEqual(response.status_code, 403)
+
+    def test_chunks_are_stored_and_hashed(self):
+        content = b'%PDF-1.4 some manual content'
+        response = self._upload(content)
+        self.assertEqual(response.status_code, 201)
+        uploaded = File.objects.get(id=response.data['file_id'])
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+        with uploaded.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(os.listdir(os.path.join(os.path.dirname(uploaded.file.path), 'partial')))
+
+    def test_resume_after_offset_mismatch(self):
+        content = b'0123456789abcdef'
+        upload_id = self._start(content)
+        self.assertEqual(self._put(upload_id, 0, content[:8]).data['offset'], 8)
+
+        # A retried chunk, e.g. after a lost response, is rejected with the offset to resume from
+        response = self._put(upload_id, 0, content[:8])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.get(reverse('upload_chunk', args=[upload_id])).data['offset'], 8)
+
+        response = self._put(upload_id, 8, content[8:])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(File.objects.get(id=response.data['file_id']).sha256, hashlib.sha256(content).hexdigest())
+
+    def test_duplicate_links_to_existing_file(self):
+        content = b'%PDF-1.4 the same manual'
+        first = File.objects.get(id=self._upload(content).data['file_id'])
+        File.objects.filter(id=first.id).update(raged=True)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self._upload(content)
+        # The copy is linked and marked raged once its File is committed
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(response.data['duplicate_of'], first.id)
+        duplicate = File.objects.get(id=response.data['file_id'])
+        self.assertTrue(duplicate.raged)
+        self.assertEqual(duplicate.file.name, first.file.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.file.path))), 2)  # The file and partial/
+        self.assertTrue(UploadSession.objects.filter(file_id=duplicate).exists())
+        self.assertEqual(ContentHash.objects.filter(sha256=first.sha256).count(), 1)
 
-# Create your tests here.
@@ -0,0 +1,201 @@
+# Storage side of file uploads. Chunked uploads are appended to a partial file while a SHA-256 of
+# the content is computed as the bytes arrive; every upload, chunked or not, is then matched on that
+# hash so a PDF uploaded again links to the stored file and its vectors instead of being stored
+# and embedded a second time.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ContentHash, File
+from .signals import duplicate_uploaded
+
+READ_SIZE = 64 * 1024
+# The most hash states of uploads in progress kept per process; evicted ones are rebuilt from disk
+MAX_HASHERS = 256
+
+_hashers = OrderedDict()  # upload ID -> (offset, hasher)
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk cannot be appended, e.g. because the request body is shorter than its
+    Content-Length.
+    """
+
+
+def partial_path(session):
+    """
+    Returns the path of the partial file of a chunked upload.
+
+    Args:
+    session (UploadSession): The upload.
+
+    Returns:
+    str: The absolute path under MEDIA_ROOT.
+    """
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial', f'{session.id}.part')
+
+
+def _hasher_at(session):
+    # The cached hash state is reused when it is at the session's offset; after a restart, or when
+    # chunks of the same upload land on another worker process, it is rebuilt from the partial file
+    with _hashers_lock:
+        cached = _hashers.pop(str(session.id), None)
+    if cached is not None and cached[0] == session.offset:
+        return cached[1]
+
+    hasher = hashlib.sha256()
+    remaining = session.offset
+    if remaining:
+        with open(partial_path(session), 'rb') as partial:
+            while remaining:
+                data = partial.read(min(READ_SIZE, remaining))
+                if not data:
+                    raise UploadError("The partial upload is shorter than its recorded offset.")
+                hasher.update(data)
+                remaining -= len(data)
+    return hasher
+
+
+def _remember_hasher(session, offset, hasher):
+    with _hashers_lock:
+        _hashers[str(session.id)] = (offset, hasher)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def _forget_hasher(session):
+    with _hashers_lock:
+        _hashers.pop(str(session.id), None)
+
+
+def write_chunk(session, stream, length):
+    """
+    Appends a chunk at the session's offset, hashing it as it is streamed to disk. Bytes past the
+    offset left by an earlier interrupted write are overwritten.
+
+    Args:
+    session (UploadSession): The upload, locked by the caller.
+    stream (file-like): The request body.
+    length (int): The chunk size in bytes (the request's Content-Length).
+
+    Returns:
+    hashlib._Hash: The SHA-256 state covering everything received including this chunk.
+
+    Raises:
+    UploadError: If the body ends before `length` bytes were read.
+    """
+    hasher = _hasher_at(session)
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as partial:
+        partial.seek(session.offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                _forget_hasher(session)
+                raise UploadError("The chunk is shorter than its Content-Length.")
+            partial.write(data)
+            hasher.update(data)
+            remaining -= len(data)
+        partial.truncate()
+    _remember_hasher(session, session.offset + length, hasher)
+    return hasher
+
+
+def discard_partial(session):
+    """
+    Deletes the partial file and cached hash state of an upload.
+
+    Args:
+    session (UploadSession): The upload.
+    """
+    _forget_hasher(session)
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def is_expired(session):
+    """
+    Returns whether an unfinished upload is past `UPLOAD_SESSION_EXPIRY_HOURS`.
+
+    Args:
+    session (UploadSession): The upload.
+
+    Returns:
+    bool: True if the upload can no longer be resumed.
+    """
+    age = timezone.now() - session.updated_at
+    return session.file_id_id is None and age.total_seconds() > settings.UPLOAD_SESSION_EXPIRY_HOURS * 3600
+
+
+def hash_uploaded_file(uploaded_file):
+    """
+    Computes the SHA-256 of a file received in a single multipart request.
+
+    Args:
+    uploaded_file (UploadedFile): The uploaded file.
+
+    Returns:
+    str: The hex digest.
+    """
+    hasher = hashlib.sha256()
+    for data in uploaded_file.chunks():
+        hasher.update(data)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def create_file(user, file_caption, sha256, content=None, partial=None, filename=None):
+    """
+    Creates the File record of a completed upload. When a file with the same content hash already
+    exists, the record points at its stored file and `duplicate_uploaded` is sent, so genai links
+    the original's chunks and vectors (and marks the copy raged if the original is). Otherwise the
+    content is stored under uploads/.
+
+    Args:
+    user (User): The uploader.
+    file_caption (str): The caption.
+    sha256 (str): The content hash.
+    content (UploadedFile): The content of a single-request upload.
+    partial (str): The path of the completed partial file of a chunked upload. It is moved into
+        storage, or left for the caller to discard when the content is a duplicate.
+    filename (str): The client's file name, for a chunked upload.
+
+    Returns:
+    tuple: `(file, duplicate_of)`, where `duplicate_of` is the existing File or None.
+    """
+    with transaction.atomic():
+        # Concurrent uploads of the same content queue on the hash's row, so the second one sees
+        # the File the first created. get_or_create waits on the unique index for a racing insert.
+        ContentHash.objects.get_or_create(sha256=sha256)
+        ContentHash.objects.select_for_update().get(sha256=sha256)
+
+        original = File.objects.filter(sha256=sha256, file__isnull=False).exclude(file='').order_by('id').first()
+        if original is not None:
+            new_file = File.objects.create(
+                file=original.file.name, file_caption=file_caption, user_id=user, raged=False, sha256=sha256
+            )
+            duplicate_uploaded.send(sender=File, file=new_file, original=original)
+            return new_file, original
+
+        if partial is not None:
+            name = default_storage.get_available_name(f"uploads/{get_valid_filename(filename)}")
+            os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+            os.replace(partial, default_storage.path(name))
+            content = name
+        new_file = File.objects.create(
+            file=content, file_caption=file_caption, user_id=user, raged=False, sha256=sha256
+        )
+        return new_file, None
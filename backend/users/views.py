@@ -1,24 +1,53 @@
+import hashlib
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth.hashers import make_password
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from .models import UserRole,AuthUserExt,File
+from backend.pagination import get_page_size, keyset_page
+
+from .models import UserRole,AuthUserExt,File,UploadSession
+from .roles import IsAdmin, IsEditor, get_user_role, invalidate_user_role
+from .uploads import (
+    UploadError, create_file, discard_partial, hash_uploaded_file, is_expired, partial_path, write_chunk,
+)
+
+
+def _set_role_claims(token, user_id):
+    # Display-only claims for the client; permissions always resolve the role server-side
+    role = get_user_role(user_id)
+    token['role_id'] = role['role_id']
+    token['role_name'] = role['role_name']
 
 
 # Custom Token Serializer
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
-    Custom JWT token serializer to include username in the response.
+    Custom JWT token serializer to include username in the response and the user's role in the
+    token claims, so clients can read the role without calling the info endpoint.
     """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        _set_role_claims(token, user.id)
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data['username'] = self.user.username
@@ -30,6 +59,28 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     """
     serializer_class = CustomTokenObtainPairSerializer
 
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Refresh token whose role claims are re-read from the stored role when it is presented, so the
+    access and rotated refresh tokens it issues carry the current role instead of the one at login.
+    """
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+        if token is not None:
+            _set_role_claims(self, self[jwt_settings.USER_ID_CLAIM])
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleRefreshToken
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    JWT refresh view that re-issues the role claims from the stored role.
+    """
+    serializer_class = CustomTokenRefreshSerializer
+
 class RegisterView(APIView):
     """
     User registration view. Allows new users to register by providing username, email, and password.
@@ -85,6 +136,7 @@ class RegisterView(APIView):
         user_ext.user_id = user  # Assign the User instance
         user_ext.user_role_id = user_role  # Assign the UserRole instance
         user_ext.save()  # Save the AuthUserExt instance
+        invalidate_user_role(user.id)  # Drop any role cached before the record existed
         return Response({"detail": "User registered successfully."}, status=status.HTTP_201_CREATED)
 
 # Logout
@@ -113,16 +165,10 @@ class UserInfoView(APIView):
     def get(self, request):
         user = request.user  # Get the currently authenticated user
 
-        # Fetch related data from AuthUserExt and UserRole
-        try:
-            auth_user_ext = AuthUserExt.objects.get(user_id=user.id)  # Fetch the AuthUserExt record
-            # print(auth_user_ext.user_role_id)
-            role_name = auth_user_ext.user_role_id.name if auth_user_ext.user_role_id else "No Role"
-            role_id = auth_user_ext.user_role_id.id if auth_user_ext.user_role_id else None  # Get the role ID
-        except AuthUserExt.DoesNotExist:
-            auth_user_ext = None
-            role_name = "No Role"
-            role_id = None  # If no AuthUserExt is found, set role_id to None
+        # Fetch the AuthUserExt and UserRole data, from the role cache when possible
+        role = get_user_role(user.id)
+        role_name = role['role_name']
+        role_id = role['role_id']  # None if there is no AuthUserExt record or no role
 
         # Compile all relevant user data into a dictionary
         user_data = {
@@ -141,9 +187,9 @@ class UserInfoView(APIView):
         }
 
         # Add any additional data from AuthUserExt, if available
-        if auth_user_ext:
+        if role['auth_user_ext_id']:
             user_data.update({
-                "auth_user_ext_id": auth_user_ext.id,  # ID of the AuthUserExt record
+                "auth_user_ext_id": role['auth_user_ext_id'],  # ID of the AuthUserExt record
             })
 
         return Response(
@@ -159,55 +205,75 @@ class UserInfoView(APIView):
 
 class AllUsersView(APIView):
     """
-    View to fetch all users and their associated roles.
+    View to fetch users and their associated roles, one page at a time.
+
+    Users and roles are read in a single joined query. Query parameters:
+    role_id (int): Only return users with this role.
+    ordering (str): One of `id`, `username`, `email`, `date_joined`, optionally prefixed with `-`.
+    page_size (int): The number of users per page (default `USERS_PAGE_SIZE`).
+    cursor (str): The `next_cursor` of the previous page.
     """
-    permission_classes = [IsAuthenticated]  # Restrict access to authenticated users
+    permission_classes = [IsAdmin]  # Restrict access to admins
 
-    def get(self, request):
-        # Fetch all users and their associated roles
-        users = User.objects.all()
-        user_data = []
+    ORDERING_FIELDS = ('id', 'username', 'email', 'date_joined')
 
-        for user in users:
-            # try:
-            #     user_role = AuthUserExt.objects.get(user_id=user).user_role_id.name
-            # except AuthUserExt.DoesNotExist:
-            #     user_role = "No Role"
+    def get(self, request):
+        ordering = request.query_params.get('ordering', 'id')
+        field = ordering.lstrip('-')
+        if field not in self.ORDERING_FIELDS:
+            raise ValidationError(f"ordering must be one of: {', '.join(self.ORDERING_FIELDS)}.")
+        descending = ordering.startswith('-')
+        # `id` breaks ties so the keyset is unique
+        keyset = [(field, descending)] if field == 'id' else [(field, descending), ('id', descending)]
+
+        # LEFT JOIN auth_user -> users_authuserext -> users_userrole instead of two queries per user
+        users = User.objects.values(
+            'id', 'username', 'first_name', 'last_name', 'email',
+            'is_staff', 'is_active', 'date_joined', 'last_login',
+            role_id=F('authuserext__user_role_id'),
+            role_name=F('authuserext__user_role_id__name'),
+        )
+        role_id = request.query_params.get('role_id')
+        if role_id:
             try:
-                auth_user_ext = AuthUserExt.objects.get(user_id=user) # Fetch the AuthUserExt record
-                # print(auth_user_ext.user_role_id)
-                role_name = auth_user_ext.user_role_id.name if auth_user_ext.user_role_id else "No Role"
-                role_id = auth_user_ext.user_role_id.id if auth_user_ext.user_role_id else None  # Get the role ID
-            except AuthUserExt.DoesNotExist:
-                auth_user_ext = None
-                role_name = "No Role"
-                role_id = None  # If no AuthUserExt is found, set role_id to None
+                role_id = int(role_id)
+            except ValueError:
+                raise ValidationError("role_id must be an integer.")
+            users = users.filter(authuserext__user_role_id=role_id)
+
+        page_size = get_page_size(request, settings.USERS_PAGE_SIZE, settings.USERS_MAX_PAGE_SIZE)
+        rows, next_cursor = keyset_page(users, keyset, request.query_params.get('cursor'), page_size)
 
+        user_data = []
+        for user in rows:
             user_data.append({
-               "id": user.id,  # User ID (Primary Key)
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "full_name": f"{user.first_name} {user.last_name}",  # Full name
-                "email": user.email,
-                "role_name": role_name,  # User role as a string (name of the role)
-                "role_id": role_id,  # User role ID (ID of the UserRole)
-                "is_staff": user.is_staff,  # If the user is a staff member
-                "is_active": user.is_active,  # If the account is active
-                "date_joined": user.date_joined,  # When the user joined
-                "last_login": user.last_login,  # Last login time
+                "id": user['id'],  # User ID (Primary Key)
+                "username": user['username'],
+                "first_name": user['first_name'],
+                "last_name": user['last_name'],
+                "full_name": f"{user['first_name']} {user['last_name']}",  # Full name
+                "email": user['email'],
+                "role_name": user['role_name'] or "No Role",  # User role as a string (name of the role)
+                "role_id": user['role_id'],  # User role ID (ID of the UserRole)
+                "is_staff": user['is_staff'],  # If the user is a staff member
+                "is_active": user['is_active'],  # If the account is active
+                "date_joined": user['date_joined'],  # When the user joined
+                "last_login": user['last_login'],  # Last login time
             })
 
         return Response(
             {
                 "message": "All users fetched successfully",
                 "users": user_data,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
             },
             status=status.HTTP_200_OK
         )
     
 
 @api_view(['PUT'])
+@permission_classes([IsAdmin])
 def update_user_role(request, user_id):
     """
     Update the role of a user by their ID.
@@ -232,6 +298,7 @@ def update_user_role(request, user_id):
             try:
                 user = User.objects.get(id=user_id)  # Check if the user exists
                 auth_user_ext = AuthUserExt.objects.create(user_id=user, user_role_id=new_role)
+                invalidate_user_role(user_id)
             except User.DoesNotExist:
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
          # Check if the current role is Admin (role_id = 1) and do not change it
@@ -241,6 +308,7 @@ def update_user_role(request, user_id):
         # Update the role
         auth_user_ext.user_role_id = new_role
         auth_user_ext.save()
+        invalidate_user_role(user_id)
 
         return Response({"message": "Role updated successfully!"}, status=status.HTTP_200_OK)
 
@@ -250,57 +318,234 @@ def update_user_role(request, user_id):
 
 
 @api_view(['POST'])
+@permission_classes([IsEditor])
 def upload_file(request):
     """
-    Upload a file (image) to the server. Creates a new file record for the user.
+    Upload a file (image) to the server. Creates a new file record for the user. A file whose
+    content was uploaded before links to the stored copy and its vectors instead.
     """
     if request.method == 'POST':
         file = request.FILES.get('file')  # Access the uploaded file
         file_caption = request.data.get('file_caption')  # Optionally, get the file caption
-        print(file_caption)
         if not file:
             return Response({"error": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Assuming the user is already authenticated
         user = request.user
-        
-        # Create a new file record
-        new_file = File.objects.create(
-            file=file,
-            file_caption=file_caption,
-            user_id=user,
-            raged=False  # Set raged to False by default
+
+        # Create a new file record, or link it to an identical earlier upload
+        new_file, duplicate_of = create_file(user, file_caption, hash_uploaded_file(file), content=file)
+
+        return Response(_upload_result(new_file, duplicate_of), status=status.HTTP_201_CREATED)
+
+
+def _upload_result(new_file, duplicate_of):
+    return {
+        "message": "File uploaded successfully!",
+        "file_id": new_file.id,
+        "duplicate_of": duplicate_of.id if duplicate_of else None,
+        "rag": new_file.raged,
+    }
+
+
+def _upload_session_data(session):
+    return {
+        "upload_id": str(session.id),
+        "offset": session.offset,
+        "size": session.size,
+        "chunk_size": settings.UPLOAD_CHUNK_SIZE,
+        "complete": session.file_id_id is not None,
+        "file_id": session.file_id_id,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsEditor])
+def create_upload(request):
+    """
+    Start a chunked upload. The body gives the `filename`, total `size` in bytes and an optional
+    `file_caption`; the response carries the `upload_id` and the suggested `chunk_size`.
+
+    Chunks are then sent in order with PUT /upload/<upload_id>/, the raw bytes as the body and
+    their position in an `Upload-Offset` header. GET /upload/<upload_id>/ returns the offset to
+    resume from after a failed request.
+    """
+    if not request.user.is_authenticated:
+        return Response({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    filename = request.data.get('filename')
+    if not filename:
+        return Response({"error": "filename is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        size = int(request.data.get('size'))
+    except (TypeError, ValueError):
+        return Response({"error": "size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+    if size < 1 or size > settings.UPLOAD_MAX_SIZE:
+        return Response(
+            {"error": f"size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes."},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-        
-        return Response({"message": "File uploaded successfully!"}, status=status.HTTP_201_CREATED)
-    
+
+    session = UploadSession.objects.create(
+        user_id=request.user,
+        filename=filename[:255],
+        file_caption=request.data.get('file_caption'),
+        size=size,
+    )
+    return Response(_upload_session_data(session), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsEditor])
+def upload_chunk(request, upload_id):
+    """
+    GET returns the state of a chunked upload, notably the `offset` to resume from.
+
+    PUT appends the request body at `Upload-Offset`, which must equal the bytes received so far;
+    otherwise 409 is returned with the current offset so the client can resume. The content is
+    hashed as it is written. When the last chunk arrives the file record is created (201), linked
+    to an identical earlier upload if there is one.
+    """
+    if not request.user.is_authenticated:
+        return Response({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    session = UploadSession.objects.filter(id=upload_id, user_id=request.user).first()
+    if session is None:
+        return Response({"error": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+    if is_expired(session):
+        discard_partial(session)
+        session.delete()
+        return Response({"error": "Upload expired."}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return Response(_upload_session_data(session), status=status.HTTP_200_OK)
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return Response(
+            {"error": "Upload-Offset and Content-Length headers are required."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+        return Response(
+            {"error": f"Chunks are limited to {settings.UPLOAD_CHUNK_MAX_SIZE} bytes."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    with transaction.atomic():
+        # Serialise chunks of the same upload
+        session = UploadSession.objects.select_for_update().get(id=session.id)
+        if session.file_id_id is not None:
+            return Response(_upload_session_data(session), status=status.HTTP_409_CONFLICT)
+        if offset != session.offset:
+            return Response(
+                {"error": "Upload-Offset does not match the bytes received.", **_upload_session_data(session)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if length < 1 or offset + length > session.size:
+            return Response({"error": "The chunk exceeds the announced size."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            hasher = write_chunk(session, request.stream, length)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        session.offset = offset + length
+        if session.offset < session.size:
+            session.save(update_fields=['offset', 'updated_at'])
+            return Response(_upload_session_data(session), status=status.HTTP_200_OK)
+
+        new_file, duplicate_of = create_file(
+            session.user_id, session.file_caption, hasher.hexdigest(),
+            partial=partial_path(session), filename=session.filename,
+        )
+        session.file_id = new_file
+        session.save(update_fields=['offset', 'file_id', 'updated_at'])
+    discard_partial(session)
+    return Response({**_upload_result(new_file, duplicate_of), **_upload_session_data(session)},
+                    status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 def get_uploaded_files(request):
     """
-    Fetch a list of uploaded files for the authenticated user.
+    Fetch one page of the files uploaded by the authenticated user, newest first.
+
+    Query parameters:
+    raged (bool): Only return files that have (`true`) or have not (`false`) been raged.
+    page_size (int): The number of files per page (default `UPLOADED_FILES_PAGE_SIZE`).
+    cursor (str): The `next_cursor` of the previous page.
+
+    Responses carry an ETag and Last-Modified derived from the newest `updated_at` and the number of
+    matching files, so polling clients that send If-None-Match / If-Modified-Since get a 304 with
+    no body until a file is added, removed or changed.
     """
     try:
         # Ensure the user is authenticated
         if not request.user.is_authenticated:
             return Response({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # Filter files by the current user
+
+        # Filter files by the current user, and optionally by raged status
         files = File.objects.filter(user_id=request.user)
-        
+        raged = request.query_params.get('raged')
+        if raged is not None:
+            if raged not in ('true', 'false'):
+                return Response({"error": "raged must be true or false."}, status=status.HTTP_400_BAD_REQUEST)
+            files = files.filter(raged=raged == 'true')
+        try:
+            page_size = get_page_size(
+                request, settings.UPLOADED_FILES_PAGE_SIZE, settings.UPLOADED_FILES_MAX_PAGE_SIZE
+            )
+        except ValidationError as e:
+            return Response({"error": e.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+        cursor = request.query_params.get('cursor')
+
+        # One cheap aggregate decides whether the client's copy is still current
+        version = files.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        last_modified = version['last_modified']
+        etag = quote_etag(hashlib.sha256(
+            f"{request.user.id}|{raged}|{cursor}|{page_size}|{last_modified}|{version['count']}".encode('utf-8')
+        ).hexdigest()[:32])
+        # Whole seconds, the resolution of If-Modified-Since
+        last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+        if not_modified is not None:
+            return _with_validators(not_modified, etag, last_modified_timestamp)
+
+        # Every file belongs to the requesting user, so the uploader needs no join or extra query
+        files = files.only('id', 'file', 'file_caption', 'raged', 'uploaded_at')
+        try:
+            page, next_cursor = keyset_page(files, [('uploaded_at', True), ('id', True)], cursor, page_size)
+        except ValidationError as e:
+            return Response({"error": e.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+
         # Build the response data
         file_data = []
-        for file in files:
+        for file in page:
             file_data.append({
                 'id': file.id,
                 'file_name': file.file.url if file.file else None,  # Use .url for file path
                 'file_caption': file.file_caption,
-                'uploaded_by': file.user_id.username,  # Ensure User model has 'username'
-                'uploaded_at': file.id,  # Replace with actual `created_at` if available
+                'uploaded_by': request.user.username,
+                'uploaded_at': file.uploaded_at,
                 'rag':bool(file.raged)
             })
-        
-        return Response(file_data, status=status.HTTP_200_OK)
+
+        response = Response(
+            {"results": file_data, "next_cursor": next_cursor, "has_more": next_cursor is not None},
+            status=status.HTTP_200_OK,
+        )
+        return _with_validators(response, etag, last_modified_timestamp)
     except Exception as e:
         # Log and return a generic error
         print(f"Error in get_uploaded_files: {str(e)}")
         return Response({"error": "An unexpected error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _with_validators(response, etag, last_modified_timestamp):
+    # Clients must revalidate every time; the response depends on the Authorization header
+    response['ETag'] = etag
+    if last_modified_timestamp is not None:
+        response['Last-Modified'] = http_date(last_modified_timestamp)
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
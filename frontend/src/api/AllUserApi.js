@@ -40,21 +40,46 @@ export const updateUserRoleApi = async (userId, roleId, token) => {
 };
 
 
-// Function to upload a file
-export const uploadFile = async (file, caption, token) => {
-  const formData = new FormData();
-  formData.append('file', file); // Attach the file to the form data
-  formData.append('file_caption', caption); // Add a caption if needed
+// Function to upload a file in chunks. A chunk that fails is retried from the offset the
+// server reports, so a flaky connection resumes instead of starting over.
+export const uploadFile = async (file, caption, token, onProgress) => {
+  const headers = { Authorization: `Bearer ${token}` }; // Add token for authentication
 
   try {
-    const response = await axios.post(`${API_BASE_URL}/upload/`, formData, {
-      headers: {
-        Authorization: `Bearer ${token}`, // Add token for authentication
-        'Content-Type': 'multipart/form-data', // Important for file uploads
-      },
-    });
-    console.log("File upload response:", response.data);
-    return response.data;
+    const session = await axios.post(
+      `${API_BASE_URL}/upload/chunked/`,
+      { filename: file.name, size: file.size, file_caption: caption },
+      { headers }
+    );
+    const uploadUrl = `${API_BASE_URL}/upload/${session.data.upload_id}/`;
+    const chunkSize = session.data.chunk_size;
+    let offset = 0;
+    let retries = 0;
+
+    while (true) {
+      try {
+        const response = await axios.put(uploadUrl, file.slice(offset, offset + chunkSize), {
+          headers: { ...headers, "Content-Type": "application/octet-stream", "Upload-Offset": offset },
+        });
+        if (response.status === 201) {
+          console.log("File upload response:", response.data);
+          return response.data;
+        }
+        offset = response.data.offset;
+        retries = 0;
+      } catch (error) {
+        if (retries >= 5 || (error.response && error.response.status !== 409 && error.response.status < 500)) {
+          throw error;
+        }
+        retries += 1;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+        // Ask the server how much it has received before resending
+        const state = await axios.get(uploadUrl, { headers });
+        if (state.data.complete) return state.data;
+        offset = state.data.offset;
+      }
+      if (onProgress) onProgress(offset / file.size);
+    }
   } catch (error) {
     console.error("Error uploading file:", error.response?.data || error.message);
     throw error.response ? error.response.data : error;
@@ -94,4 +119,19 @@ export const performRagForFile = async (fileId, token) => {
     console.error("Error performing RAG processing:", error.response?.data || error.message);
     throw error.response ? error.response.data : error;
   }
-};
\ No newline at end of file
+};
+
+// Function to fetch the status and progress of a background ingestion job
+export const getIngestionJob = async (jobId, token) => {
+  try {
+    const response = await axios.get(`http://127.0.0.1:8000/api/genai/jobs/${jobId}/`, {
+      headers: {
+        Authorization: `Bearer ${token}`, // Pass the JWT token for authentication
+      },
+    });
+    return response.data.job;
+  } catch (error) {
+    console.error("Error fetching ingestion job:", error.response?.data || error.message);
+    throw error.response ? error.response.data : error;
+  }
+};
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { getUploadedFiles, performRagForFile } from "../api/AllUserApi"; // Assuming the file is named AllUserApi.js
+import { getUploadedFiles, performRagForFile, getIngestionJob } from "../api/AllUserApi"; // Assuming the file is named AllUserApi.js
 
 export default function UploadedFilesList() {
   const [uploadedFiles, setUploadedFiles] = useState([]);
@@ -17,7 +17,7 @@ export default function UploadedFilesList() {
       setLoading(true);
       try {
         const files = await getUploadedFiles(token);
-        setUploadedFiles(files);
+        setUploadedFiles(files.results);
       } catch (err) {
         setError("Error fetching files.");
       } finally {
@@ -39,6 +39,15 @@ export default function UploadedFilesList() {
       setLoading(true);
       const result = await performRagForFile(fileId, token);
       console.log("RAG process result:", result);
+      // Ingestion runs in the background; poll the job until it finishes
+      let job = result.job;
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        job = await getIngestionJob(job.id, token);
+      }
+      if (job.status !== "completed") {
+        throw new Error(job.error || `RAG job ${job.status}`);
+      }
       // Update the file's status after RAG processing is successful
       setUploadedFiles((prevFiles) =>
         prevFiles.map((file) =>
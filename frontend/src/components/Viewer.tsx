@@ -27,7 +27,7 @@ export default function ChatUI() {
   const fetchChatHistory = async () => {
     try {
       const response = await axios.get(`http://127.0.0.1:8000/api/genai/chat_history/${userId}/`);
-      setChatHistory(response.data.reverse());
+      setChatHistory(response.data.results.reverse());
       console.log(response.data);
     } catch (err) {
       console.error('Failed to load chat history:', err.message);